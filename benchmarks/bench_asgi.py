@@ -0,0 +1,193 @@
+#  Requisições por segundo da api síncrona (Flask, servidor com threaded=True como em src/app.py)
+#  contra a api asyncio (Quart no hypercorn). Os dois usam bancos em memória (mongomock e
+#  mongomock-motor) e uma api de cashback local que responde com LATENCIA_UPSTREAM, sem cache de
+#  saldo, para medir o efeito de threads bloqueadas na chamada externa.
+#
+#  pip install quart motor aiohttp mongomock-motor
+#  python -m benchmarks.bench_asgi
+import asyncio
+import json
+import logging
+import multiprocessing
+import statistics
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import aiohttp
+import mongomock
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from mongomock_motor import AsyncMongoMockClient
+from werkzeug.serving import make_server
+
+import src
+import src.aquecimento
+import src.aio
+import src.aio.cashback_api
+import src.aio.service
+import src.api  # noqa: F401
+import src.domain.cashback_api
+import src.domain.service
+from src.schema import compra_schema
+
+CPF = '70249837285'
+LATENCIA_UPSTREAM = 0.05
+CONCORRENCIA = 64
+DURACAO = 5.0
+COMPRAS = 100
+PORTA_UPSTREAM, PORTA_FLASK, PORTA_ASGI = 23950, 23951, 23952
+URL_UPSTREAM = f'http://127.0.0.1:{PORTA_UPSTREAM}/'
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(LATENCIA_UPSTREAM)
+        corpo = json.dumps({'body': {'credit': 10.5}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class _SemCache:
+    def obter_ou_carregar(self, chave, carregar):
+        return carregar(), time.time()
+
+
+class _SemCacheAsync:
+    async def obter_ou_carregar(self, chave, carregar):
+        return await carregar(), time.time()
+
+
+def _documentos() -> tuple:
+    revendedor = {'nome': 'Revendedor benchmark', 'cpf': CPF, 'senha': 'x', 'email': 'bench@teste.com'}
+    compras = []
+    for i in range(COMPRAS):
+        compra = compra_schema.load(
+            {'codigo': str(i), 'valor': 100, 'cpf_revendedor': CPF, 'data': f'2021-01-{i % 28 + 1:02}T00:00:00'}
+        )
+        compra.status = 'Em Validação'
+        compras.append(dict(compra_schema.dump(compra), data=compra.data))
+    mensal = {'cpf_revendedor': CPF, 'ano_mes': '2021-01', 'total': 100.0 * COMPRAS, 'quantidade': COMPRAS}
+    return revendedor, compras, mensal
+
+
+def _popular(database):
+    revendedor, compras, mensal = _documentos()
+    database.get_collection('revendedor').insert_one(revendedor)
+    database.get_collection('compra').insert_many(compras)
+    database.get_collection('compra-mensal').insert_one(mensal)
+
+
+async def _popular_async(database):
+    revendedor, compras, mensal = _documentos()
+    await database.get_collection('revendedor').insert_one(revendedor)
+    await database.get_collection('compra').insert_many(compras)
+    await database.get_collection('compra-mensal').insert_one(mensal)
+
+
+#  Cada servidor roda em um processo próprio, para que o gerador de carga não dispute o GIL com eles
+class _UpstreamServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+
+
+def _servir_upstream():
+    _UpstreamServer(('127.0.0.1', PORTA_UPSTREAM), _Upstream).serve_forever()
+
+
+def _servir_flask():
+    database = mongomock.MongoClient()['cashback']
+    _popular(database)
+    client = src.domain.cashback_api.CashbackApiClient(url=URL_UPSTREAM, pool_size=CONCORRENCIA)
+
+    with patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False), \
+            patch.object(src.domain.service, 'mongo', SimpleNamespace(db=database)), \
+            patch.object(src.domain.service, 'saldo_cashback_cache', _SemCache()), \
+            patch.object(src.domain.cashback_api, '_client', client):
+        app = src.create_app('mongodb://localhost:1/cashback')
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        make_server('127.0.0.1', PORTA_FLASK, app, threaded=True).serve_forever()
+
+
+def _servir_asgi():
+    database = AsyncMongoMockClient()['cashback']
+    asyncio.run(_popular_async(database))
+    client = src.aio.cashback_api.CashbackApiClient(url=URL_UPSTREAM, pool_size=CONCORRENCIA)
+    config = Config()
+    config.bind = [f'127.0.0.1:{PORTA_ASGI}']
+    config.accesslog = None
+    config.errorlog = None
+
+    with patch.object(src.aio, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False), \
+            patch.object(src.aio.async_mongo, 'init_app'), \
+            patch.object(src.aio.async_mongo, 'db', database), \
+            patch.object(src.aio.service, 'saldo_cashback_cache', _SemCacheAsync()), \
+            patch.object(src.aio.cashback_api, '_client', client):
+        app = src.create_asgi_app('mongodb://localhost:1/cashback')
+        asyncio.run(serve(app, config))
+
+
+async def _aguardar(session: aiohttp.ClientSession, url: str):
+    for _ in range(100):
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                return
+        except aiohttp.ClientConnectionError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f'{url} não respondeu')
+
+
+async def _carga(url: str) -> dict:
+    tempos = []
+    erros = 0
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=CONCORRENCIA)) as session:
+        await _aguardar(session, url)
+        fim = time.perf_counter() + DURACAO
+
+        async def _cliente():
+            nonlocal erros
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                try:
+                    async with session.get(url) as response:
+                        await response.read()
+                        status = response.status
+                except aiohttp.ClientError:
+                    erros += 1
+                    continue
+                if status == 200:
+                    tempos.append(time.perf_counter() - inicio)
+                else:
+                    erros += 1
+
+        await asyncio.gather(*(_cliente() for _ in range(CONCORRENCIA)))
+
+    quantis = statistics.quantiles(tempos, n=100)
+    return {'rps': len(tempos) / DURACAO, 'p50': quantis[49] * 1000, 'p99': quantis[98] * 1000, 'erros': erros}
+
+
+if __name__ == '__main__':
+    processos = [multiprocessing.Process(target=alvo, daemon=True)
+                 for alvo in (_servir_upstream, _servir_flask, _servir_asgi)]
+    for processo in processos:
+        processo.start()
+
+    print(f'{CONCORRENCIA} conexões, {DURACAO:.0f}s por rota, api de cashback com {LATENCIA_UPSTREAM * 1000:.0f}ms')
+    for rota in (f'/api/v1/revendedor/{CPF}/cashback', f'/api/v1/revendedor/{CPF}/compras'):
+        for nome, porta in (('flask (threads)', PORTA_FLASK), ('asgi (asyncio)', PORTA_ASGI)):
+            result = asyncio.run(_carga(f'http://127.0.0.1:{porta}{rota}'))
+            print(f'{rota:42} {nome:16} {result["rps"]:8.1f} req/s  p50 {result["p50"]:7.1f}ms  '
+                  f'p99 {result["p99"]:7.1f}ms  erros {result["erros"]}')
+
+    for processo in processos:
+        processo.terminate()
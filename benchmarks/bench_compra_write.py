@@ -0,0 +1,45 @@
+#  Micro-benchmark do caminho de escrita de compra (sem banco): compara o fluxo antigo
+#  (validate + load + dump duplicado + dumps, com um schema novo a cada passo) com o atual
+#  (um load e um dump em instâncias reaproveitadas).
+#
+#  python -m benchmarks.bench_compra_write
+import json
+import timeit
+
+from src.schema import CompraSchema, compra_schema
+
+PAYLOAD = {'codigo': '21', 'valor': 100, 'cpf_revendedor': '86342733775', 'data': '2020-01-10T00:00:00'}
+REPETICOES = 5
+EXECUCOES = 2000
+
+
+def fluxo_antigo():
+    errors = CompraSchema().validate(PAYLOAD)
+    if errors:
+        raise ValueError(errors)
+    compra = CompraSchema().load(PAYLOAD)
+    compra.status = 'Em Validação'
+    CompraSchema().dump(compra)
+    documento = CompraSchema().dump(compra)
+    return documento, CompraSchema().dumps(compra)
+
+
+def fluxo_atual():
+    compra = compra_schema.load(PAYLOAD)
+    compra.status = 'Em Validação'
+    _compra = compra_schema.dump(compra)
+    documento = dict(_compra, data=compra.data)
+    return documento, json.dumps(_compra)
+
+
+def _medir(fn) -> float:
+    tempos = timeit.repeat(fn, number=EXECUCOES, repeat=REPETICOES)
+    return min(tempos) / EXECUCOES * 1e6
+
+
+if __name__ == '__main__':
+    antigo = _medir(fluxo_antigo)
+    atual = _medir(fluxo_atual)
+    print(f'fluxo antigo: {antigo:8.1f} us/requisição')
+    print(f'fluxo atual:  {atual:8.1f} us/requisição')
+    print(f'economia:     {antigo - atual:8.1f} us/requisição ({(1 - atual / antigo) * 100:.0f}%)')
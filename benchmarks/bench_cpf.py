@@ -0,0 +1,48 @@
+#  Compara a validação de cpf anterior (schema._validate_cpf) com src.cpf, com e sem acerto no cache.
+#
+#  python -m benchmarks.bench_cpf
+import random
+import timeit
+
+from src.cpf import cpf_valido
+
+QUANTIDADE = 10000
+REPETICOES = 5
+
+
+def validate_cpf_anterior(value):
+    cpf = [int(char) for char in value if char.isdigit()]
+    if len(cpf) != 11:
+        return False
+    if cpf == cpf[::-1]:
+        return False
+    for i in range(9, 11):
+        value = sum((cpf[num] * ((i + 1) - num) for num in range(0, i)))
+        digit = ((value * 10) % 11) % 10
+        if digit != cpf[i]:
+            return False
+    return True
+
+
+def _medir(fn, preparar=None) -> float:
+    def _executar():
+        if preparar:
+            preparar()
+        fn()
+    return min(timeit.repeat(_executar, number=1, repeat=REPETICOES)) / QUANTIDADE * 1e6
+
+
+if __name__ == '__main__':
+    random.seed(1)
+    cpfs = [''.join(random.choice('0123456789') for _ in range(11)) for _ in range(QUANTIDADE)]
+    assert [validate_cpf_anterior(cpf) for cpf in cpfs] == [cpf_valido(cpf) for cpf in cpfs]
+
+    resultados = {
+        'anterior': _medir(lambda: [validate_cpf_anterior(cpf) for cpf in cpfs]),
+        'cpf_valido (sem cache)': _medir(lambda: [cpf_valido(cpf) for cpf in cpfs], cpf_valido.cache_clear),
+        'cpf_valido (cache)': _medir(lambda: [cpf_valido(cpf) for cpf in cpfs]),
+    }
+
+    base = resultados['anterior']
+    for nome, tempo in resultados.items():
+        print(f'{nome:24} {tempo:7.2f} us/cpf  {base / tempo:6.1f}x')
@@ -0,0 +1,80 @@
+#  Serialização da listagem de compras (uma página de TAMANHO_PAGINA compras com cashback): o caminho
+#  anterior (CompraCashBackSchema.dump + json.dumps) contra compra_cashback_dict com o encoder da
+#  biblioteca padrão e com orjson, e a rota GET /compras completa (test client, backend em memória)
+#  com cada encoder. Resultados em MB/s de json gerado.
+#
+#  pip install orjson
+#  python -m benchmarks.bench_json
+import json
+import timeit
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import src
+import src.aquecimento
+import src.api.serializacao
+import src.domain.senha
+from src import create_app, repositorio
+from src.api.serializacao import ENCODER_ORJSON, ENCODER_STDLIB, obter_encoder
+from src.domain.service import TAMANHO_PAGINA
+from src.model import CompraCashBack
+from src.schema import compra_cashback_dict, compra_cashback_schema
+
+CPF = '70249837285'
+REPETICOES = 5
+NUMERO = 200
+
+
+def _medir(fn) -> tuple:
+    tamanho = len(fn())
+    tempo = min(timeit.repeat(fn, number=NUMERO, repeat=REPETICOES)) / NUMERO
+    return tamanho, tamanho / tempo / 1e6, tempo * 1e3
+
+
+def _compras() -> [CompraCashBack]:
+    inicio = datetime(2021, 1, 1)
+    return [
+        CompraCashBack(str(i), CPF, 100.0 + i, inicio + timedelta(hours=i), 'Em Validação', 10, 10.0 + i / 10)
+        for i in range(TAMANHO_PAGINA)
+    ]
+
+
+def _encoders() -> [str]:
+    return [ENCODER_STDLIB] + ([ENCODER_ORJSON] if src.api.serializacao.orjson else [])
+
+
+def _client():
+    with patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False), \
+            patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0):
+        client = create_app('', backend=repositorio.BACKEND_MEMORIA).test_client()
+        client.post('/api/v1/revendedor/', json={
+            'nome': 'Revendedor benchmark', 'cpf': CPF, 'senha': 'Senhaboita', 'email': 'bench@teste.com'
+        })
+    compras = [{'codigo': str(i), 'valor': 100 + i, 'cpf_revendedor': CPF, 'data': f'2021-01-{i % 28 + 1:02}T00:00:00'}
+               for i in range(TAMANHO_PAGINA)]
+    client.post(f'/api/v1/revendedor/{CPF}/compras', json=compras)
+    return client
+
+
+if __name__ == '__main__':
+    compras = _compras()
+    resultados = {
+        'anterior (dump + json.dumps)': _medir(
+            lambda: json.dumps({'compras': compra_cashback_schema.dump(compras, many=True), 'total': 1}).encode()
+        )
+    }
+    for nome in _encoders():
+        encoder = obter_encoder(nome)
+        resultados[f'dict + {nome}'] = _medir(
+            lambda: encoder({'compras': [compra_cashback_dict(compra) for compra in compras], 'total': 1})
+        )
+
+    client = _client()
+    url = f'/api/v1/revendedor/{CPF}/compras'
+    for nome in _encoders():
+        with patch.object(src.api.serializacao, 'codificar', obter_encoder(nome)):
+            resultados[f'rota GET /compras {nome}'] = _medir(lambda: client.get(url).data)
+
+    print(f'{TAMANHO_PAGINA} compras por página')
+    for nome, (tamanho, mb_s, ms) in resultados.items():
+        print(f'{nome:30} {tamanho:7} bytes  {ms:7.3f} ms  {mb_s:7.1f} MB/s')
@@ -0,0 +1,45 @@
+#  Vazão de login (RevendedorService.login com o banco simulado) para cada custo de hash,
+#  com várias threads de requisição disputando o pool de processos de src.domain.senha.
+#
+#  python -m benchmarks.bench_login
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, Mock
+
+import src.api  # noqa: F401
+import src.domain.senha
+import src.domain.service
+from src.config import SENHA_HASH_PROCESSOS
+from src.domain.senha import gerar_hash
+from src.domain.service import RevendedorService
+
+CUSTOS = [10000, 100000, 260000, 600000]
+THREADS = 8
+DURACAO = 3.0
+
+
+def _medir(servico: RevendedorService) -> float:
+    fim = time.perf_counter() + DURACAO
+
+    def _logar():
+        quantidade = 0
+        while time.perf_counter() < fim:
+            assert servico.login('70249837285', 'Senhabonita')[0]
+            quantidade += 1
+        return quantidade
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        total = sum(executor.map(lambda _: _logar(), range(THREADS)))
+    return total / DURACAO
+
+
+if __name__ == '__main__':
+    print(f'{THREADS} threads, {SENHA_HASH_PROCESSOS} processos de hash')
+    for custo in CUSTOS:
+        with patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', custo), \
+                patch.object(src.domain.service, 'mongo') as mongo_mock:
+            colecao = Mock()
+            colecao.find_one.return_value = {'cpf': '70249837285', 'senha': gerar_hash('Senhabonita'),
+                                             'token': 'abc'}
+            mongo_mock.db.get_collection.return_value = colecao
+            print(f'{custo:8} iterações  {_medir(RevendedorService()):8.1f} logins/s')
@@ -0,0 +1,308 @@
+#  Vazão e latência (p50/p95/p99) de cada rota de src/api/routes.py pelo test client do Flask, com
+#  o backend de repositórios em memória e uma api de cashback local. Cada rota recebe o mesmo
+#  número de requisições de CONCORRENCIA threads; as de leitura rodam antes das de escrita, sobre
+#  a massa inicial de REVENDEDORES revendedores com COMPRAS compras cada.
+#
+#  Cada rota é medida REPETICOES vezes e fica a melhor medida. O resultado pode ser gravado como
+#  baseline (json) e comparado nas execuções seguintes: rotas com vazão menor ou p95 maior que a
+#  baseline além do limite fazem o comando sair com código 1 (CI).
+#
+#  A baseline versionada foi medida numa máquina de desenvolvimento e só vale para ela: em outra máquina
+#  (ou no runner do CI) grave uma baseline própria com --salvar-baseline antes de comparar. Ela não é
+#  um limite universal de regressão.
+#
+#  python -m benchmarks.bench_rotas --salvar-baseline
+#  python -m benchmarks.bench_rotas --concorrencia 16 --requisicoes 1000 --limite 0.3
+import argparse
+import base64
+import itertools
+import json
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from unittest.mock import patch
+
+import src
+import src.aquecimento
+import src.api.decoradores
+import src.domain.cashback_api
+import src.domain.senha
+import src.domain.service
+from src import repositorio
+from src.cpf import _digito_verificador, _PESOS_PRIMEIRO_DIGITO, _PESOS_SEGUNDO_DIGITO
+
+CONCORRENCIA = 8
+REQUISICOES = 300
+REPETICOES = 3
+REVENDEDORES = 20
+COMPRAS = 200
+LOTE = 100
+LATENCIA_UPSTREAM = 0.0
+#  Custo do hash de senha durante o benchmark (o efeito do custo é medido em bench_login)
+SENHA_HASH_ITERACOES = 10000
+LIMITE_REGRESSAO = 0.3
+#  Diferenças de p95 abaixo disso são ignoradas (espera pelo GIL, em intervalos de 5ms, com várias threads)
+TOLERANCIA_MS = 20.0
+BASELINE = Path(__file__).with_name('baseline_rotas.json')
+
+SENHA = 'Senhaboita'
+ADMIN_TOKEN = 'benchmark'
+API = '/api/v1'
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latencia = LATENCIA_UPSTREAM
+    #  Cabeçalhos e corpo vão numa única escrita (wfile com buffer, esvaziado ao fim da requisição) e sem
+    #  Nagle: em escritas separadas o segundo segmento espera o ACK atrasado do cliente (~40ms por chamada)
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(self.latencia)
+        corpo = json.dumps({'body': {'credit': 10.5}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class _UpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _SemCache:
+    #  O saldo é sempre buscado na api de cashback, para que a rota inclua a chamada externa
+    def obter_ou_carregar(self, chave, carregar):
+        return carregar(), time.time()
+
+    def estatisticas(self) -> dict:
+        return {}
+
+
+def _gerar_cpf(numero: int) -> str:
+    digitos = [int(char) for char in f'{numero:09}']
+    digitos.append(_digito_verificador(digitos, _PESOS_PRIMEIRO_DIGITO))
+    digitos.append(_digito_verificador(digitos, _PESOS_SEGUNDO_DIGITO))
+    return ''.join(map(str, digitos))
+
+
+def _compra(cpf: str, codigo: str, indice: int) -> dict:
+    return {'codigo': codigo, 'valor': 100 + indice % 1000, 'cpf_revendedor': cpf,
+            'data': f'2021-{indice % 12 + 1:02}-{indice % 28 + 1:02}T00:00:00'}
+
+
+def _senha_base64() -> str:
+    return base64.b64encode(SENHA.encode()).decode()
+
+
+def _popular(client, parametros) -> dict:
+    cpfs = [_gerar_cpf(100000000 + i) for i in range(parametros.revendedores)]
+    for cpf in cpfs:
+        resposta = client.post(f'{API}/revendedor/', json={
+            'nome': 'Revendedor benchmark', 'cpf': cpf, 'senha': SENHA, 'email': 'bench@teste.com'
+        })
+        assert resposta.status_code == 201, resposta.data
+        for inicio in range(0, parametros.compras, 1000):
+            compras = [_compra(cpf, f'{cpf}-{i}', i) for i in range(inicio, min(inicio + 1000, parametros.compras))]
+            assert client.post(f'{API}/revendedor/{cpf}/compras', json=compras).json['erros'] == 0
+
+    #  Tokens avulsos para a rota de logout, que invalida um token por requisição
+    tokens = [str(uuid.uuid4()) for _ in range(parametros.requisicoes * parametros.repeticoes)]
+    repositorio_token = repositorio.obter_repositorios(None).token()
+    for i, token in enumerate(tokens):
+        repositorio_token.inserir({'cpf': cpfs[i % len(cpfs)], 'token': token, 'created_at': datetime.utcnow()})
+
+    return {'cpfs': cpfs, 'tokens': tokens}
+
+
+def _rotas(massa: dict, parametros) -> dict:
+    #  Cada rota é uma função (client, i) -> (response, status esperado)
+    cpfs, tokens = massa['cpfs'], massa['tokens']
+    admin = {'X-Admin-Token': ADMIN_TOKEN}
+
+    def _cpf(i):
+        return cpfs[i % len(cpfs)]
+
+    def _listar_offset(client, i):
+        return client.get(f'{API}/revendedor/{_cpf(i)}/compras?offset=0'), 200
+
+    def _listar_cursor(client, i):
+        return client.get(f'{API}/revendedor/{_cpf(i)}/compras?cursor='), 200
+
+    def _exportar(client, i):
+        return client.get(f'{API}/revendedor/{_cpf(i)}/compras/exportar?formato=ndjson'), 200
+
+    def _saldo_cashback(client, i):
+        return client.get(f'{API}/revendedor/{_cpf(i)}/cashback'), 200
+
+    def _estatisticas_caches(client, i):
+        return client.get(f'{API}/admin/caches', headers=admin), 200
+
+    def _recarregar_pre_aprovados(client, i):
+        return client.post(f'{API}/admin/revendedor-pre-aprovado/recarregar', headers=admin), 200
+
+    def _login(client, i):
+        return client.post(f'{API}/revendedor/login', json={'cpf': _cpf(i), 'senha': _senha_base64()}), 200
+
+    def _logout(client, i):
+        return client.post(f'{API}/revendedor/logout', headers={'Authorization': f'Bearer {tokens[i]}'}), 204
+
+    def _criar_revendedor(client, i):
+        payload = {'nome': 'Revendedor novo', 'cpf': _gerar_cpf(200000000 + i), 'senha': SENHA,
+                   'email': 'novo@teste.com'}
+        return client.post(f'{API}/revendedor/', json=payload), 201
+
+    def _adicionar_compra(client, i):
+        return client.post(f'{API}/revendedor/{_cpf(i)}/compra', json=_compra(_cpf(i), f'nova-{i}', i)), 201
+
+    def _adicionar_compras_lote(client, i):
+        compras = [_compra(_cpf(i), f'lote-{i}-{j}', j) for j in range(parametros.lote)]
+        return client.post(f'{API}/revendedor/{_cpf(i)}/compras', json=compras), 200
+
+    return {
+        'GET compras (offset)': _listar_offset,
+        'GET compras (cursor)': _listar_cursor,
+        'GET compras/exportar': _exportar,
+        'GET cashback': _saldo_cashback,
+        'GET admin/caches': _estatisticas_caches,
+        'POST admin/recarregar': _recarregar_pre_aprovados,
+        'POST login': _login,
+        'POST logout': _logout,
+        'POST revendedor': _criar_revendedor,
+        'POST compra': _adicionar_compra,
+        f'POST compras (lote {parametros.lote})': _adicionar_compras_lote,
+    }
+
+
+def _medir(app, rota, indices, parametros) -> dict:
+    #  indices é compartilhado entre as repetições, para que as rotas de escrita não repitam cpf ou código
+    local = threading.local()
+    tempos = []
+    erros = 0
+
+    def _requisitar(_):
+        nonlocal erros
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        i = next(indices)
+        inicio = time.perf_counter()
+        response, esperado = rota(local.client, i)
+        response.get_data()
+        tempo = time.perf_counter() - inicio
+        if response.status_code == esperado:
+            tempos.append(tempo)
+        else:
+            erros += 1
+
+    with ThreadPoolExecutor(parametros.concorrencia) as executor:
+        inicio = time.perf_counter()
+        list(executor.map(_requisitar, range(parametros.requisicoes)))
+        duracao = time.perf_counter() - inicio
+
+    quantis = statistics.quantiles(tempos, n=100) if len(tempos) > 1 else [0.0] * 99
+    return {
+        'rps': round(len(tempos) / duracao, 1),
+        'p50': round(quantis[49] * 1000, 3),
+        'p95': round(quantis[94] * 1000, 3),
+        'p99': round(quantis[98] * 1000, 3),
+        'erros': erros,
+    }
+
+
+def _regressoes(resultado: dict, baseline: dict, limite: float) -> list:
+    regressoes = []
+    for nome, atual in resultado['rotas'].items():
+        anterior = baseline['rotas'].get(nome)
+        if not anterior:
+            continue
+        if atual['rps'] < anterior['rps'] * (1 - limite):
+            regressoes.append(f'{nome}: {atual["rps"]} req/s, baseline {anterior["rps"]} req/s')
+        if atual['p95'] > max(anterior['p95'] * (1 + limite), anterior['p95'] + TOLERANCIA_MS):
+            regressoes.append(f'{nome}: p95 {atual["p95"]}ms, baseline {anterior["p95"]}ms')
+        if atual['erros'] > anterior['erros']:
+            regressoes.append(f'{nome}: {atual["erros"]} erros, baseline {anterior["erros"]}')
+    return regressoes
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description='Benchmark das rotas da api')
+    parser.add_argument('--concorrencia', type=int, default=CONCORRENCIA)
+    parser.add_argument('--requisicoes', type=int, default=REQUISICOES, help='requisições por rota')
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--revendedores', type=int, default=REVENDEDORES)
+    parser.add_argument('--compras', type=int, default=COMPRAS, help='compras por revendedor')
+    parser.add_argument('--lote', type=int, default=LOTE, help='compras por requisição na inclusão em lote')
+    parser.add_argument('--latencia-upstream', type=float, default=LATENCIA_UPSTREAM, help='segundos')
+    parser.add_argument('--iteracoes-senha', type=int, default=SENHA_HASH_ITERACOES)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--salvar-baseline', action='store_true')
+    parser.add_argument('--limite', type=float, default=LIMITE_REGRESSAO, help='fração tolerada (0.3 = 30%%)')
+    return parser.parse_args()
+
+
+def main() -> int:
+    parametros = _argumentos()
+    _Upstream.latencia = parametros.latencia_upstream
+    upstream = _UpstreamServer(('127.0.0.1', 0), _Upstream)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    client = src.domain.cashback_api.CashbackApiClient(
+        url=f'http://127.0.0.1:{upstream.server_address[1]}/', pool_size=parametros.concorrencia
+    )
+
+    with patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False), \
+            patch.object(src.api.decoradores, 'ADMIN_TOKEN', ADMIN_TOKEN), \
+            patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', parametros.iteracoes_senha), \
+            patch.object(src.domain.service, 'saldo_cashback_cache', _SemCache()), \
+            patch.object(src.domain.cashback_api, '_client', client):
+        app = src.create_app('', backend=repositorio.BACKEND_MEMORIA)
+        massa = _popular(app.test_client(), parametros)
+
+        chaves = ('concorrencia', 'requisicoes', 'repeticoes', 'revendedores', 'compras', 'lote', 'latencia_upstream',
+                  'iteracoes_senha')
+        resultado = {'parametros': {chave: getattr(parametros, chave) for chave in chaves}, 'rotas': {}}
+        print(f'{parametros.concorrencia} threads, {parametros.requisicoes} requisições por rota, '
+              f'{parametros.revendedores} revendedores com {parametros.compras} compras')
+        for nome, rota in _rotas(massa, parametros).items():
+            indices = itertools.count()
+            medidas = [_medir(app, rota, indices, parametros) for _ in range(parametros.repeticoes)]
+            medida = {'rps': max(m['rps'] for m in medidas), 'erros': sum(m['erros'] for m in medidas)}
+            medida.update({quantil: min(m[quantil] for m in medidas) for quantil in ('p50', 'p95', 'p99')})
+            resultado['rotas'][nome] = medida
+            print(f'{nome:26} {medida["rps"]:9.1f} req/s  p50 {medida["p50"]:8.2f}ms  p95 {medida["p95"]:8.2f}ms  '
+                  f'p99 {medida["p99"]:8.2f}ms  erros {medida["erros"]}')
+
+    upstream.shutdown()
+
+    if parametros.salvar_baseline:
+        parametros.baseline.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + '\n')
+        print(f'baseline gravada em {parametros.baseline}')
+        return 0
+
+    if not parametros.baseline.exists():
+        return 0
+
+    baseline = json.loads(parametros.baseline.read_text())
+    if baseline['parametros'] != resultado['parametros']:
+        print('parâmetros diferentes dos da baseline, comparação ignorada')
+        return 0
+
+    regressoes = _regressoes(resultado, baseline, parametros.limite)
+    for regressao in regressoes:
+        print(f'REGRESSÃO {regressao}')
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,53 @@
 from flask import Flask
 from flask_pymongo import PyMongo
-from src.config import MONGO_URI
+from src.config import MONGO_URI, REPOSITORIO_BACKEND, METRICAS_HABILITADAS, CONSULTA_LENTA_LIMITE_MS
+from src import repositorio, metrics
+from src.consulta_lenta import consulta_lenta_listener
 
 mongo = PyMongo()
 
 
-def create_app(db_uri: str):
+def create_app(db_uri: str, backend: str = None, aquecer: bool = True):
+    #  aquecer=False deixa as conexões e a carga dos caches para src.aquecimento.aquecer, chamado
+    #  pelo servidor de produção em cada processo antes de receber requisições (src/gunicorn_conf.py)
     app = Flask(__name__)
 
     if not db_uri:
         db_uri = MONGO_URI
 
-    mongo.init_app(app, uri=db_uri, connect=True)
+    from src.domain.token import validar_configuracao
+    validar_configuracao()
+
+    #  Com o backend em memória o Mongo não é utilizado
+    backend = backend or REPOSITORIO_BACKEND
+    repositorio.configurar(backend)
+    app.config['REPOSITORIO_BACKEND'] = backend
+
+    if METRICAS_HABILITADAS:
+        metrics.init_app(app)
+
+    if backend == repositorio.BACKEND_MONGO:
+        listeners = []
+        if METRICAS_HABILITADAS:
+            listeners.append(metrics.mongo_listener)
+        if CONSULTA_LENTA_LIMITE_MS > 0:
+            listeners.append(consulta_lenta_listener)
+        #  Sem conectar na criação: o client abre o pool no primeiro comando, no processo que vai usá-lo
+        from src.database import opcoes_cliente
+        mongo.init_app(app, uri=db_uri, connect=False, event_listeners=listeners, **opcoes_cliente())
+        consulta_lenta_listener.configurar(mongo.cx)
+
+    if aquecer:
+        from src.aquecimento import aquecer as _aquecer
+        _aquecer(app)
 
     from src.api import api_bp as api_blueprint
     app.register_blueprint(api_blueprint, url_prefix='/api/v1')
 
     return app
+
+
+def create_asgi_app(db_uri: str):
+    #  Variante asyncio da api (Quart, motor e aiohttp), com as mesmas rotas em /api/v1
+    from src.aio import create_app as _create_asgi_app
+    return _create_asgi_app(db_uri)
@@ -0,0 +1,74 @@
+from pymongo import uri_parser
+from quart import Quart
+
+from src import mongo, metrics
+from src.config import MONGO_URI, CRIAR_INDICES_NA_INICIALIZACAO, PRE_APROVADO_CARREGAR_NA_INICIALIZACAO, TOKEN_MODO, \
+    METRICAS_HABILITADAS, CONSULTA_LENTA_LIMITE_MS
+from src.consulta_lenta import consulta_lenta_listener
+from src.database import opcoes_cliente
+
+
+class AsyncMongo:
+    #  Equivalente ao PyMongo do Flask-PyMongo para o motor: cx é o client e db a database da uri
+
+    def __init__(self):
+        self.cx = None
+        self.db = None
+
+    def init_app(self, app, uri: str, event_listeners: list = None):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.cx = AsyncIOMotorClient(uri, connect=False, event_listeners=event_listeners or [], **opcoes_cliente())
+        database_name = uri_parser.parse_uri(uri)['database']
+        if database_name:
+            self.db = self.cx[database_name]
+
+
+async_mongo = AsyncMongo()
+
+
+def create_app(db_uri: str):
+    app = Quart(__name__)
+
+    if not db_uri:
+        db_uri = MONGO_URI
+
+    from src.domain.token import validar_configuracao
+    validar_configuracao()
+
+    if METRICAS_HABILITADAS:
+        metrics.init_asgi_app(app)
+
+    #  Os mesmos listeners da api síncrona: o motor executa os comandos do pymongo em threads do pool
+    listeners = []
+    if METRICAS_HABILITADAS:
+        listeners.append(metrics.mongo_listener)
+    if CONSULTA_LENTA_LIMITE_MS > 0:
+        listeners.append(consulta_lenta_listener)
+    async_mongo.init_app(app, uri=db_uri, event_listeners=listeners)
+    #  Índices, o explain das consultas lentas e os conjuntos mantidos em memória (pré-aprovados, tokens
+    #  revogados) continuam no client síncrono: são carregados na inicialização e atualizados em threads
+    #  de background
+    mongo.init_app(app, uri=db_uri, **opcoes_cliente())
+    consulta_lenta_listener.configurar(mongo.cx)
+
+    if CRIAR_INDICES_NA_INICIALIZACAO:
+        from src.database import ensure_indexes
+        ensure_indexes(mongo.db)
+
+    if PRE_APROVADO_CARREGAR_NA_INICIALIZACAO:
+        from src.domain.pre_aprovado import revendedor_pre_aprovado_cache
+        revendedor_pre_aprovado_cache.carregar()
+
+    #  A verificação de tokens assinados consulta os revogados em memória, sem acessar o banco no event loop
+    if TOKEN_MODO == 'assinado':
+        from src.domain.token import token_revogado_cache
+        token_revogado_cache.carregar()
+
+    from src.aio.cashback_api import fechar_cashback_api_client
+    app.after_serving(fechar_cashback_api_client)
+
+    from src.aio.routes import api_bp as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+
+    return app
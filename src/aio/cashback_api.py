@@ -0,0 +1,111 @@
+import asyncio
+import random
+
+import aiohttp
+
+from src.config import (
+    URL_CASHBACK_ACUMULADO,
+    TOKEN_API_CASHBACK,
+    CASHBACK_API_POOL_SIZE,
+    CASHBACK_API_CONNECT_TIMEOUT,
+    CASHBACK_API_READ_TIMEOUT,
+    CASHBACK_API_MAX_TENTATIVAS,
+    CASHBACK_API_BACKOFF,
+    CASHBACK_API_CIRCUITO_FALHAS,
+    CASHBACK_API_CIRCUITO_ESPERA,
+)
+from src.domain.cashback_api import CashbackApiError, CircuitoAbertoError, CircuitBreaker
+
+
+class CashbackApiClient:
+    #  Versão asyncio de src.domain.cashback_api.CashbackApiClient, com as mesmas regras de
+    #  timeout, novas tentativas e circuit breaker
+
+    def __init__(self,
+                 url: str = URL_CASHBACK_ACUMULADO,
+                 token: str = TOKEN_API_CASHBACK,
+                 pool_size: int = CASHBACK_API_POOL_SIZE,
+                 connect_timeout: float = CASHBACK_API_CONNECT_TIMEOUT,
+                 read_timeout: float = CASHBACK_API_READ_TIMEOUT,
+                 max_tentativas: int = CASHBACK_API_MAX_TENTATIVAS,
+                 backoff: float = CASHBACK_API_BACKOFF,
+                 circuit_breaker: CircuitBreaker = None
+                 ):
+        self._url = url
+        self._max_tentativas = max_tentativas
+        self._backoff = backoff
+        self._circuit_breaker = circuit_breaker or CircuitBreaker(
+            CASHBACK_API_CIRCUITO_FALHAS, CASHBACK_API_CIRCUITO_ESPERA
+        )
+
+        self._headers = {'token': token}
+        self._timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._pool_size = pool_size
+        self._session = None
+
+    def _obter_session(self) -> aiohttp.ClientSession:
+        #  A session reaproveita as conexões e pertence ao event loop em que foi criada
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers=self._headers,
+                timeout=self._timeout,
+                connector=aiohttp.TCPConnector(limit=self._pool_size)
+            )
+        return self._session
+
+    async def obter_credito(self, cpf: str) -> float:
+        if not self._circuit_breaker.permitir():
+            raise CircuitoAbertoError('Api de cashback indisponível.')
+
+        registrado = False
+        try:
+            for tentativa in range(self._max_tentativas):
+                if tentativa:
+                    await asyncio.sleep(random.uniform(0, self._backoff * 2 ** (tentativa - 1)))
+
+                try:
+                    async with self._obter_session().get(self._url, params={'cpf': cpf}) as response:
+                        if response.ok:
+                            try:
+                                credito = (await response.json())['body']['credit']
+                            except (aiohttp.ContentTypeError, ValueError, KeyError, TypeError):
+                                raise CashbackApiError('Resposta inválida da api de cashback')
+                            registrado = True
+                            self._circuit_breaker.registrar_sucesso()
+                            return credito
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    #  Conexão, corpo incompleto (ClientPayloadError) ou timeout: nova tentativa
+                    continue
+
+                if status < 500 and status != 429:
+                    registrado = True
+                    self._circuit_breaker.registrar_sucesso()
+                    raise CashbackApiError(f'Erro ao obter cashback acumulado: {status}')
+
+            raise CashbackApiError('Erro ao obter cashback acumulado')
+        finally:
+            if not registrado:
+                self._circuit_breaker.registrar_falha()
+
+    async def fechar(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_client = None
+
+
+def cashback_api_client() -> CashbackApiClient:
+    global _client
+    if _client is None:
+        _client = CashbackApiClient()
+    return _client
+
+
+async def fechar_cashback_api_client():
+    global _client
+    if _client is not None:
+        await _client.fechar()
+        _client = None
@@ -0,0 +1,140 @@
+from pymongo.errors import BulkWriteError
+
+from src.repositorio.mongo import ORDEM_DATA, leitura_secundaria, chave_versao_compras, filtro_listagem_apos, \
+    filtro_versao_compras, pipeline_quantidade_compras, falhas_insercao, operacoes_incremento_mensal
+
+
+#  Repositórios da api asyncio sobre o motor: os mesmos métodos das interfaces de src.repositorio,
+#  como corrotinas, e as mesmas consultas de src.repositorio.mongo. A revogação de tokens e os
+#  conjuntos em memória continuam nos repositórios síncronos (src/aio/service.py).
+class RevendedorRepositorioMotor:
+
+    def __init__(self, database):
+        self._collection = database.get_collection('revendedor')
+
+    async def obter(self, cpf: str) -> dict:
+        return await self._collection.find_one({'cpf': cpf})
+
+    async def inserir(self, revendedor: dict):
+        await self._collection.insert_one(revendedor)
+
+    async def atualizar_senha(self, cpf: str, senha_atual: str, senha: str):
+        await self._collection.update_one({'cpf': cpf, 'senha': senha_atual}, {'$set': {'senha': senha}})
+
+
+class TokenRepositorioMotor:
+
+    def __init__(self, database):
+        self._collection = database.get_collection('token')
+
+    async def obter(self, token: str) -> dict:
+        return await self._collection.find_one({'token': token})
+
+    async def obter_por_cpf(self, cpf: str) -> dict:
+        return await self._collection.find_one({'cpf': cpf})
+
+    async def inserir(self, token: dict):
+        await self._collection.insert_one(token)
+
+    async def remover(self, token: str):
+        await self._collection.delete_one({'token': token})
+
+
+class CompraRepositorioMotor:
+
+    def __init__(self, database):
+        self._database = database
+        self._collection = database.get_collection('compra')
+        self._collection_leitura = leitura_secundaria(self._collection)
+
+    async def obter(self, codigo: str) -> dict:
+        return await self._collection.find_one({'codigo': codigo})
+
+    async def inserir(self, compra: dict):
+        await self._collection.insert_one(compra)
+
+    async def codigos_cadastrados(self, codigos: [str]) -> set:
+        return {compra['codigo'] async for compra in self._collection.find({'codigo': {'$in': codigos}}, {'codigo': 1})}
+
+    async def inserir_varios(self, compras: [dict]) -> dict:
+        try:
+            await self._collection.insert_many(compras, ordered=False)
+        except BulkWriteError as error:
+            return falhas_insercao(error)
+        return {}
+
+    async def contar(self, cpf_revendedor: str) -> int:
+        return await self._collection_leitura.count_documents({'cpf_revendedor': cpf_revendedor})
+
+    async def listar(self, cpf_revendedor: str, offset: int, limite: int) -> [dict]:
+        return await self._collection_leitura.find({'cpf_revendedor': cpf_revendedor}).skip(offset).limit(
+            limite
+        ).to_list(None)
+
+    async def listar_apos(self, cpf_revendedor: str, posicao: tuple, limite: int) -> [dict]:
+        filtro = filtro_listagem_apos(cpf_revendedor, posicao)
+        return await self._collection_leitura.find(filtro).sort(ORDEM_DATA).limit(limite).to_list(None)
+
+    def percorrer(self, cpf_revendedor: str, tamanho_lote: int):
+        #  Cursor do motor, percorrido com async for
+        result = self._collection_leitura.find({'cpf_revendedor': cpf_revendedor}).sort(ORDEM_DATA)
+        return result.batch_size(tamanho_lote)
+
+    async def versao(self, cpf_revendedor: str) -> int:
+        return sum([
+            controle.get('versao', 0)
+            async for controle in self._database.get_collection('controle').find(filtro_versao_compras(cpf_revendedor))
+        ])
+
+    async def incrementar_versao(self, cpf_revendedor: str):
+        await self._database.get_collection('controle').update_one(
+            {'_id': chave_versao_compras(cpf_revendedor)}, {'$inc': {'versao': 1}}, upsert=True
+        )
+
+
+class CompraMensalRepositorioMotor:
+
+    def __init__(self, database):
+        self._collection = database.get_collection('compra-mensal')
+        self._collection_leitura = leitura_secundaria(self._collection)
+
+    async def incrementar(self, cpf_revendedor: str, ano_mes: str, total: float, quantidade: int):
+        await self._collection.update_one(
+            {'cpf_revendedor': cpf_revendedor, 'ano_mes': ano_mes},
+            {'$inc': {'total': total, 'quantidade': quantidade}},
+            upsert=True
+        )
+
+    async def incrementar_varios(self, totais: dict):
+        if totais:
+            await self._collection.bulk_write(operacoes_incremento_mensal(totais), ordered=False)
+
+    async def obter_total(self, cpf_revendedor: str, ano_mes: str) -> float:
+        result = await self._collection_leitura.find_one({'cpf_revendedor': cpf_revendedor, 'ano_mes': ano_mes})
+        return result['total'] if result else None
+
+    async def obter_totais(self, cpf_revendedor: str, anos_meses: [str]) -> dict:
+        result = self._collection_leitura.find({'cpf_revendedor': cpf_revendedor, 'ano_mes': {'$in': anos_meses}})
+        return {item['ano_mes']: item['total'] async for item in result}
+
+    async def obter_quantidade(self, cpf_revendedor: str) -> int:
+        result = await self._collection_leitura.aggregate(pipeline_quantidade_compras(cpf_revendedor)).to_list(None)
+        return result[0]['quantidade'] if result else 0
+
+
+class RepositoriosMotor:
+
+    def __init__(self, database):
+        self._database = database
+
+    def revendedor(self) -> RevendedorRepositorioMotor:
+        return RevendedorRepositorioMotor(self._database)
+
+    def token(self) -> TokenRepositorioMotor:
+        return TokenRepositorioMotor(self._database)
+
+    def compra(self) -> CompraRepositorioMotor:
+        return CompraRepositorioMotor(self._database)
+
+    def compra_mensal(self) -> CompraMensalRepositorioMotor:
+        return CompraMensalRepositorioMotor(self._database)
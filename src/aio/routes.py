@@ -0,0 +1,165 @@
+import asyncio
+
+from marshmallow import ValidationError
+from quart import Blueprint, request, Response
+
+from src.aio.service import CompraService, RevendedorService, saldo_cashback_cache
+from src.api import validate_request_json, validate_admin_token, validate_token, obter_token, \
+    condicional_por_versao, gerar_etag, resposta_json, resposta_condicional
+from src.api.errors import ApiValidationError
+from src.api.routes import compras_ndjson, compras_json, resumo_lote, listagem, credenciais, estatisticas_caches, \
+    recarregar_pre_aprovados, consultas_lentas, exportacao, cabecalhos_exportacao
+from src.config import EXPORTACAO_LINHAS_POR_BLOCO
+from src.schema import compra_schema, revendedor_schema
+
+#  Mesmas rotas de src.api com handlers assíncronos: decorators, leitura dos payloads e montagem das
+#  respostas são os de src.api, só as chamadas aos serviços são aguardadas
+api_bp = Blueprint('api', __name__)
+
+
+@api_bp.errorhandler(ValidationError)
+async def validation_error_handler(error):
+    return resposta_json(error.normalized_messages(), 400)
+
+
+@api_bp.errorhandler(ApiValidationError)
+async def api_validation_error_handler(error):
+    return resposta_json(error.to_dict(), error.status_code)
+
+
+@api_bp.errorhandler(Exception)
+async def error_handler(error):
+    return resposta_json({'message': 'something went wrong'}, 500)
+
+
+@api_bp.route('/revendedor/<string:cpf>/compra', methods=['POST'])
+@validate_token()
+@validate_request_json()
+async def adcionar_compra(cpf: str):
+    _compra = compra_schema.load(await request.get_json())
+
+    if cpf != _compra.cpf_revendedor:
+        raise ApiValidationError('Cpf informado na rota diferente do payload')
+
+    _compra = await CompraService().salvar(_compra)
+    return resposta_json(_compra, 201)
+
+
+@api_bp.route('/revendedor/<string:cpf>/compras', methods=['POST'])
+@validate_token()
+async def adicionar_compras_lote(cpf: str):
+    if request.mimetype == 'application/x-ndjson':
+        payload = compras_ndjson(await request.get_data(as_text=True))
+    elif request.is_json:
+        payload = compras_json(await request.get_json())
+    else:
+        return Response('Content-type should be application/json or application/x-ndjson', 400)
+
+    return resposta_json(resumo_lote(await CompraService().salvar_lote(cpf, payload)))
+
+
+@api_bp.route('/revendedor/<string:cpf>/compras', methods=['GET'])
+@validate_token()
+@condicional_por_versao()
+async def listar(cpf: str):
+    service = CompraService()
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        result = await service.listar_por_cursor(cpf, cursor, total_exato=request.args.get('total') == 'exato')
+    else:
+        offset = request.args.get('offset')
+        result = await service.listar_paginado(cpf, int(offset) if offset else 0)
+
+    compras_cashback = await service.calcular_cashback(result['compras'])
+    return resposta_json(listagem(result, compras_cashback, cursor is not None))
+
+
+async def _exportar(formato, compras):
+    bloco = [formato.cabecalho()]
+    async for compra in compras:
+        bloco.append(formato.linha(compra))
+        if len(bloco) >= EXPORTACAO_LINHAS_POR_BLOCO:
+            yield b''.join(bloco)
+            bloco = []
+    if bloco:
+        yield b''.join(bloco)
+
+
+@api_bp.route('/revendedor/<string:cpf>/compras/exportar', methods=['GET'])
+@validate_token()
+@condicional_por_versao()
+async def exportar(cpf: str):
+    formato = request.args.get('formato', 'ndjson')
+    _exportacao = exportacao(formato)
+    compras = await CompraService().exportar(cpf)
+
+    return Response(
+        _exportar(_exportacao, compras),
+        status=200,
+        mimetype=_exportacao.mimetype,
+        headers=cabecalhos_exportacao(cpf, formato)
+    )
+
+
+@api_bp.route('/revendedor/', methods=['POST'])
+@validate_request_json()
+async def create():
+    payload = await request.get_json()
+    revendedor = revendedor_schema.load(payload)
+    service = RevendedorService()
+    result = await service.obter(revendedor.cpf)
+    if not result:
+        await service.salvar(revendedor)
+        return resposta_json(payload, 201)
+
+    return Response('Revendedor já cadastrado', status=400, mimetype='application/json')
+
+
+@api_bp.route('/revendedor/login', methods=['POST'])
+@validate_request_json()
+async def login():
+    cpf, senha = credenciais(await request.get_json())
+
+    result, token = await RevendedorService().login(cpf, senha)
+
+    if result:
+        return resposta_json({'token': token})
+
+    return Response('', 401, mimetype='application/json')
+
+
+@api_bp.route('/revendedor/logout', methods=['POST'])
+async def logout():
+    token = obter_token()
+    if not token:
+        raise ApiValidationError('Informe o token no header Authorization')
+
+    await RevendedorService().logout(token)
+    return Response('', 204)
+
+
+@api_bp.route('/revendedor/<string:cpf>/cashback', methods=['GET'])
+@validate_token()
+async def obter_saldo_cashback(cpf: str):
+    saldo = await CompraService().obter_cashback_acumulado(cpf)
+    return resposta_condicional(saldo, gerar_etag(request.endpoint, cpf, saldo['saldo'], saldo['atualizado_em']))
+
+
+@api_bp.route('/admin/revendedor-pre-aprovado/recarregar', methods=['POST'])
+@validate_admin_token()
+async def recarregar_revendedores_pre_aprovados():
+    #  A recarga usa o client síncrono, fora do event loop
+    return resposta_json(await asyncio.to_thread(recarregar_pre_aprovados))
+
+
+@api_bp.route('/admin/caches', methods=['GET'])
+@validate_admin_token()
+async def obter_estatisticas_caches():
+    return resposta_json(estatisticas_caches(saldo_cashback_cache))
+
+
+@api_bp.route('/admin/consultas-lentas', methods=['GET'])
+@validate_admin_token()
+async def listar_consultas_lentas():
+    return resposta_json(consultas_lentas(request.args))
@@ -0,0 +1,254 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from src import mongo
+from src.aio import async_mongo
+from src.aio.cashback_api import cashback_api_client
+from src.aio.repositorio import RepositoriosMotor
+from src.api.errors import ApiValidationError
+from src.cache import AsyncStaleWhileRevalidateCache
+from src.config import SALDO_CACHE_TTL, SALDO_CACHE_STALE, SALDO_CACHE_TAMANHO, COMPRA_LOTE_TAMANHO, \
+    EXPORTACAO_BATCH_SIZE, TOKEN_MODO
+from src.domain.cashback_api import CashbackApiError
+from src.domain.pre_aprovado import revendedor_pre_aprovado_cache
+from src.domain.senha import gerar_hash, verificar_senha
+from src.domain.service import TAMANHO_PAGINA, revendedor_cache, ano_mes, decodificar_cursor, \
+    validar_compras_lote, preparar_compras_lote, registrar_insercao_lote, totais_mensais, percentual_por_total, \
+    percentuais_por_mes, compra_cashback, meses_por_revendedor, aplicar_cashback, pagina_por_cursor, saldo_cashback
+from src.domain.token import gerar_token, verificar_token, revogar_token, token_revogado_cache
+from src.model import Revendedor, Compra, CompraCashBack
+from src.repositorio import obter_repositorios
+from src.schema import revendedor_schema, revendedor_armazenado_schema, compra_schema
+
+#  Serviços da api asyncio (src.aio): os mesmos passos de src.domain.service sobre os repositórios do
+#  motor, com as regras sem acesso ao banco importadas de lá. O cache de revendedores é compartilhado
+#  com a api síncrona; o de saldo tem versão própria para corrotinas.
+saldo_cashback_cache = AsyncStaleWhileRevalidateCache(
+    ttl=SALDO_CACHE_TTL, tempo_stale=SALDO_CACHE_STALE, tamanho_maximo=SALDO_CACHE_TAMANHO
+)
+
+
+class RevendedorService:
+
+    def __init__(self):
+        repositorios = RepositoriosMotor(async_mongo.db)
+        self._revendedor_repositorio = repositorios.revendedor()
+        self._token_repositorio = repositorios.token()
+
+    async def salvar(self, revendedor: Revendedor):
+        _revendedor = await self._revendedor_repositorio.obter(revendedor.cpf)
+        if _revendedor:
+            return
+        _model = revendedor_schema.dump(revendedor)
+        #  O hash roda no pool de processos, a thread apenas aguarda o resultado
+        _model['senha'] = await asyncio.to_thread(gerar_hash, revendedor.senha)
+        await self._revendedor_repositorio.inserir(_model)
+        revendedor_cache.invalidar(revendedor.cpf)
+
+    async def obter(self, cpf: str) -> Revendedor:
+        if not cpf:
+            return None
+
+        revendedor = revendedor_cache.obter(cpf)
+        if revendedor:
+            return revendedor
+
+        result = await self._revendedor_repositorio.obter(cpf)
+        if result:
+            revendedor = revendedor_armazenado_schema.load(result, unknown='EXCLUDE')
+            revendedor_cache.definir(cpf, revendedor)
+            return revendedor
+        return None
+
+    async def login(self, cpf: str, senha: str):
+        revendedor = await self._revendedor_repositorio.obter(cpf)
+        if not revendedor:
+            return False, None
+
+        valida, atualizar_hash = await asyncio.to_thread(verificar_senha, senha, revendedor.get('senha'))
+        if valida:
+            if atualizar_hash:
+                await self._revendedor_repositorio.atualizar_senha(
+                    cpf, revendedor['senha'], await asyncio.to_thread(gerar_hash, senha)
+                )
+
+            if TOKEN_MODO == 'assinado':
+                return True, gerar_token(cpf)
+
+            token = await self._token_repositorio.obter_por_cpf(cpf)
+            if not token:
+                token = {'cpf': cpf, 'token': str(uuid.uuid4()), 'created_at': datetime.now()}
+                await self._token_repositorio.inserir(token)
+            return True, token['token']
+
+        return False, None
+
+    async def verificar_token(self, token: str) -> str:
+        if TOKEN_MODO == 'assinado':
+            #  Sem a carga na inicialização, a primeira carga dos revogados (pymongo) roda fora do event loop
+            if not token_revogado_cache.carregado:
+                await asyncio.to_thread(token_revogado_cache.carregar)
+            return verificar_token(token)
+
+        _token = await self._token_repositorio.obter(token)
+        return _token['cpf'] if _token else None
+
+    async def logout(self, token: str):
+        if TOKEN_MODO == 'assinado':
+            await asyncio.to_thread(revogar_token, obter_repositorios(mongo.db).token(), token)
+        else:
+            await self._token_repositorio.remover(token)
+
+
+class CompraService:
+
+    def __init__(self):
+        repositorios = RepositoriosMotor(async_mongo.db)
+        self._compra_repositorio = repositorios.compra()
+        self._compra_mensal_repositorio = repositorios.compra_mensal()
+        self._revendedor_service = RevendedorService()
+
+    async def _validar_revendedor(self, cpf: str):
+        _revendedor = await self._revendedor_service.obter(cpf)
+        if not _revendedor:
+            raise ApiValidationError('O revendedor informado não foi encontrado.', status_code=404)
+        return _revendedor
+
+    @staticmethod
+    def _obter_status(cpf_revendedor: str) -> str:
+        #  Conjunto em memória carregado na inicialização, a consulta não bloqueia o loop
+        if revendedor_pre_aprovado_cache.contem(cpf_revendedor):
+            return Compra.STATUS_APROVADO
+        return Compra.STATUS_EM_VALIDACAO
+
+    async def salvar(self, compra: Compra) -> dict:
+        await self._validar_revendedor(compra.cpf_revendedor)
+
+        _compra = await self._compra_repositorio.obter(compra.codigo)
+        if _compra:
+            raise ApiValidationError('Compra já cadastrada.')
+
+        compra.status = self._obter_status(compra.cpf_revendedor)
+        _compra = compra_schema.dump(compra)
+
+        await self._compra_repositorio.inserir(dict(_compra, data=compra.data))
+        await self._compra_mensal_repositorio.incrementar(
+            compra.cpf_revendedor, ano_mes(compra.data), compra.valor, 1
+        )
+        await self._compra_repositorio.incrementar_versao(compra.cpf_revendedor)
+        return _compra
+
+    async def salvar_lote(self, cpf_revendedor: str, compras: [dict]) -> [dict]:
+        await self._validar_revendedor(cpf_revendedor)
+        _status = self._obter_status(cpf_revendedor)
+
+        resultados = []
+        for inicio in range(0, len(compras), COMPRA_LOTE_TAMANHO):
+            resultados.extend(
+                await self._salvar_lote(cpf_revendedor, _status, compras[inicio:inicio + COMPRA_LOTE_TAMANHO], inicio)
+            )
+        return resultados
+
+    async def _salvar_lote(self, cpf_revendedor: str, status: str, compras: [dict], inicio: int) -> [dict]:
+        resultados = [None] * len(compras)
+        validas = validar_compras_lote(cpf_revendedor, compras, inicio, resultados)
+
+        cadastradas = await self._compra_repositorio.codigos_cadastrados(list(validas)) if validas else set()
+
+        documentos = preparar_compras_lote(validas, cadastradas, status, inicio, resultados)
+
+        falhas = {}
+        if documentos:
+            falhas = await self._compra_repositorio.inserir_varios([_compra for _, _, _compra in documentos])
+
+        salvas = registrar_insercao_lote(documentos, falhas, inicio, resultados)
+        await self._compra_mensal_repositorio.incrementar_varios(totais_mensais(salvas))
+        if salvas:
+            await self._compra_repositorio.incrementar_versao(cpf_revendedor)
+        return resultados
+
+    async def obter_versao(self, cpf_revendedor: str) -> int:
+        return await self._compra_repositorio.versao(cpf_revendedor)
+
+    async def listar_paginado(self, cpf_revendedor: str, offset: int):
+        total = await self._compra_repositorio.contar(cpf_revendedor)
+        result = await self._compra_repositorio.listar(cpf_revendedor, offset, TAMANHO_PAGINA)
+
+        compras = compra_schema.load(result, many=True, unknown='EXCLUDE')
+
+        return {'total': total, 'compras': compras}
+
+    async def listar_por_cursor(self, cpf_revendedor: str, cursor: str = None, total_exato: bool = False):
+        posicao = decodificar_cursor(cursor) if cursor else None
+        result, proximo = pagina_por_cursor(
+            await self._compra_repositorio.listar_apos(cpf_revendedor, posicao, TAMANHO_PAGINA + 1)
+        )
+
+        compras = compra_schema.load(result, many=True, unknown='EXCLUDE')
+
+        if total_exato:
+            total = await self._compra_repositorio.contar(cpf_revendedor)
+        else:
+            total = await self.obter_quantidade_compras(cpf_revendedor)
+
+        return {'total': total, 'compras': compras, 'next': proximo}
+
+    async def obter_quantidade_compras(self, cpf_revendedor: str) -> int:
+        return await self._compra_mensal_repositorio.obter_quantidade(cpf_revendedor)
+
+    async def obter_percentual_cashback(self, cpf_revendedor: str, ano: int, mes: int):
+        total = await self._compra_mensal_repositorio.obter_total(cpf_revendedor, f'{ano}-{mes:02}')
+
+        if total is not None:
+            return percentual_por_total(total)
+
+        return 10
+
+    async def obter_percentuais_cashback(self, cpf_revendedor: str, anos_meses: [tuple]) -> dict:
+        anos_meses = sorted(set(anos_meses))
+        if not anos_meses:
+            return {}
+
+        totais = await self._compra_mensal_repositorio.obter_totais(
+            cpf_revendedor, [f'{ano}-{mes:02}' for ano, mes in anos_meses]
+        )
+
+        return percentuais_por_mes(anos_meses, totais)
+
+    async def calcular_cashback(self, compras: [Compra]) -> [CompraCashBack]:
+        dict_cashback = {}
+        for cpf_revendedor, anos_meses in meses_por_revendedor(compras).items():
+            for _ano_mes, percentual in (await self.obter_percentuais_cashback(cpf_revendedor, anos_meses)).items():
+                dict_cashback[(cpf_revendedor, _ano_mes)] = percentual
+
+        return aplicar_cashback(compras, dict_cashback)
+
+    async def exportar(self, cpf_revendedor: str):
+        await self._validar_revendedor(cpf_revendedor)
+        return self._exportar(cpf_revendedor)
+
+    async def _exportar(self, cpf_revendedor: str):
+        result = self._compra_repositorio.percorrer(cpf_revendedor, EXPORTACAO_BATCH_SIZE)
+
+        _mes = None
+        percentual_cashback = None
+        async for _compra in result:
+            compra = compra_schema.load(_compra, unknown='EXCLUDE')
+            if (compra.data.year, compra.data.month) != _mes:
+                _mes = (compra.data.year, compra.data.month)
+                percentual_cashback = await self.obter_percentual_cashback(cpf_revendedor, *_mes)
+
+            yield compra_cashback(compra, percentual_cashback)
+
+    async def obter_cashback_acumulado(self, cpf_revendedor: str):
+        await self._validar_revendedor(cpf_revendedor)
+
+        try:
+            credito, atualizado_em = await saldo_cashback_cache.obter_ou_carregar(
+                cpf_revendedor, lambda: cashback_api_client().obter_credito(cpf_revendedor)
+            )
+        except CashbackApiError:
+            raise ApiValidationError('Não foi possível obter o cashback acumulado.', status_code=503)
+
+        return saldo_cashback(cpf_revendedor, credito, atualizado_em)
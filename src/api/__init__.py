@@ -1,22 +1,33 @@
-from functools import wraps
+from flask import Blueprint
 
-from flask import Blueprint, request, Response
+from src.config import PROFILING_HABILITADO
+from . import serializacao
+from .decoradores import contexto, obter_token, validate_request_json, validate_admin_token, \
+    validate_token, gerar_etag, nao_modificado, condicional_por_versao
 
 api_bp = Blueprint('api', __name__)
 
 
-def validate_request_json():
-    def decorator(fn):
-        @wraps(fn)
-        def wrapper(*args, **kwargs):
-            if not request.is_json:
-                return Response('Content-type should be application/json', 400)
-            return fn(*args, **kwargs)
+def resposta_json(dados, status: int = 200):
+    #  Todas as respostas json das duas apis passam pelo encoder configurado (orjson ou json da biblioteca padrão)
+    _, Response = contexto()
+    return Response(serializacao.codificar(dados), status, mimetype='application/json')
 
-        return wrapper
 
-    return decorator
+def resposta_condicional(dados, etag: str):
+    #  304 se o If-None-Match tem a ETag, senão os dados em json com a ETag
+    response = nao_modificado(etag)
+    if response is None:
+        response = resposta_json(dados)
+        response.set_etag(etag)
+    return response
 
 
-from . import routes, errors
+from . import routes, errors, compressao
+
+api_bp.after_request(compressao.comprimir_resposta)
+
+if PROFILING_HABILITADO:
+    from . import profiling
+    profiling.registrar(api_bp)
 
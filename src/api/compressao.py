@@ -0,0 +1,52 @@
+import gzip
+
+from flask import request
+
+from src.config import COMPRESSAO_TAMANHO_MINIMO, COMPRESSAO_NIVEL_GZIP, COMPRESSAO_QUALIDADE_BROTLI
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional, sem ele as respostas usam apenas gzip
+    brotli = None
+
+MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+
+def _gzip(dados: bytes) -> bytes:
+    return gzip.compress(dados, compresslevel=COMPRESSAO_NIVEL_GZIP)
+
+
+def _brotli(dados: bytes) -> bytes:
+    return brotli.compress(dados, quality=COMPRESSAO_QUALIDADE_BROTLI)
+
+
+def codificacoes() -> dict:
+    #  Em ordem de preferência quando o cliente aceita as duas com o mesmo peso
+    if brotli is not None:
+        return {'br': _brotli, 'gzip': _gzip}
+    return {'gzip': _gzip}
+
+
+def comprimir_resposta(response):
+    #  Respostas em streaming (exportação) e pequenas seguem sem compressão
+    if response.status_code != 200 or response.is_streamed or response.mimetype not in MIMETYPES \
+            or 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.content_length is None or response.content_length < COMPRESSAO_TAMANHO_MINIMO:
+        return response
+
+    disponiveis = codificacoes()
+    codificacao = request.accept_encodings.best_match(list(disponiveis))
+    if codificacao is None:
+        return response
+
+    response.set_data(disponiveis[codificacao](response.get_data()))
+    response.headers['Content-Encoding'] = codificacao
+
+    #  A representação comprimida é outra: a ETag forte recebe o sufixo da codificação
+    etag, fraca = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{codificacao}', fraca)
+    return response
@@ -0,0 +1,192 @@
+import hashlib
+import hmac
+import inspect
+from functools import wraps
+
+import flask
+
+from src.config import ADMIN_TOKEN, AUTENTICACAO_OBRIGATORIA, MONGO_LEITURA_SECUNDARIA
+
+#  Decorators das rotas das duas apis: handlers síncronos (src.api, Flask) e corrotinas (src.aio, Quart).
+#  As verificações são as mesmas, só a chamada do handler e do serviço muda.
+
+#  Sufixos das ETags das representações comprimidas (src/api/compressao.py)
+_SUFIXOS_ETAG = ('', '-br', '-gzip')
+
+
+def contexto() -> tuple:
+    #  request e Response do framework que atende a requisição em andamento
+    if flask.has_request_context():
+        return flask.request, flask.Response
+    import quart
+    return quart.request, quart.Response
+
+
+def token_admin_valido(token: str) -> bool:
+    #  compare_digest de str só aceita ASCII: um header com outros caracteres seria um TypeError (500)
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def obter_token() -> str:
+    request, _ = contexto()
+    autorizacao = request.headers.get('Authorization', '')
+    if autorizacao.startswith('Bearer '):
+        return autorizacao[len('Bearer '):]
+    return ''
+
+
+def _decorator(verificar):
+    #  verificar(kwargs) retorna a resposta de erro, ou None para seguir para o handler
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def wrapper_async(*args, **kwargs):
+                response = verificar(kwargs)
+                if response is not None:
+                    return response
+                return await fn(*args, **kwargs)
+
+            return wrapper_async
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            response = verificar(kwargs)
+            if response is not None:
+                return response
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _verificar_json(kwargs):
+    request, Response = contexto()
+    if not request.is_json:
+        return Response('Content-type should be application/json', 400)
+    return None
+
+
+def _verificar_admin(kwargs):
+    request, Response = contexto()
+    if not token_admin_valido(request.headers.get('X-Admin-Token', '')):
+        return Response('', 403)
+    return None
+
+
+def validate_request_json():
+    return _decorator(_verificar_json)
+
+
+def validate_admin_token():
+    return _decorator(_verificar_admin)
+
+
+def _verificar_cpf_token(cpf: str, kwargs):
+    _, Response = contexto()
+    if not cpf:
+        return Response('', 401)
+    if 'cpf' in kwargs and kwargs['cpf'] != cpf:
+        return Response('', 403)
+    return None
+
+
+def validate_token():
+    #  Confere o token do revendedor e se ele corresponde ao cpf da rota
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def wrapper_async(*args, **kwargs):
+                if AUTENTICACAO_OBRIGATORIA:
+                    from src.aio.service import RevendedorService
+
+                    token = obter_token()
+                    cpf = await RevendedorService().verificar_token(token) if token else None
+                    response = _verificar_cpf_token(cpf, kwargs)
+                    if response is not None:
+                        return response
+                return await fn(*args, **kwargs)
+
+            return wrapper_async
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if AUTENTICACAO_OBRIGATORIA:
+                from src.domain.service import RevendedorService
+
+                token = obter_token()
+                cpf = RevendedorService().verificar_token(token) if token else None
+                response = _verificar_cpf_token(cpf, kwargs)
+                if response is not None:
+                    return response
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def gerar_etag(*partes) -> str:
+    return hashlib.sha1('|'.join(map(str, partes)).encode()).hexdigest()
+
+
+def nao_modificado(etag: str):
+    #  Resposta 304 se o If-None-Match tem a ETag, de qualquer uma das codificações
+    request, Response = contexto()
+    for sufixo in _SUFIXOS_ETAG:
+        if request.if_none_match.contains_weak(etag + sufixo):
+            response = Response('', 304)
+            response.set_etag(etag + sufixo)
+            return response
+    return None
+
+
+def _etag_por_versao(cpf: str, versao: int) -> str:
+    request, _ = contexto()
+    return gerar_etag(request.endpoint, cpf, versao, request.query_string.decode())
+
+
+def _definir_etag(response, etag: str):
+    if response.status_code == 200:
+        response.set_etag(etag)
+    return response
+
+
+def condicional_por_versao():
+    #  ETag forte a partir da versão das compras do revendedor (incrementada a cada compra gravada), da rota
+    #  e dos parâmetros. Com o If-None-Match igual a resposta é 304, sem consultar as compras.
+    #  Com MONGO_LEITURA_SECUNDARIA as compras podem vir de um secundário atrás da versão (lida no primário)
+    #  e uma ETag nova ficaria associada a compras antigas, então as respostas seguem sem ETag.
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def wrapper_async(*args, **kwargs):
+                if MONGO_LEITURA_SECUNDARIA:
+                    return await fn(*args, **kwargs)
+
+                from src.aio.service import CompraService
+
+                etag = _etag_por_versao(kwargs['cpf'], await CompraService().obter_versao(kwargs['cpf']))
+                response = nao_modificado(etag)
+                if response is not None:
+                    return response
+                return _definir_etag(await fn(*args, **kwargs), etag)
+
+            return wrapper_async
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if MONGO_LEITURA_SECUNDARIA:
+                return fn(*args, **kwargs)
+
+            from src.domain.service import CompraService
+
+            etag = _etag_por_versao(kwargs['cpf'], CompraService().obter_versao(kwargs['cpf']))
+            response = nao_modificado(etag)
+            if response is not None:
+                return response
+            return _definir_etag(fn(*args, **kwargs), etag)
+
+        return wrapper
+
+    return decorator
@@ -1,7 +1,6 @@
-from flask import jsonify
 from marshmallow import ValidationError
 
-from . import api_bp
+from . import api_bp, resposta_json
 
 
 class ApiValidationError(Exception):
@@ -19,20 +18,14 @@ class ApiValidationError(Exception):
 
 @api_bp.errorhandler(ValidationError)
 def error_handler(error):
-    response = jsonify(error.normalized_messages())
-    response.status_code = 400
-    return response
+    return resposta_json(error.normalized_messages(), 400)
 
 
 @api_bp.errorhandler(ApiValidationError)
 def error_handler(error):
-    response = jsonify(error.to_dict())
-    response.status_code = error.status_code
-    return response
+    return resposta_json(error.to_dict(), error.status_code)
 
 
 @api_bp.errorhandler(Exception)
 def error_handler(error):
-    response = jsonify({'message': 'something went wrong'})
-    response.status_code = 500
-    return response
+    return resposta_json({'message': 'something went wrong'}, 500)
@@ -0,0 +1,147 @@
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import g, request
+
+from src.api.decoradores import token_admin_valido
+from src.config import (
+    PROFILING_AMOSTRAGEM,
+    PROFILING_DIRETORIO,
+    PROFILING_FORMATO,
+    PROFILING_INTERVALO_PILHAS,
+)
+
+#  Com o token administrativo neste header a requisição é perfilada independente da amostragem
+HEADER_PROFILING = 'X-Profile'
+#  Nome do arquivo gerado, devolvido na resposta
+HEADER_ARQUIVO = 'X-Profile-Arquivo'
+
+
+class PerfilCProfile:
+    #  Tempo de cada função com o cProfile, gravado no formato do pstats (python -m pstats, snakeviz).
+    #  Um perfil por processo: a partir do Python 3.12 o cProfile usa o sys.monitoring, que aceita um único
+    #  profiler ativo, e um segundo enable() em outra thread do worker (gthread) falharia. Com um perfil em
+    #  andamento as demais requisições seguem sem perfil.
+    extensao = 'prof'
+    _em_uso = threading.Lock()
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+        self._iniciado = False
+
+    def iniciar(self) -> bool:
+        if not self._em_uso.acquire(blocking=False):
+            return False
+        try:
+            self._profile.enable()
+        except BaseException:
+            self._em_uso.release()
+            raise
+        self._iniciado = True
+        return True
+
+    def parar(self):
+        if not self._iniciado:
+            return
+        self._profile.disable()
+        self._iniciado = False
+        self._em_uso.release()
+
+    def salvar(self, caminho: str):
+        self._profile.dump_stats(caminho)
+
+
+class PerfilPilhas:
+    #  Amostra a pilha da thread da requisição a cada intervalo e grava as pilhas no formato
+    #  collapsed (uma linha "raiz;...;funcao quantidade"), lido pelo flamegraph.pl e speedscope
+
+    extensao = 'collapsed'
+
+    def __init__(self, intervalo: float = None):
+        self._intervalo = intervalo or PROFILING_INTERVALO_PILHAS
+        self._thread_id = threading.get_ident()
+        self._pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def iniciar(self) -> bool:
+        self._thread.start()
+        return True
+
+    def _amostrar(self):
+        while not self._parar.wait(self._intervalo):
+            frame = sys._current_frames().get(self._thread_id)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f'{codigo.co_name} ({codigo.co_filename}:{codigo.co_firstlineno})')
+                frame = frame.f_back
+            if pilha:
+                self._pilhas[';'.join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def salvar(self, caminho: str):
+        with open(caminho, 'w') as arquivo:
+            for pilha, quantidade in self._pilhas.items():
+                arquivo.write(f'{pilha} {quantidade}\n')
+
+
+FORMATOS = {'pstats': PerfilCProfile, 'collapsed': PerfilPilhas}
+
+
+def _solicitado() -> bool:
+    token = request.headers.get(HEADER_PROFILING)
+    if token is not None:
+        return token_admin_valido(token)
+    return PROFILING_AMOSTRAGEM > 0 and random.random() < PROFILING_AMOSTRAGEM
+
+
+def _iniciar():
+    if not _solicitado():
+        return
+
+    perfil = FORMATOS[PROFILING_FORMATO]()
+    nome = f'{time.strftime("%Y%m%d-%H%M%S")}-{request.endpoint}-{uuid.uuid4().hex[:8]}.{perfil.extensao}'
+    if perfil.iniciar():
+        g.profiling = (perfil, nome)
+
+
+def _finalizar():
+    perfil, nome = g.pop('profiling', (None, None))
+    if perfil is None:
+        return None
+
+    perfil.parar()
+    os.makedirs(PROFILING_DIRETORIO, exist_ok=True)
+    perfil.salvar(os.path.join(PROFILING_DIRETORIO, nome))
+    return nome
+
+
+def _after_request(response):
+    #  Em respostas em streaming o envio do corpo fica fora do perfil
+    nome = _finalizar()
+    if nome:
+        response.headers[HEADER_ARQUIVO] = nome
+    return response
+
+
+def _teardown_request(exc):
+    _finalizar()
+
+
+def registrar(blueprint):
+    #  Chamado apenas com PROFILING_HABILITADO: desabilitado, nenhum hook é registrado
+    if PROFILING_FORMATO not in FORMATOS:
+        raise ValueError(f'PROFILING_FORMATO deve ser um de {", ".join(FORMATOS)}')
+    blueprint.before_request(_iniciar)
+    blueprint.after_request(_after_request)
+    blueprint.teardown_request(_teardown_request)
@@ -1,55 +1,201 @@
 import base64
+import csv
+import io
 import json
 
-from flask import request, Response
-from . import api_bp, validate_request_json
+from flask import request, Response, stream_with_context
+from . import api_bp, validate_request_json, validate_admin_token, validate_token, obter_token, \
+    condicional_por_versao, gerar_etag, resposta_json, resposta_condicional
 from .errors import ApiValidationError
-from ..domain.service import CompraService, RevendedorService
-from ..schema import CompraSchema, CompraCashBackSchema, RevendedorSchema
+from ..config import EXPORTACAO_LINHAS_POR_BLOCO
+from ..consulta_lenta import consulta_lenta_listener
+from ..domain.pre_aprovado import revendedor_pre_aprovado_cache
+from ..domain.service import CompraService, RevendedorService, revendedor_cache, saldo_cashback_cache
+from .serializacao import codificar
+from ..schema import compra_schema, compra_cashback_dict, revendedor_schema
+
+
+#  Leitura dos payloads e montagem das respostas, compartilhadas com os handlers assíncronos (src/aio/routes.py)
+def compras_ndjson(dados: str) -> [dict]:
+    try:
+        return [json.loads(linha) for linha in dados.splitlines() if linha.strip()]
+    except ValueError:
+        raise ApiValidationError('NDJSON inválido')
+
+
+def compras_json(payload) -> [dict]:
+    if not isinstance(payload, list):
+        raise ApiValidationError('Informe uma lista de compras')
+    return payload
+
+
+def resumo_lote(resultados: [dict]) -> dict:
+    criadas = sum(1 for resultado in resultados if resultado['status'] == 'criada')
+    return {'criadas': criadas, 'erros': len(resultados) - criadas, 'resultados': resultados}
+
+
+def listagem(result: dict, compras_cashback: list, cursor: bool) -> dict:
+    response = {'compras': [compra_cashback_dict(compra) for compra in compras_cashback], 'total': result['total']}
+    if cursor:
+        response['next'] = result['next']
+    return response
+
+
+def credenciais(payload: dict) -> tuple:
+    if not payload.get('cpf') or not payload.get('senha'):
+        raise ApiValidationError('Informe cpf e senha no request')
+
+    return payload['cpf'], base64.b64decode(payload['senha']).decode()
+
+
+def estatisticas_caches(saldo_cache) -> dict:
+    return {'revendedor': revendedor_cache.estatisticas(), 'saldo_cashback': saldo_cache.estatisticas()}
+
+
+def recarregar_pre_aprovados() -> dict:
+    #  Incrementa a versão para que os demais processos também recarreguem no próximo intervalo
+    revendedor_pre_aprovado_cache.incrementar_versao()
+    quantidade = revendedor_pre_aprovado_cache.carregar()
+    return {'quantidade': quantidade, 'versao': revendedor_pre_aprovado_cache.versao}
+
+
+def consultas_lentas(args) -> list:
+    #  Comandos do Mongo acima de CONSULTA_LENTA_LIMITE_MS, mais recentes primeiro (?colecao=compra&limite=20)
+    return consulta_lenta_listener.registros(args.get('colecao'), args.get('limite', type=int))
+
+
+CAMPOS_EXPORTACAO = [
+    'codigo', 'cpf_revendedor', 'valor', 'data', 'status', 'percentual_cashback', 'valor_cashback'
+]
+
+
+class ExportacaoNdjson:
+    mimetype = 'application/x-ndjson'
+
+    def cabecalho(self) -> bytes:
+        return b''
+
+    def linha(self, compra) -> bytes:
+        return codificar(compra_cashback_dict(compra)) + b'\n'
+
+
+class ExportacaoCsv:
+    mimetype = 'text/csv'
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=CAMPOS_EXPORTACAO)
+
+    def _conteudo(self) -> bytes:
+        conteudo = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return conteudo
+
+    def cabecalho(self) -> bytes:
+        self._writer.writeheader()
+        return self._conteudo()
+
+    def linha(self, compra) -> bytes:
+        linha = compra_cashback_dict(compra)
+        self._writer.writerow(dict(linha, data=linha['data'].isoformat()))
+        return self._conteudo()
+
+
+FORMATOS_EXPORTACAO = {'ndjson': ExportacaoNdjson, 'csv': ExportacaoCsv}
+
+
+def exportacao(formato: str):
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ApiValidationError('Formato inválido, utilize ndjson ou csv')
+    return FORMATOS_EXPORTACAO[formato]()
+
+
+def cabecalhos_exportacao(cpf: str, formato: str) -> dict:
+    return {'Content-Disposition': f'attachment; filename=compras-{cpf}.{formato}'}
 
 
 @api_bp.route('/revendedor/<string:cpf>/compra', methods=['POST'])
+@validate_token()
 @validate_request_json()
 def adcionar_compra(cpf: str):
-    payload = request.json
-
-    errors = CompraSchema().validate(payload)
-    if errors:
-        return Response(json.dumps(errors), status=400, mimetype='application/json')
+    #  Erros de validação do load são tratados pelo errorhandler de ValidationError (400)
+    _compra = compra_schema.load(request.json)
 
-    if cpf != payload['cpf_revendedor']:
+    if cpf != _compra.cpf_revendedor:
         raise ApiValidationError('Cpf informado na rota diferente do payload')
 
-    _compra = CompraSchema().load(payload)
     _compra = CompraService().salvar(_compra)
-    return Response(CompraSchema().dumps(_compra), status=201, mimetype='application/json')
+    return resposta_json(_compra, 201)
+
+
+@api_bp.route('/revendedor/<string:cpf>/compras', methods=['POST'])
+@validate_token()
+def adicionar_compras_lote(cpf: str):
+    if request.mimetype == 'application/x-ndjson':
+        payload = compras_ndjson(request.get_data(as_text=True))
+    elif request.is_json:
+        payload = compras_json(request.json)
+    else:
+        return Response('Content-type should be application/json or application/x-ndjson', 400)
+
+    return resposta_json(resumo_lote(CompraService().salvar_lote(cpf, payload)))
 
 
 @api_bp.route('/revendedor/<string:cpf>/compras', methods=['GET'])
+@validate_token()
+@condicional_por_versao()
 def listar(cpf: str):
-    offset = request.args.get('offset')
-    if not offset:
-        offset = 0
+    service = CompraService()
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        result = service.listar_por_cursor(cpf, cursor, total_exato=request.args.get('total') == 'exato')
     else:
-        offset = int(offset)
+        offset = request.args.get('offset')
+        result = service.listar_paginado(cpf, int(offset) if offset else 0)
 
-    service = CompraService()
-    result = service.listar_paginado(cpf, offset)
     compras_cashback = service.calcular_cashback(result['compras'])
-    response = {'compras': CompraCashBackSchema().dump(compras_cashback, many=True), 'total': result['total']}
+    return resposta_json(listagem(result, compras_cashback, cursor is not None))
+
+
+def _exportar(formato, compras):
+    #  Envia as linhas em blocos para não fazer uma escrita no socket por compra
+    bloco = [formato.cabecalho()]
+    for compra in compras:
+        bloco.append(formato.linha(compra))
+        if len(bloco) >= EXPORTACAO_LINHAS_POR_BLOCO:
+            yield b''.join(bloco)
+            bloco = []
+    if bloco:
+        yield b''.join(bloco)
+
 
-    return Response(json.dumps(response), status=200, mimetype='application/json')
+@api_bp.route('/revendedor/<string:cpf>/compras/exportar', methods=['GET'])
+@validate_token()
+@condicional_por_versao()
+def exportar(cpf: str):
+    formato = request.args.get('formato', 'ndjson')
+    _exportacao = exportacao(formato)
+    compras = CompraService().exportar(cpf)
+
+    return Response(
+        stream_with_context(_exportar(_exportacao, compras)),
+        status=200,
+        mimetype=_exportacao.mimetype,
+        headers=cabecalhos_exportacao(cpf, formato)
+    )
 
 
 @api_bp.route('/revendedor/', methods=['POST'])
 @validate_request_json()
 def create():
     payload = request.json
-    revendedor = RevendedorSchema().load(payload)
+    revendedor = revendedor_schema.load(payload)
     result = RevendedorService().obter(revendedor.cpf)
     if not result:
         RevendedorService().salvar(revendedor)
-        return Response(json.dumps(payload), status=201, mimetype='application/json')
+        return resposta_json(payload, 201)
 
     return Response('Revendedor já cadastrado', status=400, mimetype='application/json')
 
@@ -57,24 +203,48 @@ def create():
 @api_bp.route('/revendedor/login', methods=['POST'])
 @validate_request_json()
 def login():
-    payload = request.json
-
-    if not payload.get('cpf') or not payload.get('senha'):
-        raise ApiValidationError('Informe cpf e senha no request')
-
-    cpf = payload['cpf']
-    senha = payload['senha']
-    senha = base64.b64decode(senha).decode()
+    cpf, senha = credenciais(request.json)
 
     result, token = RevendedorService().login(cpf, senha)
 
     if result:
-        return Response(json.dumps({'token': token}), 200, mimetype='application/json')
+        return resposta_json({'token': token})
 
     return Response('', 401, mimetype='application/json')
 
 
+@api_bp.route('/revendedor/logout', methods=['POST'])
+def logout():
+    token = obter_token()
+    if not token:
+        raise ApiValidationError('Informe o token no header Authorization')
+
+    RevendedorService().logout(token)
+    return Response('', 204)
+
+
 @api_bp.route('/revendedor/<string:cpf>/cashback', methods=['GET'])
+@validate_token()
 def obter_saldo_cashback(cpf: str):
     saldo = CompraService().obter_cashback_acumulado(cpf)
-    return Response(json.dumps(saldo), 200, mimetype='application/json')
+
+    #  O saldo vem da api de cashback (pelo cache): a ETag muda quando ele é atualizado
+    return resposta_condicional(saldo, gerar_etag(request.endpoint, cpf, saldo['saldo'], saldo['atualizado_em']))
+
+
+@api_bp.route('/admin/revendedor-pre-aprovado/recarregar', methods=['POST'])
+@validate_admin_token()
+def recarregar_revendedores_pre_aprovados():
+    return resposta_json(recarregar_pre_aprovados())
+
+
+@api_bp.route('/admin/caches', methods=['GET'])
+@validate_admin_token()
+def obter_estatisticas_caches():
+    return resposta_json(estatisticas_caches(saldo_cashback_cache))
+
+
+@api_bp.route('/admin/consultas-lentas', methods=['GET'])
+@validate_admin_token()
+def listar_consultas_lentas():
+    return resposta_json(consultas_lentas(request.args))
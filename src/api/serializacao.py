@@ -0,0 +1,41 @@
+import datetime
+import json
+
+from src.config import JSON_ENCODER
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional, sem ele as respostas usam o json da biblioteca padrão
+    orjson = None
+
+ENCODER_ORJSON = 'orjson'
+ENCODER_STDLIB = 'stdlib'
+
+
+def _padrao(valor):
+    #  Tipos sem representação em json (ObjectId, Decimal...) vão como texto
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _codificar_stdlib(dados) -> bytes:
+    return json.dumps(dados, default=_padrao, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _codificar_orjson(dados) -> bytes:
+    #  datetime (isoformat), float e dict/list são serializados em C, sem passar por _padrao.
+    #  OPT_NON_STR_KEYS aceita chaves int, float, bool e None como o json da biblioteca padrão
+    return orjson.dumps(dados, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+
+def obter_encoder(nome: str = JSON_ENCODER):
+    #  auto: orjson quando instalado
+    if nome == ENCODER_STDLIB or (nome != ENCODER_ORJSON and orjson is None):
+        return _codificar_stdlib
+    if orjson is None:
+        raise ValueError('JSON_ENCODER=orjson exige o pacote orjson instalado')
+    return _codificar_orjson
+
+
+codificar = obter_encoder()
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - resource não existe no Windows, sem ele o pico de memória não é informado
+    resource = None
+
+from src import mongo, repositorio
+from src.config import CRIAR_INDICES_NA_INICIALIZACAO, PRE_APROVADO_CARREGAR_NA_INICIALIZACAO, TOKEN_MODO, \
+    MONGO_MAX_POOL_SIZE
+
+
+def abrir_conexoes(cliente, quantidade: int) -> int:
+    #  Comandos simultâneos com o pool vazio abrem uma conexão cada (handshake e autenticação),
+    #  que fica no pool para as primeiras requisições
+    quantidade = min(quantidade, MONGO_MAX_POOL_SIZE)
+    if quantidade <= 0:
+        return 0
+    with ThreadPoolExecutor(max_workers=quantidade, thread_name_prefix='aquecimento') as executor:
+        list(executor.map(lambda _: cliente.admin.command('ping'), range(quantidade)))
+    return quantidade
+
+
+def carregar_caches() -> dict:
+    #  Conjuntos mantidos em memória em cada processo, carregados antes da primeira requisição
+    carregados = {}
+    if PRE_APROVADO_CARREGAR_NA_INICIALIZACAO:
+        from src.domain.pre_aprovado import revendedor_pre_aprovado_cache
+        carregados['revendedor-pre-aprovado'] = revendedor_pre_aprovado_cache.carregar()
+    if TOKEN_MODO == 'assinado':
+        from src.domain.token import token_revogado_cache
+        carregados['token-revogado'] = token_revogado_cache.carregar()
+    return carregados
+
+
+def aquecer(app, conexoes: int = 0) -> dict:
+    #  Executado no processo que vai atender as requisições (no servidor de produção, depois do fork):
+    #  abre conexões do pool, cria os índices (CRIAR_INDICES_NA_INICIALIZACAO) e carrega os caches
+    inicio = time.perf_counter()
+    abertas = 0
+    if app.config['REPOSITORIO_BACKEND'] == repositorio.BACKEND_MONGO:
+        abertas = abrir_conexoes(mongo.cx, conexoes)
+
+        if CRIAR_INDICES_NA_INICIALIZACAO:
+            from src.database import ensure_indexes
+            ensure_indexes(mongo.db)
+
+    return {
+        'conexoes': abertas,
+        'caches': carregar_caches(),
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+def memoria() -> dict:
+    #  Memória do processo em MB: residente atual (/proc, apenas Linux) e pico (getrusage)
+    uso = {'residente_mb': None, 'pico_mb': None}
+    try:
+        with open('/proc/self/statm') as arquivo:
+            paginas = int(arquivo.read().split()[1])
+        uso['residente_mb'] = paginas * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, IndexError, ValueError):
+        pass
+    if resource is not None:
+        #  ru_maxrss é em KB no Linux e em bytes no macOS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        uso['pico_mb'] = pico / 2 ** 20 if sys.platform == 'darwin' else pico / 2 ** 10
+    return uso
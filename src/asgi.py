@@ -0,0 +1,4 @@
+from src import create_asgi_app
+
+#  Servidor ASGI, por exemplo: hypercorn src.asgi:app --bind 0.0.0.0:23939
+app = create_asgi_app('')
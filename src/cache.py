@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class TTLCache:
+    #  Cache em memória com expiração por tempo e limite de itens (remove o usado há mais tempo)
+
+    def __init__(self, ttl: float, tamanho_maximo: int, relogio=time.time):
+        self._ttl = ttl
+        self._tamanho_maximo = tamanho_maximo
+        self._relogio = relogio
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def _registrar(self, acerto: bool):
+        #  Contadores aproximados, sem lock: servem apenas para observação
+        if acerto:
+            self.acertos += 1
+        else:
+            self.falhas += 1
+
+    def _obter_item(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+            return item
+
+    def obter(self, chave, padrao=None):
+        item = self._obter_item(chave)
+        if item is None or self._relogio() - item[1] >= self._ttl:
+            self._registrar(False)
+            return padrao
+        self._registrar(True)
+        return item[0]
+
+    def definir(self, chave, valor) -> tuple:
+        item = (valor, self._relogio())
+        with self._lock:
+            self._itens[chave] = item
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self._tamanho_maximo:
+                self._itens.popitem(last=False)
+        return item
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def estatisticas(self) -> dict:
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'tamanho': len(self._itens)}
+
+
+class StaleWhileRevalidateCache(TTLCache):
+    #  Depois do ttl o valor ainda é servido por tempo_stale segundos enquanto é atualizado em background.
+    #  Cargas simultâneas da mesma chave são agrupadas em uma única chamada.
+
+    def __init__(self, ttl: float, tempo_stale: float, tamanho_maximo: int, relogio=time.time, executor=None):
+        super().__init__(ttl, tamanho_maximo, relogio)
+        self._tempo_stale = tempo_stale
+        self._executor = executor
+        self._em_andamento = {}
+
+    def obter_ou_carregar(self, chave, carregar) -> tuple:
+        item = self._obter_item(chave)
+        if item is not None:
+            idade = self._relogio() - item[1]
+            if idade < self._ttl:
+                self._registrar(True)
+                return item
+            if idade < self._ttl + self._tempo_stale:
+                self._registrar(True)
+                self._atualizar_em_background(chave, carregar)
+                return item
+
+        self._registrar(False)
+        return self._carregar(chave, carregar)
+
+    def _carregar(self, chave, carregar) -> tuple:
+        with self._lock:
+            future = self._em_andamento.get(chave)
+            responsavel = future is None
+            if responsavel:
+                future = Future()
+                self._em_andamento[chave] = future
+
+        if not responsavel:
+            return future.result()
+
+        try:
+            item = self.definir(chave, carregar())
+            future.set_result(item)
+            return item
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+
+    def _atualizar_em_background(self, chave, carregar):
+        with self._lock:
+            if chave in self._em_andamento:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache')
+
+        self._executor.submit(self._carregar, chave, carregar)
+
+
+class AsyncStaleWhileRevalidateCache(TTLCache):
+    #  Mesmo comportamento do StaleWhileRevalidateCache para a api asyncio: carregar é uma corrotina,
+    #  executada em uma task própria para que o cancelamento de uma requisição não interrompa a carga
+
+    def __init__(self, ttl: float, tempo_stale: float, tamanho_maximo: int, relogio=time.time):
+        super().__init__(ttl, tamanho_maximo, relogio)
+        self._tempo_stale = tempo_stale
+        self._em_andamento = {}
+        self._tarefas = set()
+
+    async def obter_ou_carregar(self, chave, carregar) -> tuple:
+        item = self._obter_item(chave)
+        if item is not None:
+            idade = self._relogio() - item[1]
+            if idade < self._ttl:
+                self._registrar(True)
+                return item
+            if idade < self._ttl + self._tempo_stale:
+                self._registrar(True)
+                if chave not in self._em_andamento:
+                    self._iniciar_carga(chave, carregar)
+                return item
+
+        self._registrar(False)
+        future = self._em_andamento.get(chave) or self._iniciar_carga(chave, carregar)
+        return await asyncio.shield(future)
+
+    def _iniciar_carga(self, chave, carregar) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._em_andamento[chave] = future
+        tarefa = loop.create_task(self._executar_carga(chave, carregar, future))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+        return future
+
+    async def _executar_carga(self, chave, carregar, future: asyncio.Future):
+        try:
+            future.set_result(self.definir(chave, await carregar()))
+        except Exception as error:
+            future.set_exception(error)
+            #  Atualizações em background não têm quem aguarde o resultado
+            future.exception()
+        finally:
+            del self._em_andamento[chave]
+            if not future.done():
+                future.cancel()
@@ -0,0 +1,165 @@
+import json
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from pymongo import monitoring
+
+from src.cache import TTLCache
+from src.config import CONSULTA_LENTA_LIMITE_MS, CONSULTA_LENTA_TAMANHO, CONSULTA_LENTA_PLANO_TTL
+
+logger = logging.getLogger(__name__)
+
+#  Comandos que aceitam explain; os demais (insert, getMore, índices...) são registrados sem plano
+COMANDOS_EXPLAIN = ('find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete')
+#  Campos de sessão e do driver, que não fazem parte da consulta
+_CAMPOS_DRIVER = ('lsid', 'txnNumber', 'autocommit', 'startTransaction', 'cursor', 'readConcern', 'writeConcern')
+#  Nesses campos os valores descrevem a consulta (ordenação, projeção, índice) e não dados
+_CAMPOS_MANTIDOS = ('sort', 'projection', 'hint', '$sort', '$project')
+_CAMPOS_COM_VALORES = ('parsedQuery', 'indexBounds', 'filter', '$match')
+
+
+def formato(valor, manter: bool = False):
+    #  Forma da consulta sem os valores: campos e operadores são mantidos, valores viram '?'.
+    #  Listas de valores ($in) ficam com um único item e referências a campos ('$valor') são mantidas.
+    if isinstance(valor, dict):
+        return {chave: formato(item, manter or chave in _CAMPOS_MANTIDOS) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        itens = [formato(item, manter) for item in valor]
+        if all(not isinstance(item, (dict, list)) for item in itens):
+            return itens[:1]
+        return itens
+    if manter or (isinstance(valor, str) and valor.startswith('$')):
+        return valor
+    return '?'
+
+
+def _redigir_plano(plano):
+    #  O plano traz os valores da consulta (parsedQuery, limites do índice, $match), que são redigidos
+    if isinstance(plano, dict):
+        return {chave: formato(item) if chave in _CAMPOS_COM_VALORES else _redigir_plano(item)
+                for chave, item in plano.items()}
+    if isinstance(plano, list):
+        return [_redigir_plano(item) for item in plano]
+    return plano
+
+
+def _estagios(plano) -> [str]:
+    #  Estágios do plano escolhido (IXSCAN, FETCH, COLLSCAN...), na ordem em que aparecem
+    estagios = []
+    if isinstance(plano, dict):
+        if isinstance(plano.get('stage'), str):
+            estagios.append(plano['stage'])
+        for item in plano.values():
+            estagios.extend(_estagios(item))
+    elif isinstance(plano, list):
+        for item in plano:
+            estagios.extend(_estagios(item))
+    return estagios
+
+
+class ConsultaLentaListener(monitoring.CommandListener):
+    #  Registra os comandos do Mongo mais lentos que o limite, com a forma da consulta e o plano
+    #  (explain) obtido em background, em um buffer com os últimos registros
+
+    def __init__(self, limite_ms: float = CONSULTA_LENTA_LIMITE_MS, tamanho: int = CONSULTA_LENTA_TAMANHO,
+                 executor=None):
+        self._limite_micros = limite_ms * 1000
+        self._registros = deque(maxlen=tamanho)
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+        self._planos = TTLCache(CONSULTA_LENTA_PLANO_TTL, tamanho)
+        self._executor = executor
+        self._cliente = None
+
+    def configurar(self, cliente):
+        #  Cliente usado para o explain (o listener é criado antes do MongoClient)
+        self._cliente = cliente
+
+    def started(self, event):
+        if event.command_name == 'explain':
+            return
+        with self._lock:
+            self._em_andamento[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def _finalizar(self, event):
+        with self._lock:
+            inicio = self._em_andamento.pop((event.connection_id, event.request_id), None)
+        if inicio is not None and event.duration_micros >= self._limite_micros:
+            self._registrar(event, *inicio)
+
+    def succeeded(self, event):
+        self._finalizar(event)
+
+    def failed(self, event):
+        self._finalizar(event)
+
+    def _registrar(self, event, database: str, comando: dict):
+        colecao = comando.get(event.command_name)
+        consulta = {
+            chave: valor for chave, valor in comando.items()
+            if chave != event.command_name and not chave.startswith('$') and chave not in _CAMPOS_DRIVER
+        }
+        registro = {
+            'data': datetime.now(timezone.utc).isoformat(),
+            'colecao': colecao if isinstance(colecao, str) else comando.get('collection', '-'),
+            'comando': event.command_name,
+            'duracao_ms': event.duration_micros / 1000,
+            'formato': formato(consulta),
+            'plano': None,
+            'estagios': None,
+        }
+        with self._lock:
+            self._registros.append(registro)
+        logger.warning('Consulta lenta: %s %s %.1fms %s', registro['comando'], registro['colecao'],
+                       registro['duracao_ms'], json.dumps(registro['formato'], default=str))
+
+        if self._cliente is not None and event.command_name in COMANDOS_EXPLAIN:
+            self._obter_executor().submit(self._explicar, registro, database, event.command_name, colecao, consulta)
+
+    def _obter_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='consulta-lenta')
+        return self._executor
+
+    def _explicar(self, registro: dict, database: str, nome_comando: str, colecao: str, consulta: dict):
+        #  Consultas com a mesma forma reaproveitam o plano obtido por ttl
+        chave = (database, nome_comando, registro['colecao'], json.dumps(registro['formato'], sort_keys=True))
+        plano = self._planos.obter(chave)
+        if plano is None:
+            try:
+                comando = dict({nome_comando: colecao}, **consulta)
+                if nome_comando == 'aggregate':
+                    comando['cursor'] = {}
+                resultado = self._cliente[database].command({'explain': comando, 'verbosity': 'queryPlanner'})
+            except Exception:
+                logger.exception('Erro ao obter o plano da consulta lenta')
+                return
+            if 'queryPlanner' in resultado:
+                plano = {'winningPlan': resultado['queryPlanner'].get('winningPlan')}
+            else:
+                plano = {'stages': resultado.get('stages')}
+            plano = _redigir_plano(plano)
+            self._planos.definir(chave, plano)
+
+        registro['plano'] = plano
+        registro['estagios'] = _estagios(plano)
+
+    def registros(self, colecao: str = None, limite: int = None) -> [dict]:
+        #  Mais recentes primeiro. A cópia é feita com o lock: os listeners incluem registros em outras threads
+        with self._lock:
+            todos = list(self._registros)
+        registros = [registro for registro in reversed(todos) if colecao is None or registro['colecao'] == colecao]
+        return registros[:limite] if limite else registros
+
+    def limpar(self):
+        with self._lock:
+            self._registros.clear()
+        self._planos.limpar()
+
+
+consulta_lenta_listener = ConsultaLentaListener()
@@ -0,0 +1,31 @@
+from functools import lru_cache
+
+from src.config import CPF_CACHE_TAMANHO
+
+#  Pesos dos dígitos verificadores: 10..2 para os 9 primeiros dígitos e 11..2 para os 10 primeiros
+_PESOS_PRIMEIRO_DIGITO = tuple(range(10, 1, -1))
+_PESOS_SEGUNDO_DIGITO = tuple(range(11, 1, -1))
+
+
+def _digito_verificador(digitos, pesos) -> int:
+    return ((sum(digito * peso for digito, peso in zip(digitos, pesos)) * 10) % 11) % 10
+
+
+@lru_cache(maxsize=CPF_CACHE_TAMANHO)
+def cpf_valido(value: str) -> bool:
+    #  Obtém os números do CPF e ignora outros caracteres
+    try:
+        cpf = [int(char) for char in value if char.isdigit()]
+    except ValueError:
+        return False
+
+    #  Verifica se o CPF tem 11 dígitos
+    if len(cpf) != 11:
+        return False
+
+    #  CPFs com os números espelhados (ex: 111.111.111-11) passam na validação dos dígitos
+    if cpf == cpf[::-1]:
+        return False
+
+    return (_digito_verificador(cpf, _PESOS_PRIMEIRO_DIGITO) == cpf[9] and
+            _digito_verificador(cpf, _PESOS_SEGUNDO_DIGITO) == cpf[10])
@@ -1,15 +1,117 @@
-from pymongo import MongoClient
-from src.config import MONGO_URI, DATABASE_NAME
+import json
+import sys
+import time
+
+from dateutil.parser import isoparse
+from pymongo import MongoClient, ASCENDING, IndexModel, UpdateOne
+from src.config import MONGO_URI, DATABASE_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, \
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_COMPRESSORES
+from src.domain.pre_aprovado import incrementar_versao
+from src.repositorio.mongo import CHAVE_VERSAO_GERAL_COMPRAS, validar_leitura_secundaria
+from src.schema import data_utc
+
+#  Índices esperados por collection. Os nomes seguem o padrão gerado pelo Mongo
+#  para que bases criadas antes do registro não tenham índices duplicados.
+INDICES = {
+    'revendedor': [
+        IndexModel([('cpf', ASCENDING)], name='cpf_1', unique=True),
+    ],
+    'revendedor-pre-aprovado': [
+        IndexModel([('cpf', ASCENDING)], name='cpf_1', unique=True),
+    ],
+    'token': [
+        IndexModel([('created_at', ASCENDING)], name='created_at_1', expireAfterSeconds=3600*24),
+        IndexModel([('cpf', ASCENDING)], name='cpf_1'),
+        IndexModel([('token', ASCENDING)], name='token_1', unique=True),
+    ],
+    'compra': [
+        IndexModel([('codigo', ASCENDING)], name='codigo_1', unique=True),
+        IndexModel(
+            [('cpf_revendedor', ASCENDING), ('data', ASCENDING), ('_id', ASCENDING)],
+            name='cpf_revendedor_1_data_1__id_1'
+        ),
+    ],
+    'compra-mensal': [
+        IndexModel([('cpf_revendedor', ASCENDING), ('ano_mes', ASCENDING)], name='cpf_revendedor_1_ano_mes_1',
+                   unique=True),
+    ],
+    'token-revogado': [
+        IndexModel([('jti', ASCENDING)], name='jti_1', unique=True),
+        IndexModel([('expira_em', ASCENDING)], name='expira_em_1', expireAfterSeconds=0),
+    ],
+    'controle': [],
+}
+
+
+def opcoes_cliente() -> dict:
+    #  Opções de pool, timeouts e compressão passadas aos clients do Mongo (pymongo e motor)
+    validar_leitura_secundaria()
+    opcoes = {
+        'maxPoolSize': MONGO_MAX_POOL_SIZE,
+        'minPoolSize': MONGO_MIN_POOL_SIZE,
+        'serverSelectionTimeoutMS': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        opcoes['waitQueueTimeoutMS'] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_COMPRESSORES:
+        opcoes['compressors'] = MONGO_COMPRESSORES
+    return opcoes
+
+
+def _obter_database():
+    _client = MongoClient(MONGO_URI, connect=True, **opcoes_cliente())
+
+    return _client[DATABASE_NAME]
+
+
+def ensure_indexes(database):
+    #  create_indexes é idempotente para índices com a mesma especificação
+    for colecao, indices in INDICES.items():
+        if indices:
+            database.get_collection(colecao).create_indexes(indices)
+
+
+#  Opções comparadas além da chave: um índice com o mesmo nome e opções diferentes não é corrigido pelo
+#  create_indexes (IndexOptionsConflict), precisa ser removido e criado de novo
+_OPCOES_INDICE = ('unique', 'expireAfterSeconds', 'partialFilterExpression')
+
+
+def _especificacao(indice: dict) -> tuple:
+    opcoes = {opcao: indice.get(opcao) for opcao in _OPCOES_INDICE}
+    opcoes['unique'] = bool(opcoes['unique'])
+    return list(dict(indice['key']).items()), opcoes
+
+
+def relatorio_indices(database) -> dict:
+    relatorio = {}
+    for colecao, indices in INDICES.items():
+        existentes = {
+            nome: _especificacao(info)
+            for nome, info in database.get_collection(colecao).index_information().items()
+            if nome != '_id_'
+        }
+        esperados = {indice.document['name']: _especificacao(indice.document) for indice in indices}
+
+        relatorio[colecao] = {
+            'faltando': sorted(nome for nome in esperados if nome not in existentes),
+            'divergentes': sorted(
+                nome for nome, especificacao in esperados.items()
+                if nome in existentes and existentes[nome] != especificacao
+            ),
+            'extras': sorted(nome for nome in existentes if nome not in esperados),
+        }
+
+    return relatorio
+
 
 def init_database():
-    _client = MongoClient(MONGO_URI, connect=True)
+    _database = _obter_database()
 
-    _database = _client[DATABASE_NAME]
+    for colecao in INDICES:
+        if not colecao in _database.list_collection_names():
+            _database.create_collection(colecao)
 
-    if not 'revendedor-pre-aprovado' in _database.list_collection_names():
-        _database.create_collection('revendedor-pre-aprovado')
-        _collection = _database.get_collection('revendedor-pre-aprovado')
-        _collection.create_index('cpf', unique=True)
+    ensure_indexes(_database)
 
     revendedor_pre_aprovado_collection = _database['revendedor-pre-aprovado']
 
@@ -17,17 +119,121 @@ def init_database():
     for revendedor in revendedores_pre_aprovados:
         if not revendedor_pre_aprovado_collection.find_one({'cpf': revendedor}):
             revendedor_pre_aprovado_collection.insert_one({'cpf': revendedor})
+            incrementar_versao(_database)
+
+
+def incrementar_versao_compras(database):
+    #  Invalida as ETags das listagens de todos os revendedores (src/api, condicional_por_versao)
+    database.get_collection('controle').update_one(
+        {'_id': CHAVE_VERSAO_GERAL_COMPRAS}, {'$inc': {'versao': 1}}, upsert=True
+    )
+
+
+#  'AAAA-MM' da data da compra em UTC, o mesmo mês usado nos incrementos da compra-mensal. Datas no formato
+#  antigo em string ISO são convertidas com o fuso informado; strings que não são datas ficam com o prefixo.
+_ANO_MES = {
+    '$cond': [
+        {'$eq': [{'$type': '$data'}, 'string']},
+        {'$ifNull': [
+            {'$dateToString': {
+                'format': '%Y-%m', 'date': {'$dateFromString': {'dateString': '$data', 'onError': None}}
+            }},
+            {'$substrBytes': ['$data', 0, 7]}
+        ]},
+        {'$dateToString': {'format': '%Y-%m', 'date': '$data'}}
+    ]
+}
+
+
+def recalcular_compra_mensal():
+    #  Recalcula os totais mensais a partir da collection compra, um revendedor por vez, gravando cada
+    #  mês com $set (upsert) na própria compra-mensal. Os $inc das compras salvas durante o recálculo
+    #  continuam valendo para os revendedores já recalculados e para os que ainda não foram; só uma compra
+    #  do revendedor em recálculo, entre a agregação e a gravação dos seus meses, pode ser sobrescrita.
+    #  Nesse caso executar novamente corrige. Meses sem compras não são removidos (compras não são excluídas).
+    _database = _obter_database()
+    _compra = _database['compra']
+    _compra_mensal = _database['compra-mensal']
+    _compra_mensal.create_indexes(INDICES['compra-mensal'])
+
+    revendedores = _compra.aggregate([{'$group': {'_id': '$cpf_revendedor'}}], allowDiskUse=True)
+    for revendedor in revendedores:
+        cpf_revendedor = revendedor['_id']
+        meses = _compra.aggregate([
+            {'$match': {'cpf_revendedor': cpf_revendedor}},
+            {'$group': {'_id': _ANO_MES, 'total': {'$sum': '$valor'}, 'quantidade': {'$sum': 1}}},
+        ])
+        operacoes = [
+            UpdateOne(
+                {'cpf_revendedor': cpf_revendedor, 'ano_mes': mes['_id']},
+                {'$set': {'total': mes['total'], 'quantidade': mes['quantidade']}},
+                upsert=True
+            )
+            for mes in meses
+        ]
+        if operacoes:
+            _compra_mensal.bulk_write(operacoes, ordered=False)
+
+    incrementar_versao_compras(_database)
+
+
+def migrar_data_compra(tamanho_lote: int = 1000, pausa: float = 0.1):
+    #  Converte compra.data de string ISO para data em lotes. Só seleciona documentos que
+    #  ainda estão em string, então pode ser interrompida e executada novamente sem retrabalho.
+    #  O update filtra pelo valor original para não sobrescrever alterações concorrentes.
+    _database = _obter_database()
+    _collection = _database['compra']
+
+    ultimo_id = None
+    convertidos = 0
+    invalidos = 0
+    while True:
+        filtro = {'data': {'$type': 'string'}}
+        if ultimo_id:
+            filtro['_id'] = {'$gt': ultimo_id}
+
+        lote = list(_collection.find(filtro, {'data': 1}).sort('_id', ASCENDING).limit(tamanho_lote))
+        if not lote:
+            break
+
+        operacoes = []
+        for compra in lote:
+            try:
+                data = data_utc(isoparse(compra['data']))
+            except ValueError:
+                invalidos += 1
+                continue
+            operacoes.append(UpdateOne({'_id': compra['_id'], 'data': compra['data']}, {'$set': {'data': data}}))
+
+        if operacoes:
+            convertidos += _collection.bulk_write(operacoes, ordered=False).modified_count
+            #  A ordem das compras nas listagens muda com a conversão (strings antes das datas)
+            incrementar_versao_compras(_database)
+
+        ultimo_id = lote[-1]['_id']
+        print(f'compras convertidas: {convertidos}, datas inválidas: {invalidos}')
+
+        if pausa:
+            time.sleep(pausa)
+
+
+def criar_indices():
+    ensure_indexes(_obter_database())
+
+
+def imprimir_relatorio_indices():
+    print(json.dumps(relatorio_indices(_obter_database()), indent=2))
 
-    if not 'token' in _database.list_collection_names():
-        _database.create_collection('token')
-        _token_collection = _database.get_collection('token')
-        _token_collection.create_index('created_at', expireAfterSeconds=3600*24)
 
-    if not 'revendedor' in _database.list_collection_names():
-        _database.create_collection('revendedor')
-        _collection = _database.get_collection('revendedor')
-        _collection.create_index('cpf', unique=True)
+_COMANDOS = {
+    'init': init_database,
+    'recalcular-compra-mensal': recalcular_compra_mensal,
+    'criar-indices': criar_indices,
+    'relatorio-indices': imprimir_relatorio_indices,
+    'migrar-data-compra': migrar_data_compra,
+}
 
 
 if __name__ == '__main__':
-    init_database()
+    _comando = sys.argv[1] if len(sys.argv) > 1 else 'init'
+    _COMANDOS[_comando](*(int(arg) for arg in sys.argv[2:]))
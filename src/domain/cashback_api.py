@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+from time import perf_counter
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import (
+    URL_CASHBACK_ACUMULADO,
+    TOKEN_API_CASHBACK,
+    CASHBACK_API_POOL_SIZE,
+    CASHBACK_API_CONNECT_TIMEOUT,
+    CASHBACK_API_READ_TIMEOUT,
+    CASHBACK_API_MAX_TENTATIVAS,
+    CASHBACK_API_BACKOFF,
+    CASHBACK_API_CIRCUITO_FALHAS,
+    CASHBACK_API_CIRCUITO_ESPERA,
+)
+from src.metrics import observar_upstream
+
+
+class CashbackApiError(Exception):
+    pass
+
+
+class CircuitoAbertoError(CashbackApiError):
+    pass
+
+
+class CircuitBreaker:
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio-aberto'
+
+    def __init__(self, limite_falhas: int, tempo_espera: float, relogio=time.monotonic):
+        self._limite_falhas = limite_falhas
+        self._tempo_espera = tempo_espera
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._falhas = 0
+        self._aberto_em = None
+        self.estado = self.FECHADO
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.estado == self.FECHADO:
+                return True
+
+            #  Depois do tempo de espera uma única chamada de teste é liberada. Se ela não registrar
+            #  o resultado, outra é liberada após nova espera.
+            agora = self._relogio()
+            if agora - self._aberto_em >= self._tempo_espera:
+                self.estado = self.MEIO_ABERTO
+                self._aberto_em = agora
+                return True
+
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._falhas = 0
+            self.estado = self.FECHADO
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            if self.estado == self.MEIO_ABERTO or self._falhas >= self._limite_falhas:
+                self.estado = self.ABERTO
+                self._aberto_em = self._relogio()
+
+
+class CashbackApiClient:
+
+    def __init__(self,
+                 url: str = URL_CASHBACK_ACUMULADO,
+                 token: str = TOKEN_API_CASHBACK,
+                 pool_size: int = CASHBACK_API_POOL_SIZE,
+                 connect_timeout: float = CASHBACK_API_CONNECT_TIMEOUT,
+                 read_timeout: float = CASHBACK_API_READ_TIMEOUT,
+                 max_tentativas: int = CASHBACK_API_MAX_TENTATIVAS,
+                 backoff: float = CASHBACK_API_BACKOFF,
+                 circuit_breaker: CircuitBreaker = None
+                 ):
+        self._url = url
+        self._timeout = (connect_timeout, read_timeout)
+        self._max_tentativas = max_tentativas
+        self._backoff = backoff
+        self._circuit_breaker = circuit_breaker or CircuitBreaker(
+            CASHBACK_API_CIRCUITO_FALHAS, CASHBACK_API_CIRCUITO_ESPERA
+        )
+
+        #  Session reaproveita as conexões (keep-alive) entre as requisições
+        self._session = requests.Session()
+        self._session.headers['token'] = token
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    def obter_credito(self, cpf: str) -> float:
+        if not self._circuit_breaker.permitir():
+            raise CircuitoAbertoError('Api de cashback indisponível.')
+
+        #  Toda saída sem sucesso registrado, inclusive exceções inesperadas, conta como falha no
+        #  circuito; sem isso a chamada de teste do circuito meio-aberto ficaria sem resultado
+        registrado = False
+        try:
+            for tentativa in range(self._max_tentativas):
+                if tentativa:
+                    #  Backoff exponencial com jitter para não sincronizar as novas tentativas
+                    time.sleep(random.uniform(0, self._backoff * 2 ** (tentativa - 1)))
+
+                inicio = perf_counter()
+                try:
+                    response = self._session.get(self._url, params={'cpf': cpf}, timeout=self._timeout)
+                except requests.RequestException:
+                    observar_upstream('cashback', 'erro', perf_counter() - inicio)
+                    continue
+                observar_upstream('cashback', str(response.status_code), perf_counter() - inicio)
+
+                if response.ok:
+                    try:
+                        credito = response.json()['body']['credit']
+                    except (ValueError, KeyError, TypeError):
+                        raise CashbackApiError('Resposta inválida da api de cashback')
+                    registrado = True
+                    self._circuit_breaker.registrar_sucesso()
+                    return credito
+
+                #  Erros do cliente não se resolvem com nova tentativa, mas indicam que a api está respondendo
+                if response.status_code < 500 and response.status_code != 429:
+                    registrado = True
+                    self._circuit_breaker.registrar_sucesso()
+                    raise CashbackApiError(f'Erro ao obter cashback acumulado: {response.status_code}')
+
+            raise CashbackApiError('Erro ao obter cashback acumulado')
+        finally:
+            if not registrado:
+                self._circuit_breaker.registrar_falha()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def cashback_api_client() -> CashbackApiClient:
+    #  Instância única por processo, criada no primeiro uso (depois do fork dos workers)
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = CashbackApiClient()
+    return _client
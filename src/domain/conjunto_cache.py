@@ -0,0 +1,89 @@
+import threading
+import time
+
+from src import mongo
+from src.repositorio import obter_repositorios
+
+
+def incrementar_versao(database, colecao: str):
+    #  Deve ser chamada sempre que a collection mantida em memória for alterada
+    database.get_collection('controle').update_one({'_id': colecao}, {'$inc': {'versao': 1}}, upsert=True)
+
+
+class ConjuntoCache:
+    #  Valores de um campo de uma collection pequena mantidos em memória em cada processo.
+    #  A versão da collection (collection controle) é conferida a cada intervalo e o
+    #  conjunto é recarregado apenas quando ela mudou.
+
+    def __init__(self, colecao: str, campo: str, intervalo_atualizacao: float, relogio=time.monotonic):
+        self._colecao = colecao
+        self._campo = campo
+        self._intervalo_atualizacao = intervalo_atualizacao
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._valores = None
+        self._versao = None
+        self._verificado_em = None
+        self._atualizando = False
+
+    def _repositorio(self):
+        return obter_repositorios(mongo.db).conjunto(self._colecao, self._campo)
+
+    def carregar(self) -> int:
+        repositorio = self._repositorio()
+        versao = repositorio.versao()
+        valores = repositorio.valores()
+
+        with self._lock:
+            self._valores = valores
+            self._versao = versao
+            self._verificado_em = self._relogio()
+
+        return len(valores)
+
+    def atualizar(self):
+        #  Sem versão registrada não há como saber se mudou, então recarrega sempre
+        try:
+            versao = self._repositorio().versao()
+            if versao is None or versao != self._versao:
+                self.carregar()
+            else:
+                with self._lock:
+                    self._verificado_em = self._relogio()
+        finally:
+            with self._lock:
+                self._atualizando = False
+
+    def contem(self, valor) -> bool:
+        if self._valores is None:
+            self.carregar()
+        elif self._relogio() - self._verificado_em >= self._intervalo_atualizacao:
+            self._atualizar_em_background()
+
+        return valor in self._valores
+
+    def incrementar_versao(self):
+        #  Deve ser chamada sempre que a collection mantida em memória for alterada
+        self._repositorio().incrementar_versao()
+
+    def adicionar(self, valor):
+        #  Inclui o valor apenas neste processo, os demais recebem na próxima atualização
+        with self._lock:
+            if self._valores is not None:
+                self._valores = self._valores | {valor}
+
+    def _atualizar_em_background(self):
+        with self._lock:
+            if self._atualizando:
+                return
+            self._atualizando = True
+
+        threading.Thread(target=self.atualizar, name=self._colecao, daemon=True).start()
+
+    @property
+    def carregado(self) -> bool:
+        return self._valores is not None
+
+    @property
+    def versao(self):
+        return self._versao
@@ -0,0 +1,18 @@
+from src.config import PRE_APROVADO_INTERVALO_ATUALIZACAO
+from src.domain import conjunto_cache
+from src.domain.conjunto_cache import ConjuntoCache
+
+_COLECAO = 'revendedor-pre-aprovado'
+
+
+def incrementar_versao(database):
+    conjunto_cache.incrementar_versao(database, _COLECAO)
+
+
+class RevendedorPreAprovadoCache(ConjuntoCache):
+
+    def __init__(self, intervalo_atualizacao: float, **kwargs):
+        super().__init__(_COLECAO, 'cpf', intervalo_atualizacao, **kwargs)
+
+
+revendedor_pre_aprovado_cache = RevendedorPreAprovadoCache(PRE_APROVADO_INTERVALO_ATUALIZACAO)
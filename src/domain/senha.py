@@ -0,0 +1,106 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.config import SENHA_HASH_ITERACOES, SENHA_HASH_PROCESSOS
+
+_ALGORITMO = 'pbkdf2_sha256'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _calcular(senha: str, salt: bytes, iteracoes: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', senha.encode(), salt, iteracoes)
+
+
+#  _gerar_hash e _verificar rodam nos processos do pool, por isso ficam no nível do módulo
+def _gerar_hash(senha: str, iteracoes: int) -> str:
+    salt = os.urandom(16)
+    _hash = _calcular(senha, salt, iteracoes)
+    return f'{_ALGORITMO}${iteracoes}${base64.b64encode(salt).decode()}${base64.b64encode(_hash).decode()}'
+
+
+def _verificar(senha: str, iteracoes: int, salt: bytes, _hash: bytes) -> bool:
+    return hmac.compare_digest(_calcular(senha, salt, iteracoes), _hash)
+
+
+def _contexto_processos():
+    #  Os processos do pool não são criados com fork: o worker tem threads (gthread, monitores do pymongo)
+    #  e um fork no meio de uma delas pode deixar um lock preso no processo filho
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _obter_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=SENHA_HASH_PROCESSOS, mp_context=_contexto_processos())
+    return _executor
+
+
+def _descartar_executor(executor: ProcessPoolExecutor):
+    #  Um processo encerrado (OOM, sinal) inutiliza o pool: o próximo hash cria outro
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _executar(fn, *args):
+    if SENHA_HASH_PROCESSOS <= 0:
+        return fn(*args)
+
+    executor = _obter_executor()
+    try:
+        return executor.submit(fn, *args).result()
+    except BrokenProcessPool:
+        _descartar_executor(executor)
+        return _obter_executor().submit(fn, *args).result()
+
+
+def _ler_hash(senha_hash: str) -> tuple:
+    #  (iterações, salt, hash) do valor gravado, ou None se ele estiver malformado
+    try:
+        _, iteracoes, salt, _hash = senha_hash.split('$')
+        iteracoes = int(iteracoes)
+        if iteracoes <= 0:
+            return None
+        return iteracoes, base64.b64decode(salt), base64.b64decode(_hash)
+    except (ValueError, binascii.Error):
+        return None
+
+
+def e_hash(senha: str) -> bool:
+    return bool(senha) and senha.startswith(f'{_ALGORITMO}$')
+
+
+def gerar_hash(senha: str) -> str:
+    return _executar(_gerar_hash, senha, SENHA_HASH_ITERACOES)
+
+
+def verificar_senha(senha: str, senha_armazenada: str) -> tuple:
+    #  Retorna (senha correta, hash precisa ser recalculado). Senhas ainda gravadas em texto
+    #  (cadastros anteriores ao hash) são comparadas diretamente e sempre precisam de hash.
+    if not senha_armazenada:
+        return False, False
+
+    if not e_hash(senha_armazenada):
+        return hmac.compare_digest(senha.encode(), senha_armazenada.encode()), True
+
+    partes = _ler_hash(senha_armazenada)
+    if partes is None:
+        return False, False
+
+    valida = _executar(_verificar, senha, *partes)
+    return valida, valida and partes[0] != SENHA_HASH_ITERACOES
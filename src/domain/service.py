@@ -1,151 +1,415 @@
+import base64
+import binascii
+import json
+import time
 import uuid
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import requests
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from dateutil.parser import isoparse
+from marshmallow import ValidationError
 from src import mongo
 from src.api.errors import ApiValidationError
-from src.config import URL_CASHBACK_ACUMULADO, TOKEN_API_CASHBACK
+from src.cache import TTLCache, StaleWhileRevalidateCache
+from src.config import SALDO_CACHE_TTL, SALDO_CACHE_STALE, SALDO_CACHE_TAMANHO, COMPRA_LOTE_TAMANHO, \
+    EXPORTACAO_BATCH_SIZE, REVENDEDOR_CACHE_TTL, REVENDEDOR_CACHE_TAMANHO, TOKEN_MODO
+from src.domain.cashback_api import CashbackApiError, cashback_api_client
+from src.domain.pre_aprovado import revendedor_pre_aprovado_cache
+from src.domain.senha import gerar_hash, verificar_senha
+from src.domain.token import gerar_token, verificar_token, revogar_token
 from src.model import Revendedor, Compra, CompraCashBack
-from src.schema import RevendedorSchema, CompraSchema
+from src.repositorio import obter_repositorios
+from src.schema import revendedor_schema, revendedor_armazenado_schema, compra_schema
+
+
+TAMANHO_PAGINA = 100
+_DUPLICATE_KEY = 11000
+
+saldo_cashback_cache = StaleWhileRevalidateCache(
+    ttl=SALDO_CACHE_TTL, tempo_stale=SALDO_CACHE_STALE, tamanho_maximo=SALDO_CACHE_TAMANHO
+)
+#  Compartilhado por todas as instâncias de RevendedorService do processo
+revendedor_cache = TTLCache(ttl=REVENDEDOR_CACHE_TTL, tamanho_maximo=REVENDEDOR_CACHE_TAMANHO)
+
+
+def ano_mes(data: datetime) -> str:
+    return f'{data.year}-{data.month:02}'
+
+
+#  Compras ainda com a data em string (antes de migrar_data_compra) levam o valor original no cursor,
+#  marcado como texto, para que a próxima página compare com o valor gravado
+_CURSOR_TEXTO = 'texto'
+
+
+def codificar_cursor(data, _id: ObjectId) -> str:
+    if isinstance(data, str):
+        posicao = [data, str(_id), _CURSOR_TEXTO]
+    else:
+        posicao = [data.isoformat(), str(_id)]
+    _cursor = json.dumps(posicao, separators=(',', ':'))
+    return base64.urlsafe_b64encode(_cursor.encode()).decode()
+
+
+def decodificar_cursor(cursor: str) -> tuple:
+    try:
+        posicao = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(posicao) == 3 and posicao[2] == _CURSOR_TEXTO:
+            #  Valida a data, mas a consulta usa o texto original
+            isoparse(posicao[0])
+            return posicao[0], ObjectId(posicao[1])
+        data, _id = posicao
+        return datetime.fromisoformat(data), ObjectId(_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise ApiValidationError('Cursor inválido.')
+
+
+def erro_lote(indice: int, codigo: str, erros: dict) -> dict:
+    return {'indice': indice, 'codigo': codigo, 'status': 'erro', 'erros': erros}
+
+
+#  Etapas do salvamento em lote sem acesso ao banco, compartilhadas com a api asyncio (src.aio).
+#  Cada etapa grava em resultados, na posição da compra, o erro ou o sucesso daquela compra.
+def validar_compras_lote(cpf_revendedor: str, compras: [dict], inicio: int, resultados: list) -> dict:
+    validas = {}
+    for posicao, payload in enumerate(compras):
+        codigo = payload.get('codigo') if isinstance(payload, dict) else None
+        try:
+            compra = compra_schema.load(payload)
+        except ValidationError as error:
+            resultados[posicao] = erro_lote(inicio + posicao, codigo, error.normalized_messages())
+            continue
+
+        if compra.cpf_revendedor != cpf_revendedor:
+            resultados[posicao] = erro_lote(
+                inicio + posicao, codigo, {'cpf_revendedor': ['Cpf informado na rota diferente do payload']}
+            )
+        elif compra.codigo in validas:
+            resultados[posicao] = erro_lote(inicio + posicao, codigo, {'codigo': ['Compra duplicada no lote.']})
+        else:
+            validas[compra.codigo] = (posicao, compra)
+    return validas
+
+
+def preparar_compras_lote(validas: dict, cadastradas: set, status: str, inicio: int, resultados: list) -> list:
+    documentos = []
+    for codigo, (posicao, compra) in validas.items():
+        if codigo in cadastradas:
+            resultados[posicao] = erro_lote(inicio + posicao, codigo, {'codigo': ['Compra já cadastrada.']})
+            continue
+        compra.status = status
+        _compra = compra_schema.dump(compra)
+        _compra['data'] = compra.data
+        documentos.append((posicao, compra, _compra))
+    return documentos
+
+
+def registrar_insercao_lote(documentos: list, falhas: dict, inicio: int, resultados: list) -> [Compra]:
+    salvas = []
+    for indice, (posicao, compra, _compra) in enumerate(documentos):
+        falha = falhas.get(indice)
+        if falha is None:
+            resultados[posicao] = {'indice': inicio + posicao, 'codigo': compra.codigo, 'status': 'criada'}
+            salvas.append(compra)
+        elif falha['code'] == _DUPLICATE_KEY:
+            resultados[posicao] = erro_lote(inicio + posicao, compra.codigo, {'codigo': ['Compra já cadastrada.']})
+        else:
+            resultados[posicao] = erro_lote(inicio + posicao, compra.codigo, {'_schema': ['Erro ao salvar compra.']})
+    return salvas
+
+
+def totais_mensais(compras: [Compra]) -> dict:
+    totais = {}
+    for compra in compras:
+        chave = (compra.cpf_revendedor, ano_mes(compra.data))
+        total, quantidade = totais.get(chave, (0, 0))
+        totais[chave] = (total + compra.valor, quantidade + 1)
+    return totais
+
+
+#  Regras de cashback e de paginação sem acesso ao banco, usadas pelas duas apis
+def percentual_por_total(total: float) -> int:
+    if total <= 1000:
+        return 10
+    elif 1000 < total <= 1500:
+        return 15
+    elif total > 1500:
+        return 20
+
+    return 10
+
+
+def percentuais_por_mes(anos_meses: [tuple], totais: dict) -> dict:
+    #  totais: {'2021-01': total} da compra-mensal; meses sem total recebem o percentual mínimo
+    return {(ano, mes): percentual_por_total(totais.get(f'{ano}-{mes:02}', 0)) for ano, mes in anos_meses}
+
+
+def compra_cashback(compra: Compra, percentual_cashback: int) -> CompraCashBack:
+    return CompraCashBack(
+        codigo=compra.codigo,
+        cpf_revendedor=compra.cpf_revendedor,
+        valor=compra.valor,
+        data=compra.data,
+        status=compra.status,
+        percentual_cashback=percentual_cashback,
+        valor_cashback=round(compra.valor * (percentual_cashback / 100), 2)
+    )
+
+
+def meses_por_revendedor(compras: [Compra]) -> dict:
+    meses = {}
+    for compra in compras:
+        meses.setdefault(compra.cpf_revendedor, set()).add((compra.data.year, compra.data.month))
+    return meses
+
+
+def aplicar_cashback(compras: [Compra], percentuais: dict) -> [CompraCashBack]:
+    #  percentuais: {(cpf_revendedor, (ano, mes)): percentual}
+    return [
+        compra_cashback(compra, percentuais[(compra.cpf_revendedor, (compra.data.year, compra.data.month))])
+        for compra in compras
+    ]
+
+
+def pagina_por_cursor(result: [dict]) -> tuple:
+    #  result traz uma compra além da página: se ela existe, o cursor da próxima página é a última compra
+    proximo = None
+    if len(result) > TAMANHO_PAGINA:
+        result = result[:TAMANHO_PAGINA]
+        proximo = codificar_cursor(result[-1]['data'], result[-1]['_id'])
+    return result, proximo
+
+
+def saldo_cashback(cpf_revendedor: str, credito: float, atualizado_em: float) -> dict:
+    return {
+        'cpf': cpf_revendedor,
+        'saldo': credito,
+        'atualizado_em': datetime.fromtimestamp(atualizado_em, timezone.utc).isoformat(),
+        'idade_segundos': round(time.time() - atualizado_em, 3)
+    }
 
 
 class RevendedorService:
 
     def __init__(self):
-        self._revendedor_collection = mongo.db.get_collection('revendedor')
-        self._token_collection = mongo.db.get_collection('token')
+        repositorios = obter_repositorios(mongo.db)
+        self._revendedor_repositorio = repositorios.revendedor()
+        self._token_repositorio = repositorios.token()
 
     def salvar(self, revendedor: Revendedor):
-        _revendedor = self._revendedor_collection.find_one({'cpf': revendedor.cpf})
+        _revendedor = self._revendedor_repositorio.obter(revendedor.cpf)
         if _revendedor:
             return
-        _model = RevendedorSchema().dump(revendedor)
-        self._revendedor_collection.insert_one(_model)
+        _model = revendedor_schema.dump(revendedor)
+        _model['senha'] = gerar_hash(revendedor.senha)
+        self._revendedor_repositorio.inserir(_model)
+        revendedor_cache.invalidar(revendedor.cpf)
 
     def obter(self, cpf: str) -> Revendedor:
         if not cpf:
             return None
-        result = self._revendedor_collection.find_one({'cpf': cpf})
+
+        revendedor = revendedor_cache.obter(cpf)
+        if revendedor:
+            return revendedor
+
+        result = self._revendedor_repositorio.obter(cpf)
         if result:
-            return RevendedorSchema().load(result, unknown='EXCLUDE')
+            revendedor = revendedor_armazenado_schema.load(result, unknown='EXCLUDE')
+            revendedor_cache.definir(cpf, revendedor)
+            return revendedor
         return None
 
     def login(self, cpf: str, senha: str):
-        revendedor = self._revendedor_collection.find_one({'cpf': cpf})
+        revendedor = self._revendedor_repositorio.obter(cpf)
+        if not revendedor:
+            return False, None
+
+        valida, atualizar_hash = verificar_senha(senha, revendedor.get('senha'))
+        if valida:
+            if atualizar_hash:
+                self._revendedor_repositorio.atualizar_senha(cpf, revendedor['senha'], gerar_hash(senha))
 
-        if revendedor and revendedor.get('senha') == senha:
-            token = self._token_collection.find_one({'cpf': cpf})
+            #  Token assinado é verificado sem acessar o banco, não precisa ser gravado
+            if TOKEN_MODO == 'assinado':
+                return True, gerar_token(cpf)
+
+            token = self._token_repositorio.obter_por_cpf(cpf)
             if not token:
-                token = {'cpf': cpf, 'token': uuid.uuid4(), 'created_at': datetime.now()}
-                self._token_collection.insert_one(token)
+                token = {'cpf': cpf, 'token': str(uuid.uuid4()), 'created_at': datetime.now()}
+                self._token_repositorio.inserir(token)
             return True, token['token']
 
         return False, None
 
+    def verificar_token(self, token: str) -> str:
+        if TOKEN_MODO == 'assinado':
+            return verificar_token(token)
+
+        _token = self._token_repositorio.obter(token)
+        return _token['cpf'] if _token else None
+
+    def logout(self, token: str):
+        if TOKEN_MODO == 'assinado':
+            revogar_token(self._token_repositorio, token)
+        else:
+            self._token_repositorio.remover(token)
+
 
 class CompraService:
 
     def __init__(self):
-        self._revendedor_pre_aprovado_collection = mongo.db.get_collection('revendedor-pre-aprovado')
-        self._compra_collection = mongo.db.get_collection('compra')
+        repositorios = obter_repositorios(mongo.db)
+        self._compra_repositorio = repositorios.compra()
+        self._compra_mensal_repositorio = repositorios.compra_mensal()
         self._revendedor_service = RevendedorService()
 
     def _validar_revendedor(self, cpf: str):
         _revendedor = self._revendedor_service.obter(cpf)
         if not _revendedor:
-            raise ApiValidationError('O revendedor informado não foi encontrado.')
+            raise ApiValidationError('O revendedor informado não foi encontrado.', status_code=404)
         return _revendedor
 
-    def salvar(self, compra: Compra):
+    def _obter_status(self, cpf_revendedor: str) -> str:
+        if revendedor_pre_aprovado_cache.contem(cpf_revendedor):
+            return Compra.STATUS_APROVADO
+        return Compra.STATUS_EM_VALIDACAO
+
+    def salvar(self, compra: Compra) -> dict:
         self._validar_revendedor(compra.cpf_revendedor)
 
-        _compra = self._compra_collection.find_one({'codigo': compra.codigo})
+        _compra = self._compra_repositorio.obter(compra.codigo)
         if _compra:
             raise ApiValidationError('Compra já cadastrada.')
 
-        _revendedor_pre_aprovado = self._revendedor_pre_aprovado_collection.find_one({'cpf': compra.cpf_revendedor})
-        if _revendedor_pre_aprovado:
-            _status = Compra.STATUS_APROVADO
-        else:
-            _status = Compra.STATUS_EM_VALIDACAO
-        compra.status = _status
+        compra.status = self._obter_status(compra.cpf_revendedor)
+
+        #  O mesmo dump serve para a resposta e, com a data nativa, para o documento gravado
+        _compra = compra_schema.dump(compra)
+
+        self._compra_repositorio.inserir(dict(_compra, data=compra.data))
+        self._compra_mensal_repositorio.incrementar(compra.cpf_revendedor, ano_mes(compra.data), compra.valor, 1)
+        self._compra_repositorio.incrementar_versao(compra.cpf_revendedor)
+        return _compra
+
+    def salvar_lote(self, cpf_revendedor: str, compras: [dict]) -> [dict]:
+        #  Revendedor e status de pré-aprovado são resolvidos uma única vez para o lote todo
+        self._validar_revendedor(cpf_revendedor)
+        _status = self._obter_status(cpf_revendedor)
+
+        resultados = []
+        for inicio in range(0, len(compras), COMPRA_LOTE_TAMANHO):
+            resultados.extend(
+                self._salvar_lote(cpf_revendedor, _status, compras[inicio:inicio + COMPRA_LOTE_TAMANHO], inicio)
+            )
+        return resultados
+
+    def _salvar_lote(self, cpf_revendedor: str, status: str, compras: [dict], inicio: int) -> [dict]:
+        resultados = [None] * len(compras)
+        validas = validar_compras_lote(cpf_revendedor, compras, inicio, resultados)
+
+        cadastradas = self._compra_repositorio.codigos_cadastrados(list(validas)) if validas else set()
+
+        documentos = preparar_compras_lote(validas, cadastradas, status, inicio, resultados)
+
+        falhas = {}
+        if documentos:
+            falhas = self._compra_repositorio.inserir_varios([_compra for _, _, _compra in documentos])
 
-        _compra = CompraSchema().dump(compra)
+        salvas = registrar_insercao_lote(documentos, falhas, inicio, resultados)
+        self._compra_mensal_repositorio.incrementar_varios(totais_mensais(salvas))
+        if salvas:
+            self._compra_repositorio.incrementar_versao(cpf_revendedor)
+        return resultados
 
-        self._compra_collection.insert_one(CompraSchema().dump(compra))
-        return compra
+    def obter_versao(self, cpf_revendedor: str) -> int:
+        return self._compra_repositorio.versao(cpf_revendedor)
 
     def listar_paginado(self, cpf_revendedor: str, offset: int):
 
-        total = self._compra_collection.find({'cpf_revendedor': cpf_revendedor}).count()
-        result = self._compra_collection.find({'cpf_revendedor': cpf_revendedor}).skip(offset).limit(100)
+        total = self._compra_repositorio.contar(cpf_revendedor)
+        result = self._compra_repositorio.listar(cpf_revendedor, offset, TAMANHO_PAGINA)
 
-        compras = CompraSchema().load(list(result), many=True, unknown='EXCLUDE')
+        compras = compra_schema.load(result, many=True, unknown='EXCLUDE')
 
         return {'total': total, 'compras': compras}
 
-    def obter_percentual_cashback(self, cpf_revendedor: str, ano: int, mes: int):
-        _data_inicio = datetime(ano, mes, 1)
-        _data_fim = datetime(ano, mes, 1) + relativedelta(months=1)
-        mongo_result = self._compra_collection.aggregate(
-            [
-                {'$match': {'$and': [
-                    {'cpf_revendedor': cpf_revendedor},
-                    {'data': {'$gte': _data_inicio.isoformat()}},
-                    {'data': {'$lt': _data_fim.isoformat()}}
-                ]}
-                },
-                {'$group': {'_id': '$cpf_revendedor', 'total': {'$sum': '$valor'}}}
-            ]
+    def listar_por_cursor(self, cpf_revendedor: str, cursor: str = None, total_exato: bool = False):
+        #  Paginação por (data, _id): cada página é uma busca por faixa no índice,
+        #  sem o custo do skip que cresce com o offset
+        posicao = decodificar_cursor(cursor) if cursor else None
+        result, proximo = pagina_por_cursor(
+            self._compra_repositorio.listar_apos(cpf_revendedor, posicao, TAMANHO_PAGINA + 1)
         )
 
-        result = list(mongo_result)
-        if len(result) > 0:
-            total = result[0]['total']
-            if total <= 1000:
-                return 10
-            elif 1000 < total <= 1500:
-                return 15
-            elif total > 1500:
-                return 20
+        compras = compra_schema.load(result, many=True, unknown='EXCLUDE')
+
+        if total_exato:
+            total = self._compra_repositorio.contar(cpf_revendedor)
+        else:
+            total = self.obter_quantidade_compras(cpf_revendedor)
+
+        return {'total': total, 'compras': compras, 'next': proximo}
+
+    def obter_quantidade_compras(self, cpf_revendedor: str) -> int:
+        #  Quantidade mantida na compra-mensal, evita o count sobre a collection compra
+        return self._compra_mensal_repositorio.obter_quantidade(cpf_revendedor)
+
+    def obter_percentual_cashback(self, cpf_revendedor: str, ano: int, mes: int):
+        total = self._compra_mensal_repositorio.obter_total(cpf_revendedor, f'{ano}-{mes:02}')
+
+        if total is not None:
+            return percentual_por_total(total)
 
         return 10
 
+    def obter_percentuais_cashback(self, cpf_revendedor: str, anos_meses: [tuple]) -> dict:
+        #  Busca os totais de todos os meses informados em uma única consulta na compra-mensal
+        anos_meses = sorted(set(anos_meses))
+        if not anos_meses:
+            return {}
+
+        totais = self._compra_mensal_repositorio.obter_totais(
+            cpf_revendedor, [f'{ano}-{mes:02}' for ano, mes in anos_meses]
+        )
+
+        return percentuais_por_mes(anos_meses, totais)
+
     def calcular_cashback(self, compras: [Compra]) -> [CompraCashBack]:
         dict_cashback = {}
-        compras_cashback = []
-        for compra in compras:
-            ano_mes = f'{compra.data.year}{compra.data.month:02}'
-            if not dict_cashback.get(ano_mes):
-                percentual_cashback = self.obter_percentual_cashback(
-                    compra.cpf_revendedor, compra.data.year, compra.data.month
-                )
-                dict_cashback[ano_mes] = percentual_cashback
-            else:
-                percentual_cashback = dict_cashback[ano_mes]
-
-            _compracashback = CompraCashBack(
-                codigo=compra.codigo,
-                cpf_revendedor=compra.cpf_revendedor,
-                valor=compra.valor,
-                data=compra.data,
-                status=compra.status,
-                percentual_cashback=percentual_cashback,
-                valor_cashback=round(compra.valor * (percentual_cashback / 100), 2)
-            )
+        for cpf_revendedor, anos_meses in meses_por_revendedor(compras).items():
+            for _ano_mes, percentual in self.obter_percentuais_cashback(cpf_revendedor, anos_meses).items():
+                dict_cashback[(cpf_revendedor, _ano_mes)] = percentual
 
-            compras_cashback.append(_compracashback)
-        return compras_cashback
+        return aplicar_cashback(compras, dict_cashback)
 
-    def obter_cashback_acumulado(self, cpf_revendedor: str):
+    def exportar(self, cpf_revendedor: str):
+        #  O revendedor é conferido antes do streaming: depois da primeira linha o status já foi enviado
         self._validar_revendedor(cpf_revendedor)
+        return self._exportar(cpf_revendedor)
+
+    def _exportar(self, cpf_revendedor: str):
+        #  Percorre todas as compras em ordem de data com um cursor, calculando o percentual
+        #  de cada mês quando ele muda. A memória usada não depende da quantidade de compras.
+        result = self._compra_repositorio.percorrer(cpf_revendedor, EXPORTACAO_BATCH_SIZE)
 
-        url = f'{URL_CASHBACK_ACUMULADO}?cpf={cpf_revendedor}'
-        response = requests.get(url, headers={'token': TOKEN_API_CASHBACK})
+        _mes = None
+        percentual_cashback = None
+        for _compra in result:
+            compra = compra_schema.load(_compra, unknown='EXCLUDE')
+            if (compra.data.year, compra.data.month) != _mes:
+                _mes = (compra.data.year, compra.data.month)
+                percentual_cashback = self.obter_percentual_cashback(cpf_revendedor, *_mes)
 
-        if response.ok:
-            _response = response.json()
-            _body = _response['body']
-            return {'cpf': cpf_revendedor, 'saldo': _body['credit']}
+            yield compra_cashback(compra, percentual_cashback)
+
+    def obter_cashback_acumulado(self, cpf_revendedor: str):
+        self._validar_revendedor(cpf_revendedor)
+
+        try:
+            credito, atualizado_em = saldo_cashback_cache.obter_ou_carregar(
+                cpf_revendedor, lambda: cashback_api_client().obter_credito(cpf_revendedor)
+            )
+        except CashbackApiError:
+            raise ApiValidationError('Não foi possível obter o cashback acumulado.', status_code=503)
 
-        raise Exception('Erro ao obter cashback acumulado')
+        return saldo_cashback(cpf_revendedor, credito, atualizado_em)
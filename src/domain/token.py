@@ -0,0 +1,79 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from src.config import TOKEN_MODO, TOKEN_SEGREDO, TOKEN_VALIDADE, TOKEN_CACHE_TAMANHO, \
+    TOKEN_REVOGADO_INTERVALO_ATUALIZACAO
+from src.domain.conjunto_cache import ConjuntoCache
+from src.repositorio import TokenRepositorio
+
+_COLECAO_REVOGADO = 'token-revogado'
+#  Campos de todo token gerado por gerar_token
+_CAMPOS = {'cpf', 'exp', 'jti'}
+
+token_revogado_cache = ConjuntoCache(_COLECAO_REVOGADO, 'jti', TOKEN_REVOGADO_INTERVALO_ATUALIZACAO)
+
+
+def validar_configuracao():
+    #  Chamada na criação do app, para que a falta do segredo impeça a inicialização
+    if TOKEN_MODO == 'assinado' and not TOKEN_SEGREDO:
+        raise RuntimeError('TOKEN_MODO=assinado exige TOKEN_SEGREDO configurado.')
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b'=').decode()
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def _assinar(payload: str) -> str:
+    if not TOKEN_SEGREDO:
+        raise RuntimeError('TOKEN_SEGREDO não configurado.')
+    return _b64encode(hmac.new(TOKEN_SEGREDO.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def gerar_token(cpf: str) -> str:
+    #  <payload>.<assinatura>, o payload leva o cpf, a expiração e um id para revogação
+    dados = {'cpf': cpf, 'exp': int(time.time()) + TOKEN_VALIDADE, 'jti': _b64encode(os.urandom(12))}
+    payload = _b64encode(json.dumps(dados, separators=(',', ':')).encode())
+    return f'{payload}.{_assinar(payload)}'
+
+
+@lru_cache(maxsize=TOKEN_CACHE_TAMANHO)
+def decodificar_token(token: str) -> dict:
+    #  Retorna os dados de um token com assinatura válida, sem conferir expiração ou revogação
+    try:
+        payload, assinatura = token.split('.')
+        #  compare_digest só aceita str ASCII, um token com outros caracteres seria um TypeError
+        if not hmac.compare_digest(assinatura.encode(), _assinar(payload).encode()):
+            return None
+        dados = json.loads(_b64decode(payload))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(dados, dict) or not _CAMPOS.issubset(dados) or not isinstance(dados['exp'], (int, float)):
+        return None
+    return dados
+
+
+def verificar_token(token: str) -> str:
+    dados = decodificar_token(token)
+    if not dados or dados['exp'] <= time.time() or token_revogado_cache.contem(dados['jti']):
+        return None
+    return dados['cpf']
+
+
+def revogar_token(repositorio: TokenRepositorio, token: str):
+    dados = decodificar_token(token)
+    if not dados:
+        return
+
+    repositorio.revogar(dados['jti'], datetime.fromtimestamp(dados['exp'], timezone.utc))
+    token_revogado_cache.adicionar(dados['jti'])
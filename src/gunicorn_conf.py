@@ -0,0 +1,56 @@
+import time
+
+_inicio = time.perf_counter()
+
+#  Módulos importados pelo master (flask, pymongo, marshmallow e a própria api) são compartilhados
+#  com os workers após o fork; nenhuma conexão é aberta na importação
+import src.api  # noqa: F401
+from src.aquecimento import aquecer, memoria
+from src.config import SERVIDOR_BIND, SERVIDOR_WORKERS, SERVIDOR_THREADS, SERVIDOR_TIMEOUT, AQUECIMENTO_CONEXOES
+
+#  gunicorn -c python:src.gunicorn_conf
+wsgi_app = 'src.wsgi:app'
+bind = SERVIDOR_BIND
+workers = SERVIDOR_WORKERS
+threads = SERVIDOR_THREADS
+worker_class = 'gthread'
+timeout = SERVIDOR_TIMEOUT
+#  O app, e com ele o client do Mongo, é criado em cada worker depois do fork: um MongoClient
+#  criado no master seria copiado para os workers com o pool e as threads de monitoramento
+preload_app = False
+
+
+def _formatar_memoria(uso: dict) -> str:
+    return ', '.join(
+        f'{nome} {uso[chave]:.1f} MB' for nome, chave in (('residente', 'residente_mb'), ('pico', 'pico_mb'))
+        if uso[chave] is not None
+    ) or 'memória indisponível'
+
+
+def when_ready(server):
+    server.log.info('Master pronto em %.2fs (%s workers x %s threads), %s', time.perf_counter() - _inicio,
+                    workers, threads, _formatar_memoria(memoria()))
+
+
+def post_fork(server, worker):
+    worker.iniciado_em = time.perf_counter()
+
+
+def post_worker_init(worker):
+    #  Chamado no worker com o app carregado, antes de aceitar requisições. Sem o Mongo disponível
+    #  o worker sobe mesmo assim e as conexões são abertas nas primeiras requisições.
+    carregado_em = time.perf_counter()
+    try:
+        resultado = aquecer(worker.wsgi, AQUECIMENTO_CONEXOES)
+    except Exception:
+        worker.log.exception('Erro no aquecimento do worker %s', worker.pid)
+        resultado = None
+
+    pronto_em = time.perf_counter()
+    if resultado is not None:
+        aquecimento = f'aquecimento {resultado["segundos"]:.2f}s, {resultado["conexoes"]} conexões, ' \
+                      f'caches {resultado["caches"]}'
+    else:
+        aquecimento = 'sem aquecimento'
+    worker.log.info('Worker %s pronto em %.2fs (app %.2fs, %s), %s', worker.pid, pronto_em - worker.iniciado_em,
+                    carregado_em - worker.iniciado_em, aquecimento, _formatar_memoria(memoria()))
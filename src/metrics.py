@@ -0,0 +1,266 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import request, Response
+from pymongo import monitoring
+
+#  Limites (em segundos) dos buckets de latência e da quantidade de comandos no Mongo por requisição
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_IDAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes: tuple, valores: tuple, extra: str = '') -> str:
+    rotulos = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        rotulos.append(extra)
+    return '{' + ','.join(rotulos) + '}' if rotulos else ''
+
+
+def _formatar_numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+
+    def __init__(self, nome: str, descricao: str, rotulos: tuple = ()):
+        self.nome = nome
+        self._descricao = descricao
+        self._rotulos = rotulos
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores, quantidade: int = 1):
+        with self._lock:
+            self._series[valores] = self._series.get(valores, 0) + quantidade
+
+    def valor(self, *valores) -> int:
+        return self._series.get(valores, 0)
+
+    def limpar(self):
+        with self._lock:
+            self._series.clear()
+
+    def exportar(self) -> [str]:
+        linhas = [f'# HELP {self.nome} {self._descricao}', f'# TYPE {self.nome} counter']
+        with self._lock:
+            series = sorted(self._series.items())
+        for valores, total in series:
+            linhas.append(f'{self.nome}{_formatar_rotulos(self._rotulos, valores)} {total}')
+        return linhas
+
+
+class Histograma:
+    #  Cada série guarda a contagem de cada bucket (não acumulada), a soma e o total de observações
+
+    def __init__(self, nome: str, descricao: str, rotulos: tuple = (), limites: tuple = LIMITES_SEGUNDOS):
+        self.nome = nome
+        self._descricao = descricao
+        self._rotulos = rotulos
+        self._limites = limites
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *valores):
+        indice = bisect_left(self._limites, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self._limites) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def quantidade(self, *valores) -> int:
+        serie = self._series.get(valores)
+        return serie[2] if serie else 0
+
+    def soma(self, *valores) -> float:
+        serie = self._series.get(valores)
+        return serie[1] if serie else 0.0
+
+    def limpar(self):
+        with self._lock:
+            self._series.clear()
+
+    def exportar(self) -> [str]:
+        linhas = [f'# HELP {self.nome} {self._descricao}', f'# TYPE {self.nome} histogram']
+        with self._lock:
+            series = sorted((valores, (list(serie[0]), serie[1], serie[2])) for valores, serie in self._series.items())
+        for valores, (buckets, soma, total) in series:
+            acumulado = 0
+            for limite, quantidade in zip(self._limites + ('+Inf',), buckets):
+                acumulado += quantidade
+                rotulos = _formatar_rotulos(self._rotulos, valores, f'le="{_formatar_numero(limite)}"')
+                linhas.append(f'{self.nome}_bucket{rotulos} {acumulado}')
+            rotulos = _formatar_rotulos(self._rotulos, valores)
+            linhas.append(f'{self.nome}_sum{rotulos} {_formatar_numero(soma)}')
+            linhas.append(f'{self.nome}_count{rotulos} {total}')
+        return linhas
+
+
+requisicao_segundos = Histograma(
+    'cashback_http_requisicao_segundos', 'Duração das requisições por rota', ('rota', 'metodo', 'status')
+)
+mongo_idas_por_requisicao = Histograma(
+    'cashback_mongo_idas_por_requisicao', 'Comandos enviados ao Mongo em cada requisição', ('rota',), LIMITES_IDAS
+)
+mongo_comando_segundos = Histograma(
+    'cashback_mongo_comando_segundos', 'Duração dos comandos no Mongo por collection', ('colecao', 'comando')
+)
+mongo_comandos_por_rota = Contador(
+    'cashback_mongo_comandos_total', 'Comandos enviados ao Mongo por rota e collection', ('rota', 'colecao', 'comando')
+)
+mongo_falhas = Contador('cashback_mongo_falhas_total', 'Comandos do Mongo com erro', ('colecao', 'comando'))
+upstream_segundos = Histograma(
+    'cashback_upstream_requisicao_segundos', 'Duração das chamadas a apis externas', ('servico', 'resultado')
+)
+
+METRICAS = (
+    requisicao_segundos, mongo_idas_por_requisicao, mongo_comando_segundos, mongo_comandos_por_rota, mongo_falhas,
+    upstream_segundos,
+)
+
+
+def exportar() -> str:
+    linhas = []
+    for metrica in METRICAS:
+        linhas.extend(metrica.exportar())
+    return '\n'.join(linhas) + '\n'
+
+
+def limpar():
+    for metrica in METRICAS:
+        metrica.limpar()
+
+
+def observar_upstream(servico: str, resultado: str, duracao: float):
+    upstream_segundos.observar(duracao, servico, resultado)
+
+
+#  Estado da requisição em andamento na thread (rota e comandos enviados ao Mongo). Os listeners
+#  do pymongo são chamados na thread que executa o comando; comandos de threads em background
+#  (atualização de caches) entram apenas nas métricas por collection.
+_requisicao = threading.local()
+
+
+def _colecao(event) -> str:
+    if event.command_name == 'getMore':
+        return event.command.get('collection', '-')
+    colecao = event.command.get(event.command_name)
+    return colecao if isinstance(colecao, str) else '-'
+
+
+class ComandoMongoListener(monitoring.CommandListener):
+
+    def __init__(self):
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        colecao = _colecao(event)
+        with self._lock:
+            self._em_andamento[(event.connection_id, event.request_id)] = colecao
+
+        rota = getattr(_requisicao, 'rota', None)
+        if rota is not None:
+            _requisicao.idas += 1
+            mongo_comandos_por_rota.incrementar(rota, colecao, event.command_name)
+
+    def _finalizar(self, event) -> str:
+        with self._lock:
+            return self._em_andamento.pop((event.connection_id, event.request_id), '-')
+
+    def succeeded(self, event):
+        colecao = self._finalizar(event)
+        mongo_comando_segundos.observar(event.duration_micros / 1e6, colecao, event.command_name)
+
+    def failed(self, event):
+        colecao = self._finalizar(event)
+        mongo_comando_segundos.observar(event.duration_micros / 1e6, colecao, event.command_name)
+        mongo_falhas.incrementar(colecao, event.command_name)
+
+
+mongo_listener = ComandoMongoListener()
+
+
+def _iniciar_requisicao():
+    #  A rota é o padrão registrado (/revendedor/<string:cpf>/compras), não o caminho com o cpf
+    _requisicao.rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+    _requisicao.idas = 0
+    _requisicao.inicio = time.perf_counter()
+
+
+def _finalizar_requisicao(status: int):
+    rota = getattr(_requisicao, 'rota', None)
+    if rota is None:
+        return
+    _requisicao.rota = None
+    #  Em respostas em streaming a duração vai até o início do envio do corpo
+    requisicao_segundos.observar(time.perf_counter() - _requisicao.inicio, rota, request.method, str(status))
+    mongo_idas_por_requisicao.observar(_requisicao.idas, rota)
+
+
+def _after_request(response):
+    _finalizar_requisicao(response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    #  Exceções não tratadas não passam pelo after_request
+    _finalizar_requisicao(500)
+
+
+def _autorizado() -> bool:
+    #  /metrics exige o ADMIN_TOKEN, no header X-Admin-Token ou em Authorization: Bearer (o formato do
+    #  authorization.credentials do scrape do Prometheus). Sem ADMIN_TOKEN configurado a rota responde 403.
+    from src.api.decoradores import contexto, obter_token, token_admin_valido
+
+    requisicao, _ = contexto()
+    return token_admin_valido(requisicao.headers.get('X-Admin-Token') or obter_token())
+
+
+def _metricas():
+    if not _autorizado():
+        return Response('', 403)
+    return Response(exportar(), 200, content_type=CONTENT_TYPE)
+
+
+def init_app(app):
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metricas', _metricas, methods=['GET'])
+
+
+def init_asgi_app(app):
+    #  Api asyncio (src.aio): as requisições dividem a thread do event loop, então o início fica no g da
+    #  requisição. Os comandos do motor rodam em threads do pool e entram apenas nas métricas por collection.
+    import quart
+
+    async def _iniciar():
+        quart.g.metricas_inicio = time.perf_counter()
+
+    async def _finalizar(response):
+        inicio = quart.g.get('metricas_inicio')
+        if inicio is not None:
+            rota = quart.request.url_rule.rule if quart.request.url_rule else 'desconhecida'
+            requisicao_segundos.observar(
+                time.perf_counter() - inicio, rota, quart.request.method, str(response.status_code)
+            )
+        return response
+
+    async def _metricas_asgi():
+        if not _autorizado():
+            return quart.Response('', 403)
+        return quart.Response(exportar(), 200, content_type=CONTENT_TYPE)
+
+    app.before_request(_iniciar)
+    app.after_request(_finalizar)
+    app.add_url_rule('/metrics', 'metricas', _metricas_asgi, methods=['GET'])
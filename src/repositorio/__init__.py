@@ -0,0 +1,181 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+BACKEND_MONGO = 'mongo'
+BACKEND_MEMORIA = 'memoria'
+
+
+#  Interfaces dos repositórios usados pelos serviços. Os documentos trocados são dicts com os
+#  mesmos campos gravados no Mongo (data das compras como datetime, _id como ObjectId).
+class RevendedorRepositorio(ABC):
+
+    @abstractmethod
+    def obter(self, cpf: str) -> dict:
+        ...
+
+    @abstractmethod
+    def inserir(self, revendedor: dict):
+        ...
+
+    @abstractmethod
+    def atualizar_senha(self, cpf: str, senha_atual: str, senha: str):
+        #  Atualiza apenas se a senha gravada ainda for senha_atual
+        ...
+
+
+class TokenRepositorio(ABC):
+
+    @abstractmethod
+    def obter(self, token: str) -> dict:
+        ...
+
+    @abstractmethod
+    def obter_por_cpf(self, cpf: str) -> dict:
+        ...
+
+    @abstractmethod
+    def inserir(self, token: dict):
+        ...
+
+    @abstractmethod
+    def remover(self, token: str):
+        ...
+
+    @abstractmethod
+    def revogar(self, jti: str, expira_em: datetime):
+        ...
+
+
+class CompraRepositorio(ABC):
+
+    @abstractmethod
+    def obter(self, codigo: str) -> dict:
+        ...
+
+    @abstractmethod
+    def inserir(self, compra: dict):
+        ...
+
+    @abstractmethod
+    def codigos_cadastrados(self, codigos: [str]) -> set:
+        ...
+
+    @abstractmethod
+    def inserir_varios(self, compras: [dict]) -> dict:
+        #  Insere todas as compras possíveis e retorna as falhas por índice ({'index', 'code', ...})
+        ...
+
+    @abstractmethod
+    def contar(self, cpf_revendedor: str) -> int:
+        ...
+
+    @abstractmethod
+    def listar(self, cpf_revendedor: str, offset: int, limite: int) -> [dict]:
+        ...
+
+    @abstractmethod
+    def listar_apos(self, cpf_revendedor: str, posicao: tuple, limite: int) -> [dict]:
+        #  Compras em ordem de (data, _id) depois da posição (data, _id) informada, ou desde o início
+        ...
+
+    @abstractmethod
+    def percorrer(self, cpf_revendedor: str, tamanho_lote: int):
+        #  Iterador de todas as compras em ordem de (data, _id), buscadas em lotes
+        ...
+
+    @abstractmethod
+    def versao(self, cpf_revendedor: str) -> int:
+        #  Versão das compras do revendedor, incrementada a cada gravação (ETag das listagens)
+        ...
+
+    @abstractmethod
+    def incrementar_versao(self, cpf_revendedor: str):
+        ...
+
+
+class CompraMensalRepositorio(ABC):
+
+    @abstractmethod
+    def incrementar(self, cpf_revendedor: str, ano_mes: str, total: float, quantidade: int):
+        ...
+
+    @abstractmethod
+    def incrementar_varios(self, totais: dict):
+        #  totais: {(cpf_revendedor, ano_mes): (total, quantidade)}
+        ...
+
+    @abstractmethod
+    def obter_total(self, cpf_revendedor: str, ano_mes: str) -> float:
+        ...
+
+    @abstractmethod
+    def obter_totais(self, cpf_revendedor: str, anos_meses: [str]) -> dict:
+        ...
+
+    @abstractmethod
+    def obter_quantidade(self, cpf_revendedor: str) -> int:
+        ...
+
+
+class ConjuntoRepositorio(ABC):
+    #  Valores de um campo de uma collection pequena, com a versão registrada na collection controle
+
+    @abstractmethod
+    def valores(self) -> frozenset:
+        ...
+
+    @abstractmethod
+    def versao(self):
+        ...
+
+    @abstractmethod
+    def incrementar_versao(self):
+        ...
+
+
+class Repositorios(ABC):
+
+    @abstractmethod
+    def revendedor(self) -> RevendedorRepositorio:
+        ...
+
+    @abstractmethod
+    def token(self) -> TokenRepositorio:
+        ...
+
+    @abstractmethod
+    def compra(self) -> CompraRepositorio:
+        ...
+
+    @abstractmethod
+    def compra_mensal(self) -> CompraMensalRepositorio:
+        ...
+
+    @abstractmethod
+    def conjunto(self, colecao: str, campo: str) -> ConjuntoRepositorio:
+        ...
+
+
+_memoria = None
+
+
+def configurar(backend: str):
+    #  Chamado pelo create_app. O backend em memória guarda os dados no próprio processo
+    #  e é recriado vazio a cada configuração.
+    global _memoria
+    if backend == BACKEND_MEMORIA:
+        from src.repositorio.memoria import RepositoriosMemoria
+        _memoria = RepositoriosMemoria()
+    elif backend == BACKEND_MONGO:
+        _memoria = None
+    else:
+        raise ValueError(f'Backend de repositório inválido: {backend}')
+
+
+def obter_repositorios(database) -> Repositorios:
+    #  database (mongo.db) é usado apenas no backend Mongo
+    if _memoria is not None:
+        return _memoria
+
+    from src.repositorio.mongo import RepositoriosMongo
+    return RepositoriosMongo(database)
@@ -0,0 +1,235 @@
+import bisect
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from src.repositorio import RevendedorRepositorio, TokenRepositorio, CompraRepositorio, CompraMensalRepositorio, \
+    ConjuntoRepositorio, Repositorios
+
+_DUPLICATE_KEY = 11000
+
+
+#  Backend em memória para testes de carga e profiling sem banco. Cada repositório mantém
+#  dicts indexados pelas mesmas chaves dos índices do Mongo (src.database.INDICES) e devolve
+#  cópias dos documentos, como o driver. As chaves únicas geram DuplicateKeyError.
+def _novo_documento(documento: dict) -> dict:
+    return dict(documento, _id=documento.get('_id') or ObjectId())
+
+
+def _duplicado(chave: str, valor) -> DuplicateKeyError:
+    return DuplicateKeyError(f'E11000 duplicate key error: {chave}: {valor!r}', _DUPLICATE_KEY)
+
+
+class RevendedorRepositorioMemoria(RevendedorRepositorio):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_cpf = {}
+
+    def obter(self, cpf: str) -> dict:
+        revendedor = self._por_cpf.get(cpf)
+        return dict(revendedor) if revendedor else None
+
+    def inserir(self, revendedor: dict):
+        with self._lock:
+            if revendedor['cpf'] in self._por_cpf:
+                raise _duplicado('cpf', revendedor['cpf'])
+            self._por_cpf[revendedor['cpf']] = _novo_documento(revendedor)
+
+    def atualizar_senha(self, cpf: str, senha_atual: str, senha: str):
+        with self._lock:
+            revendedor = self._por_cpf.get(cpf)
+            if revendedor and revendedor.get('senha') == senha_atual:
+                self._por_cpf[cpf] = dict(revendedor, senha=senha)
+
+
+class TokenRepositorioMemoria(TokenRepositorio):
+
+    def __init__(self, revogados: 'ConjuntoRepositorioMemoria'):
+        self._lock = threading.Lock()
+        self._por_token = {}
+        self._por_cpf = {}
+        self._revogados = revogados
+
+    def obter(self, token: str) -> dict:
+        _token = self._por_token.get(token)
+        return dict(_token) if _token else None
+
+    def obter_por_cpf(self, cpf: str) -> dict:
+        _token = self._por_cpf.get(cpf)
+        return dict(_token) if _token else None
+
+    def inserir(self, token: dict):
+        documento = _novo_documento(token)
+        with self._lock:
+            self._por_token[documento['token']] = documento
+            self._por_cpf.setdefault(documento['cpf'], documento)
+
+    def remover(self, token: str):
+        with self._lock:
+            documento = self._por_token.pop(token, None)
+            if documento and self._por_cpf.get(documento['cpf']) is documento:
+                del self._por_cpf[documento['cpf']]
+
+    def revogar(self, jti: str, expira_em: datetime):
+        self._revogados.adicionar(jti)
+        self._revogados.incrementar_versao()
+
+
+class CompraRepositorioMemoria(CompraRepositorio):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_codigo = {}
+        self._por_id = {}
+        #  Por revendedor, as chaves (data, _id) em ordem, equivalente ao índice cpf_revendedor_1_data_1__id_1
+        self._ordem_por_revendedor = {}
+        self._versoes = {}
+
+    def obter(self, codigo: str) -> dict:
+        compra = self._por_codigo.get(codigo)
+        return dict(compra) if compra else None
+
+    def _inserir(self, compra: dict):
+        if compra['codigo'] in self._por_codigo:
+            raise _duplicado('codigo', compra['codigo'])
+        documento = _novo_documento(compra)
+        self._por_codigo[documento['codigo']] = documento
+        self._por_id[documento['_id']] = documento
+        ordem = self._ordem_por_revendedor.setdefault(documento['cpf_revendedor'], [])
+        bisect.insort(ordem, (documento['data'], documento['_id']))
+
+    def inserir(self, compra: dict):
+        with self._lock:
+            self._inserir(compra)
+
+    def codigos_cadastrados(self, codigos: [str]) -> set:
+        return {codigo for codigo in codigos if codigo in self._por_codigo}
+
+    def inserir_varios(self, compras: [dict]) -> dict:
+        falhas = {}
+        with self._lock:
+            for indice, compra in enumerate(compras):
+                try:
+                    self._inserir(compra)
+                except DuplicateKeyError as error:
+                    falhas[indice] = {'index': indice, 'code': error.code, 'errmsg': str(error)}
+        return falhas
+
+    def contar(self, cpf_revendedor: str) -> int:
+        return len(self._ordem_por_revendedor.get(cpf_revendedor, ()))
+
+    def _compras(self, chaves) -> [dict]:
+        return [dict(self._por_id[_id]) for _, _id in chaves]
+
+    def listar(self, cpf_revendedor: str, offset: int, limite: int) -> [dict]:
+        with self._lock:
+            return self._compras(self._ordem_por_revendedor.get(cpf_revendedor, [])[offset:offset + limite])
+
+    def listar_apos(self, cpf_revendedor: str, posicao: tuple, limite: int) -> [dict]:
+        with self._lock:
+            ordem = self._ordem_por_revendedor.get(cpf_revendedor, [])
+            inicio = bisect.bisect_right(ordem, tuple(posicao)) if posicao else 0
+            return self._compras(ordem[inicio:inicio + limite])
+
+    def percorrer(self, cpf_revendedor: str, tamanho_lote: int):
+        posicao = None
+        while True:
+            lote = self.listar_apos(cpf_revendedor, posicao, tamanho_lote)
+            yield from lote
+            if len(lote) < tamanho_lote:
+                return
+            posicao = (lote[-1]['data'], lote[-1]['_id'])
+
+    def versao(self, cpf_revendedor: str) -> int:
+        return self._versoes.get(cpf_revendedor, 0)
+
+    def incrementar_versao(self, cpf_revendedor: str):
+        with self._lock:
+            self._versoes[cpf_revendedor] = self._versoes.get(cpf_revendedor, 0) + 1
+
+
+class CompraMensalRepositorioMemoria(CompraMensalRepositorio):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        #  {cpf_revendedor: {ano_mes: [total, quantidade]}}
+        self._por_revendedor = {}
+
+    def _incrementar(self, cpf_revendedor: str, ano_mes: str, total: float, quantidade: int):
+        mes = self._por_revendedor.setdefault(cpf_revendedor, {}).setdefault(ano_mes, [0, 0])
+        mes[0] += total
+        mes[1] += quantidade
+
+    def incrementar(self, cpf_revendedor: str, ano_mes: str, total: float, quantidade: int):
+        with self._lock:
+            self._incrementar(cpf_revendedor, ano_mes, total, quantidade)
+
+    def incrementar_varios(self, totais: dict):
+        with self._lock:
+            for (cpf_revendedor, ano_mes), (total, quantidade) in totais.items():
+                self._incrementar(cpf_revendedor, ano_mes, total, quantidade)
+
+    def obter_total(self, cpf_revendedor: str, ano_mes: str) -> float:
+        mes = self._por_revendedor.get(cpf_revendedor, {}).get(ano_mes)
+        return mes[0] if mes else None
+
+    def obter_totais(self, cpf_revendedor: str, anos_meses: [str]) -> dict:
+        meses = self._por_revendedor.get(cpf_revendedor, {})
+        return {ano_mes: meses[ano_mes][0] for ano_mes in anos_meses if ano_mes in meses}
+
+    def obter_quantidade(self, cpf_revendedor: str) -> int:
+        with self._lock:
+            return sum(quantidade for _, quantidade in self._por_revendedor.get(cpf_revendedor, {}).values())
+
+
+class ConjuntoRepositorioMemoria(ConjuntoRepositorio):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._valores = frozenset()
+        self._versao = None
+
+    def valores(self) -> frozenset:
+        return self._valores
+
+    def versao(self):
+        return self._versao
+
+    def incrementar_versao(self):
+        with self._lock:
+            self._versao = (self._versao or 0) + 1
+
+    def adicionar(self, valor):
+        with self._lock:
+            self._valores = self._valores | {valor}
+
+
+class RepositoriosMemoria(Repositorios):
+    #  Uma instância de cada repositório, compartilhada por todas as requisições do processo
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conjuntos = {}
+        self._revendedor = RevendedorRepositorioMemoria()
+        self._token = TokenRepositorioMemoria(self.conjunto('token-revogado', 'jti'))
+        self._compra = CompraRepositorioMemoria()
+        self._compra_mensal = CompraMensalRepositorioMemoria()
+
+    def revendedor(self) -> RevendedorRepositorio:
+        return self._revendedor
+
+    def token(self) -> TokenRepositorio:
+        return self._token
+
+    def compra(self) -> CompraRepositorio:
+        return self._compra
+
+    def compra_mensal(self) -> CompraMensalRepositorio:
+        return self._compra_mensal
+
+    def conjunto(self, colecao: str, campo: str) -> ConjuntoRepositorio:
+        with self._lock:
+            return self._conjuntos.setdefault(colecao, ConjuntoRepositorioMemoria())
@@ -0,0 +1,248 @@
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.read_preferences import SecondaryPreferred
+
+from src.config import MONGO_LEITURA_SECUNDARIA, MONGO_MAX_STALENESS
+from src.repositorio import RevendedorRepositorio, TokenRepositorio, CompraRepositorio, CompraMensalRepositorio, \
+    ConjuntoRepositorio, Repositorios
+
+ORDEM_DATA = [('data', 1), ('_id', 1)]
+#  O Mongo exige maxStalenessSeconds de pelo menos 90
+_MAX_STALENESS_MINIMO = 90
+
+
+#  _id na collection controle da versão de todas as compras, incrementada pelas rotinas que regravam
+#  compras ou totais de todos os revendedores (src/database.py)
+CHAVE_VERSAO_GERAL_COMPRAS = 'compra'
+
+
+def chave_versao_compras(cpf_revendedor: str) -> str:
+    #  _id na collection controle da versão das compras do revendedor
+    return f'compra:{cpf_revendedor}'
+
+
+def validar_leitura_secundaria():
+    #  Chamado na criação do client (src/database.py opcoes_cliente): um valor inválido impede a subida do
+    #  app em vez de falhar em cada listagem
+    if MONGO_LEITURA_SECUNDARIA and MONGO_MAX_STALENESS < _MAX_STALENESS_MINIMO:
+        raise ValueError(f'MONGO_MAX_STALENESS deve ser de pelo menos {_MAX_STALENESS_MINIMO} segundos')
+
+
+def leitura_secundaria(collection):
+    #  Collection para listagens e agregações: com MONGO_LEITURA_SECUNDARIA lê de secundários com atraso limitado
+    if not MONGO_LEITURA_SECUNDARIA:
+        return collection
+    return collection.with_options(read_preference=SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS))
+
+
+def filtro_apos(data, _id) -> list:
+    #  Compras depois de (data, _id) na ordem da listagem. Durante a migração de compra.data para data
+    #  (migrar_data_compra) os dois tipos convivem: o Mongo ordena todas as strings antes das datas e o
+    #  $gt só compara valores do mesmo tipo, então depois de uma string vêm as strings maiores e todas as datas
+    condicoes = [{'data': {'$gt': data}}, {'data': data, '_id': {'$gt': _id}}]
+    if isinstance(data, str):
+        condicoes.append({'data': {'$type': 'date'}})
+    return condicoes
+
+
+#  Consultas compartilhadas com os repositórios do motor (src/aio/repositorio.py)
+def filtro_listagem_apos(cpf_revendedor: str, posicao: tuple) -> dict:
+    filtro = {'cpf_revendedor': cpf_revendedor}
+    if posicao:
+        filtro['$or'] = filtro_apos(*posicao)
+    return filtro
+
+
+def filtro_versao_compras(cpf_revendedor: str) -> dict:
+    #  Versão geral e versão do revendedor: a versão das compras é a soma das duas, e muda quando qualquer
+    #  uma é incrementada
+    return {'_id': {'$in': [CHAVE_VERSAO_GERAL_COMPRAS, chave_versao_compras(cpf_revendedor)]}}
+
+
+def pipeline_quantidade_compras(cpf_revendedor: str) -> list:
+    return [
+        {'$match': {'cpf_revendedor': cpf_revendedor}},
+        {'$group': {'_id': '$cpf_revendedor', 'quantidade': {'$sum': '$quantidade'}}}
+    ]
+
+
+def falhas_insercao(error: BulkWriteError) -> dict:
+    return {falha['index']: falha for falha in error.details['writeErrors']}
+
+
+def operacoes_incremento_mensal(totais: dict) -> [UpdateOne]:
+    return [
+        UpdateOne(
+            {'cpf_revendedor': cpf_revendedor, 'ano_mes': ano_mes},
+            {'$inc': {'total': total, 'quantidade': quantidade}},
+            upsert=True
+        )
+        for (cpf_revendedor, ano_mes), (total, quantidade) in totais.items()
+    ]
+
+
+class RevendedorRepositorioMongo(RevendedorRepositorio):
+
+    def __init__(self, database):
+        self._collection = database.get_collection('revendedor')
+
+    def obter(self, cpf: str) -> dict:
+        return self._collection.find_one({'cpf': cpf})
+
+    def inserir(self, revendedor: dict):
+        self._collection.insert_one(revendedor)
+
+    def atualizar_senha(self, cpf: str, senha_atual: str, senha: str):
+        self._collection.update_one({'cpf': cpf, 'senha': senha_atual}, {'$set': {'senha': senha}})
+
+
+class TokenRepositorioMongo(TokenRepositorio):
+
+    def __init__(self, database):
+        self._database = database
+        self._collection = database.get_collection('token')
+
+    def obter(self, token: str) -> dict:
+        return self._collection.find_one({'token': token})
+
+    def obter_por_cpf(self, cpf: str) -> dict:
+        return self._collection.find_one({'cpf': cpf})
+
+    def inserir(self, token: dict):
+        self._collection.insert_one(token)
+
+    def remover(self, token: str):
+        self._collection.delete_one({'token': token})
+
+    def revogar(self, jti: str, expira_em: datetime):
+        self._database.get_collection('token-revogado').update_one(
+            {'jti': jti}, {'$setOnInsert': {'expira_em': expira_em}}, upsert=True
+        )
+        ConjuntoRepositorioMongo(self._database, 'token-revogado', 'jti').incrementar_versao()
+
+
+class CompraRepositorioMongo(CompraRepositorio):
+
+    def __init__(self, database):
+        self._database = database
+        self._collection = database.get_collection('compra')
+        self._collection_leitura = leitura_secundaria(self._collection)
+
+    def obter(self, codigo: str) -> dict:
+        return self._collection.find_one({'codigo': codigo})
+
+    def inserir(self, compra: dict):
+        self._collection.insert_one(compra)
+
+    def codigos_cadastrados(self, codigos: [str]) -> set:
+        return {compra['codigo'] for compra in self._collection.find({'codigo': {'$in': codigos}}, {'codigo': 1})}
+
+    def inserir_varios(self, compras: [dict]) -> dict:
+        try:
+            self._collection.insert_many(compras, ordered=False)
+        except BulkWriteError as error:
+            return falhas_insercao(error)
+        return {}
+
+    def contar(self, cpf_revendedor: str) -> int:
+        return self._collection_leitura.count_documents({'cpf_revendedor': cpf_revendedor})
+
+    def listar(self, cpf_revendedor: str, offset: int, limite: int) -> [dict]:
+        return list(self._collection_leitura.find({'cpf_revendedor': cpf_revendedor}).skip(offset).limit(limite))
+
+    def listar_apos(self, cpf_revendedor: str, posicao: tuple, limite: int) -> [dict]:
+        filtro = filtro_listagem_apos(cpf_revendedor, posicao)
+        return list(self._collection_leitura.find(filtro).sort(ORDEM_DATA).limit(limite))
+
+    def percorrer(self, cpf_revendedor: str, tamanho_lote: int):
+        result = self._collection_leitura.find({'cpf_revendedor': cpf_revendedor}).sort(ORDEM_DATA)
+        return result.batch_size(tamanho_lote)
+
+    def versao(self, cpf_revendedor: str) -> int:
+        #  Lida no primário, a versão nunca fica atrás das gravações já confirmadas
+        return sum(
+            controle.get('versao', 0)
+            for controle in self._database.get_collection('controle').find(filtro_versao_compras(cpf_revendedor))
+        )
+
+    def incrementar_versao(self, cpf_revendedor: str):
+        self._database.get_collection('controle').update_one(
+            {'_id': chave_versao_compras(cpf_revendedor)}, {'$inc': {'versao': 1}}, upsert=True
+        )
+
+
+class CompraMensalRepositorioMongo(CompraMensalRepositorio):
+
+    def __init__(self, database):
+        self._collection = database.get_collection('compra-mensal')
+        self._collection_leitura = leitura_secundaria(self._collection)
+
+    def incrementar(self, cpf_revendedor: str, ano_mes: str, total: float, quantidade: int):
+        self._collection.update_one(
+            {'cpf_revendedor': cpf_revendedor, 'ano_mes': ano_mes},
+            {'$inc': {'total': total, 'quantidade': quantidade}},
+            upsert=True
+        )
+
+    def incrementar_varios(self, totais: dict):
+        if totais:
+            self._collection.bulk_write(operacoes_incremento_mensal(totais), ordered=False)
+
+    def obter_total(self, cpf_revendedor: str, ano_mes: str) -> float:
+        result = self._collection_leitura.find_one({'cpf_revendedor': cpf_revendedor, 'ano_mes': ano_mes})
+        return result['total'] if result else None
+
+    def obter_totais(self, cpf_revendedor: str, anos_meses: [str]) -> dict:
+        result = self._collection_leitura.find({'cpf_revendedor': cpf_revendedor, 'ano_mes': {'$in': anos_meses}})
+        return {item['ano_mes']: item['total'] for item in result}
+
+    def obter_quantidade(self, cpf_revendedor: str) -> int:
+        result = list(self._collection_leitura.aggregate(pipeline_quantidade_compras(cpf_revendedor)))
+        return result[0]['quantidade'] if result else 0
+
+
+class ConjuntoRepositorioMongo(ConjuntoRepositorio):
+
+    def __init__(self, database, colecao: str, campo: str):
+        self._database = database
+        self._colecao = colecao
+        self._campo = campo
+
+    def valores(self) -> frozenset:
+        return frozenset(
+            documento[self._campo]
+            for documento in self._database.get_collection(self._colecao).find({}, {'_id': 0, self._campo: 1})
+        )
+
+    def versao(self):
+        controle = self._database.get_collection('controle').find_one({'_id': self._colecao})
+        return controle['versao'] if controle else None
+
+    def incrementar_versao(self):
+        self._database.get_collection('controle').update_one(
+            {'_id': self._colecao}, {'$inc': {'versao': 1}}, upsert=True
+        )
+
+
+class RepositoriosMongo(Repositorios):
+    #  As collections são obtidas apenas quando o repositório é pedido
+
+    def __init__(self, database):
+        self._database = database
+
+    def revendedor(self) -> RevendedorRepositorio:
+        return RevendedorRepositorioMongo(self._database)
+
+    def token(self) -> TokenRepositorio:
+        return TokenRepositorioMongo(self._database)
+
+    def compra(self) -> CompraRepositorio:
+        return CompraRepositorioMongo(self._database)
+
+    def compra_mensal(self) -> CompraMensalRepositorio:
+        return CompraMensalRepositorioMongo(self._database)
+
+    def conjunto(self, colecao: str, campo: str) -> ConjuntoRepositorio:
+        return ConjuntoRepositorioMongo(self._database, colecao, campo)
@@ -1,8 +1,18 @@
 import datetime
 from marshmallow import Schema, fields, validate, validates, ValidationError, post_load
+from src.cpf import cpf_valido
 from src.model import Revendedor, Compra, CompraCashBack
 
 
+def data_utc(value: datetime.datetime) -> datetime.datetime:
+    #  O Mongo armazena datas em UTC sem fuso, normaliza para o mesmo formato. O mês da compra (faixa de
+    #  cashback na compra-mensal) e a data devolvida pela api passam a ser os da data em UTC: uma compra em
+    #  2020-05-31T22:00:00-03:00 é 2020-06-01T01:00:00 e conta em 2020-06. Datas sem fuso são tratadas como UTC.
+    if value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
 class MyDateTimeField(fields.DateTime):
     def _deserialize(self, value, attr, data, **kwargs):
         if isinstance(value, datetime.datetime):
@@ -11,26 +21,9 @@ class MyDateTimeField(fields.DateTime):
 
 
 def _validate_cpf(value):
-    #  Obtém os números do CPF e ignora outros caracteres
-    cpf = [int(char) for char in value if char.isdigit()]
-
-    #  Verifica se o CPF tem 11 dígitos
-    if len(cpf) != 11:
-        raise ValidationError("Cpf inválido.")
-
-    #  Verifica se o CPF tem todos os números iguais, ex: 111.111.111-11
-    #  Esses CPFs são considerados inválidos mas passam na validação dos dígitos
-    #  Antigo código para referência: if all(cpf[i] == cpf[i+1] for i in range (0, len(cpf)-1))
-    if cpf == cpf[::-1]:
+    if not cpf_valido(value):
         raise ValidationError("Cpf inválido.")
 
-    #  Valida os dois dígitos verificadores
-    for i in range(9, 11):
-        value = sum((cpf[num] * ((i + 1) - num) for num in range(0, i)))
-        digit = ((value * 10) % 11) % 10
-        if digit != cpf[i]:
-            raise ValidationError("Cpf inválido.")
-
 
 class RevendedorSchema(Schema):
     nome = fields.Str(
@@ -62,6 +55,11 @@ class RevendedorSchema(Schema):
         _validate_cpf(value)
 
 
+class RevendedorArmazenadoSchema(RevendedorSchema):
+    #  Revendedor lido do banco: a senha gravada é o hash, sem as regras de tamanho do cadastro
+    senha = fields.Str(required=True)
+
+
 class CompraSchema(Schema):
     codigo = fields.Str(
                 required=True,
@@ -72,7 +70,7 @@ class CompraSchema(Schema):
     )
     cpf_revendedor = fields.Str(required=True)
     valor = fields.Float(required=True)
-    data = fields.DateTime(required=True)
+    data = MyDateTimeField(required=True)
     status = fields.Str()
 
     @validates("cpf_revendedor")
@@ -86,6 +84,7 @@ class CompraSchema(Schema):
 
     @post_load
     def make_compra(self, data: dict, **kwargs):
+        data['data'] = data_utc(data['data'])
         return Compra(**data)
 
 
@@ -101,3 +100,24 @@ class CompraCashBackSchema(Schema):
     @post_load
     def make_compra(self, data: dict, **kwargs):
         return CompraCashBack(**data)
+
+
+def compra_cashback_dict(compra: CompraCashBack) -> dict:
+    #  Mesmos campos e tipos do CompraCashBackSchema.dump, sem passar pelo marshmallow e com a data
+    #  nativa: a serialização fica toda no encoder das respostas (src/api/serializacao.py)
+    return {
+        'codigo': compra.codigo,
+        'cpf_revendedor': compra.cpf_revendedor,
+        'valor': float(compra.valor),
+        'data': compra.data,
+        'status': compra.status,
+        'percentual_cashback': int(compra.percentual_cashback),
+        'valor_cashback': float(compra.valor_cashback),
+    }
+
+
+#  Instâncias reaproveitadas entre requisições: load/dump não alteram o estado do schema
+revendedor_schema = RevendedorSchema()
+revendedor_armazenado_schema = RevendedorArmazenadoSchema()
+compra_schema = CompraSchema()
+compra_cashback_schema = CompraCashBackSchema()
@@ -0,0 +1,5 @@
+from src import create_app
+
+#  Servidor WSGI de produção: gunicorn -c python:src.gunicorn_conf src.wsgi:app
+#  O aquecimento (conexões e caches) é feito pelo hook post_worker_init de src/gunicorn_conf.py
+app = create_app('', aquecer=False)
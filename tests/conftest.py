@@ -0,0 +1,3 @@
+#  Importa o blueprint antes dos módulos de domínio para evitar o import circular
+#  src.domain.service -> src.api.errors -> src.api.routes -> src.domain.service
+import src.api  # noqa: F401
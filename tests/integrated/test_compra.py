@@ -25,8 +25,8 @@ class TestCompra(unittest.TestCase):
         self.revendedor_collection.insert_one(revendedor)
 
         self.compra_collection.insert_many([
-            {'codigo': '101', 'valor': 1.1, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 1, 10).isoformat()},
-            {'codigo': '102', 'valor': 3.2, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 1, 11).isoformat()},
+            {'codigo': '101', 'valor': 1.1, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 1, 10)},
+            {'codigo': '102', 'valor': 3.2, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 1, 11)},
         ])
 
         # EXERCISE
@@ -59,6 +59,25 @@ class TestCompra(unittest.TestCase):
             },
             response.json)
 
+    def test_exportar__compras_ndjson__expected_todas_compras_com_cashback(self):
+        # FIXTURES
+        cpf = '67976752006'
+        self.compra_collection.insert_many([
+            {'codigo': str(i), 'valor': 10.0, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 1, 1 + i % 28)}
+            for i in range(250)
+        ])
+
+        # EXERCISE
+        response = self.app.get(f'api/v1/revendedor/{cpf}/compras/exportar?formato=ndjson')
+
+        # ASSERTS
+        self.assertEqual(200, response.status_code)
+        linhas = [json.loads(linha) for linha in response.data.decode().splitlines()]
+        self.assertEqual(250, len(linhas))
+        self.assertEqual({'codigo', 'cpf_revendedor', 'valor', 'data', 'status', 'percentual_cashback',
+                          'valor_cashback'}, set(linhas[0]))
+        self.assertEqual([1.0] * 250, [linha['valor_cashback'] for linha in linhas])
+
     def test_adcionar_compra__compra_valida__expected_salvar_compra(self):
         # FIXTURES
         cpf = '86342733775'
@@ -86,7 +105,7 @@ class TestCompra(unittest.TestCase):
         _compra = self.compra_collection.find_one({'codigo': compra['codigo']})
         self.assertEqual(compra['valor'], _compra['valor'])
         self.assertEqual(compra['cpf_revendedor'], _compra['cpf_revendedor'])
-        self.assertEqual(compra['data'], _compra['data'])
+        self.assertEqual(datetime.datetime(2020, 1, 10), _compra['data'])
         self.assertEqual('Em Validação', _compra['status'])
 
     def test_adcionar_compra__cpf_rota_diferente_payload__expected_error(self):
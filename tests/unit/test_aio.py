@@ -0,0 +1,321 @@
+import base64
+import unittest
+from datetime import datetime
+from unittest.mock import patch, AsyncMock, MagicMock
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    from mongomock_motor import AsyncMongoMockClient
+
+    import src.aio
+    import src.aio.service
+    import src.api.decoradores
+    import src.aquecimento
+    import src.domain.senha
+    from src import create_app, create_asgi_app, metrics, repositorio
+    from src.aio.cashback_api import CashbackApiClient
+    from src.aio.service import CompraService, RevendedorService
+    from src.domain.cashback_api import CashbackApiError, CircuitBreaker
+except ImportError:
+    AsyncMongoMockClient = None
+
+from src.domain.service import revendedor_cache
+from src.schema import compra_schema
+
+CPF = '70249837285'
+REVENDEDOR = {'nome': 'Teste nome complente', 'cpf': CPF, 'senha': 'Senhaboita', 'email': 'email@asd.com'}
+
+
+def _compra(codigo: str, valor: float, data: str) -> dict:
+    return {'codigo': codigo, 'valor': valor, 'data': data, 'cpf_revendedor': CPF}
+
+
+@unittest.skipUnless(AsyncMongoMockClient, 'quart, aiohttp e mongomock-motor são necessários para a api asyncio')
+class AioTestCase(unittest.IsolatedAsyncioTestCase):
+    #  Banco em memória (mongomock-motor) no lugar do motor
+
+    def setUp(self):
+        revendedor_cache.limpar()
+        src.aio.service.saldo_cashback_cache.limpar()
+        self.database = AsyncMongoMockClient()['cashback']
+
+        patches = [
+            patch.object(src.aio.async_mongo, 'db', self.database),
+            patch.object(src.aio.service, 'revendedor_pre_aprovado_cache'),
+            patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', 1000),
+            patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        src.aio.service.revendedor_pre_aprovado_cache.contem.return_value = False
+
+
+class AioServiceTest(AioTestCase):
+
+    async def asyncSetUp(self):
+        await self.database.get_collection('revendedor').insert_one(dict(REVENDEDOR))
+
+    async def test_salvar__compra_nova__expected_compra_e_total_mensal(self):
+        # FIXTURES
+        compra = compra_schema.load(_compra('1', 100, '2021-01-02T00:00:00'))
+
+        # EXERCISE
+        result = await CompraService().salvar(compra)
+
+        # ASSERTS
+        self.assertEqual(result['status'], 'Em Validação')
+        documento = await self.database.get_collection('compra').find_one({'codigo': '1'})
+        self.assertEqual(documento['data'], datetime(2021, 1, 2))
+        mensal = await self.database.get_collection('compra-mensal').find_one({'cpf_revendedor': CPF})
+        self.assertEqual((mensal['ano_mes'], mensal['total'], mensal['quantidade']), ('2021-01', 100, 1))
+
+    async def test_salvar_lote__compras_validas_e_invalidas__expected_resultado_por_compra(self):
+        # FIXTURES
+        compras = [_compra('1', 100, '2021-01-02T00:00:00'), _compra('1', 50, '2021-01-03T00:00:00'), {'codigo': '2'}]
+
+        # EXERCISE
+        result = await CompraService().salvar_lote(CPF, compras)
+
+        # ASSERTS
+        self.assertEqual([item['status'] for item in result], ['criada', 'erro', 'erro'])
+        self.assertEqual(await self.database.get_collection('compra').count_documents({}), 1)
+
+    async def test_listar_por_cursor__mais_de_uma_pagina__expected_next(self):
+        # FIXTURES
+        compras = [_compra(str(i), 10, f'2021-01-{i % 28 + 1:02}T00:00:00') for i in range(105)]
+        service = CompraService()
+        await service.salvar_lote(CPF, compras)
+
+        # EXERCISE
+        pagina_1 = await service.listar_por_cursor(CPF)
+        pagina_2 = await service.listar_por_cursor(CPF, pagina_1['next'])
+
+        # ASSERTS
+        self.assertEqual((len(pagina_1['compras']), len(pagina_2['compras'])), (100, 5))
+        self.assertEqual((pagina_1['total'], pagina_2['next']), (105, None))
+        codigos = [compra.codigo for compra in pagina_1['compras'] + pagina_2['compras']]
+        self.assertEqual(sorted(codigos), sorted(str(i) for i in range(105)))
+
+    async def test_calcular_cashback__total_do_mes__expected_percentual(self):
+        # FIXTURES
+        service = CompraService()
+        await service.salvar_lote(
+            CPF, [_compra('1', 1200, '2021-01-02T00:00:00'), _compra('2', 10, '2021-02-02T00:00:00')]
+        )
+        compras = (await service.listar_paginado(CPF, 0))['compras']
+
+        # EXERCISE
+        result = await service.calcular_cashback(compras)
+
+        # ASSERTS
+        self.assertEqual(
+            [(compra.percentual_cashback, compra.valor_cashback) for compra in result], [(15, 180), (10, 1)]
+        )
+
+    async def test_login__senha_em_texto__expected_token_e_gravar_hash(self):
+        # EXERCISE
+        result, token = await RevendedorService().login(CPF, 'Senhaboita')
+
+        # ASSERTS
+        self.assertTrue(result)
+        self.assertIsNotNone(await self.database.get_collection('token').find_one({'token': token}))
+        revendedor = await self.database.get_collection('revendedor').find_one({'cpf': CPF})
+        self.assertTrue(revendedor['senha'].startswith('pbkdf2_sha256$'))
+
+    async def test_verificar_token__assinado_cache_nao_carregado__expected_carga_fora_do_event_loop(self):
+        # FIXTURES
+        token_revogado_cache = MagicMock(carregado=False)
+        to_thread = AsyncMock()
+
+        # EXERCISE
+        with patch.object(src.aio.service, 'TOKEN_MODO', 'assinado'), \
+                patch.object(src.aio.service, 'token_revogado_cache', token_revogado_cache), \
+                patch.object(src.aio.service, 'verificar_token', return_value=CPF), \
+                patch.object(src.aio.service.asyncio, 'to_thread', to_thread):
+            result = await RevendedorService().verificar_token('token')
+
+        # ASSERTS
+        self.assertEqual(CPF, result)
+        to_thread.assert_awaited_once_with(token_revogado_cache.carregar)
+        token_revogado_cache.carregar.assert_not_called()
+
+    async def test_obter_cashback_acumulado__api_com_erro__expected_503(self):
+        # FIXTURES
+        client = AsyncMock()
+        client.obter_credito.side_effect = CashbackApiError()
+
+        # EXERCISE
+        with patch.object(src.aio.service, 'cashback_api_client', return_value=client):
+            with self.assertRaises(src.aio.service.ApiValidationError) as context:
+                await CompraService().obter_cashback_acumulado(CPF)
+
+        # ASSERTS
+        self.assertEqual(context.exception.status_code, 503)
+
+
+class AioCashbackApiClientTest(AioTestCase):
+
+    async def test_obter_credito__erro_e_sucesso__expected_nova_tentativa(self):
+        # FIXTURES
+        respostas = [web.Response(status=502), web.json_response({'body': {'credit': 12.5}})]
+
+        async def _cashback(request):
+            return respostas.pop(0)
+
+        app = web.Application()
+        app.router.add_get('/', _cashback)
+        server = TestServer(app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        client = CashbackApiClient(url=str(server.make_url('/')), backoff=0)
+        self.addAsyncCleanup(client.fechar)
+
+        # EXERCISE
+        result = await client.obter_credito(CPF)
+
+        # ASSERTS
+        self.assertEqual(result, 12.5)
+        self.assertEqual(respostas, [])
+
+    async def test_obter_credito__resposta_sem_json__expected_erro_e_falha_no_circuito(self):
+        # FIXTURES
+        async def _cashback(request):
+            return web.Response(text='<html></html>', content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/', _cashback)
+        server = TestServer(app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        circuit_breaker = CircuitBreaker(limite_falhas=1, tempo_espera=30)
+        client = CashbackApiClient(url=str(server.make_url('/')), backoff=0, circuit_breaker=circuit_breaker)
+        self.addAsyncCleanup(client.fechar)
+
+        # EXERCISE
+        with self.assertRaises(CashbackApiError):
+            await client.obter_credito(CPF)
+
+        # ASSERTS
+        self.assertEqual(CircuitBreaker.ABERTO, circuit_breaker.estado)
+
+
+class AioRoutesTest(AioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with patch.object(src.aio, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False), \
+                patch.object(src.aio.async_mongo, 'init_app'):
+            self.client = create_asgi_app('mongodb://localhost:1/cashback').test_client()
+
+    async def test_rotas__cadastro_login_compra_e_listagem(self):
+        # EXERCISE
+        cadastro = await self.client.post('/api/v1/revendedor/', json=REVENDEDOR)
+        login = await self.client.post(
+            '/api/v1/revendedor/login', json={'cpf': CPF, 'senha': base64.b64encode(b'Senhaboita').decode()}
+        )
+        compra = await self.client.post(
+            f'/api/v1/revendedor/{CPF}/compra', json=_compra('1', 100, '2021-01-02T00:00:00')
+        )
+        listagem = await self.client.get(f'/api/v1/revendedor/{CPF}/compras')
+        exportacao = await self.client.get(f'/api/v1/revendedor/{CPF}/compras/exportar?formato=ndjson')
+
+        # ASSERTS
+        self.assertEqual(
+            [cadastro.status_code, login.status_code, compra.status_code, listagem.status_code],
+            [201, 200, 201, 200]
+        )
+        self.assertEqual((await listagem.get_json())['total'], 1)
+        self.assertEqual(len((await exportacao.get_data(as_text=True)).splitlines()), 1)
+
+    async def test_rotas__cursor_invalido__expected_400(self):
+        # EXERCISE
+        response = await self.client.get(f'/api/v1/revendedor/{CPF}/compras?cursor=invalido')
+
+        # ASSERTS
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(await response.get_json(), {'message': 'Cursor inválido.'})
+
+    async def test_rotas__exportar_revendedor_nao_cadastrado__expected_404(self):
+        # EXERCISE
+        response = await self.client.get(f'/api/v1/revendedor/{CPF}/compras/exportar?formato=csv')
+
+        # ASSERTS
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(await response.get_json(), {'message': 'O revendedor informado não foi encontrado.'})
+
+    async def test_rotas__listagem_com_if_none_match__expected_304(self):
+        # FIXTURES
+        await self.client.post('/api/v1/revendedor/', json=REVENDEDOR)
+        await self.client.post(f'/api/v1/revendedor/{CPF}/compra', json=_compra('1', 100, '2021-01-02T00:00:00'))
+        primeira = await self.client.get(f'/api/v1/revendedor/{CPF}/compras')
+
+        # EXERCISE
+        response = await self.client.get(
+            f'/api/v1/revendedor/{CPF}/compras', headers={'If-None-Match': primeira.headers['ETag']}
+        )
+
+        # ASSERTS
+        self.assertEqual(200, primeira.status_code)
+        self.assertEqual(304, response.status_code)
+
+    @patch.object(src.api.decoradores, 'ADMIN_TOKEN', 'admin')
+    async def test_rotas__admin_token_invalido_ou_nao_ascii__expected_403(self):
+        # EXERCISE
+        valido = await self.client.get('/api/v1/admin/consultas-lentas', headers={'X-Admin-Token': 'admin'})
+        nao_ascii = await self.client.get('/api/v1/admin/consultas-lentas', headers={'X-Admin-Token': 'é'})
+
+        # ASSERTS
+        self.assertEqual(200, valido.status_code)
+        self.assertEqual(await valido.get_json(), [])
+        self.assertEqual(403, nao_ascii.status_code)
+
+    @patch.object(src.api.decoradores, 'AUTENTICACAO_OBRIGATORIA', True)
+    async def test_rotas__token_invalido__expected_401(self):
+        response = await self.client.get(
+            f'/api/v1/revendedor/{CPF}/compras', headers={'Authorization': 'Bearer abc.é'}
+        )
+
+        self.assertEqual(401, response.status_code)
+
+    def test_rotas__expected_mesmas_rotas_da_api_sincrona(self):
+        # FIXTURES
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+        with patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False):
+            app = create_app('', backend=repositorio.BACKEND_MEMORIA)
+
+        def _rotas(mapa) -> set:
+            return {
+                (regra.rule, frozenset(regra.methods - {'HEAD', 'OPTIONS'}))
+                for regra in mapa.iter_rules() if regra.endpoint != 'static'
+            }
+
+        # EXERCISE
+        rotas_sincronas = _rotas(app.url_map)
+        rotas_asyncio = _rotas(self.client.app.url_map)
+
+        # ASSERTS
+        self.assertEqual(rotas_sincronas, rotas_asyncio)
+        self.assertIn(('/api/v1/admin/consultas-lentas', frozenset({'GET'})), rotas_asyncio)
+
+    async def test_metricas__requisicao__expected_duracao_por_rota(self):
+        # FIXTURES
+        metrics.limpar()
+        with patch.object(src.aio, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False), \
+                patch.object(src.aio, 'METRICAS_HABILITADAS', True), \
+                patch.object(src.aio.async_mongo, 'init_app'):
+            client = create_asgi_app('mongodb://localhost:1/cashback').test_client()
+
+        # EXERCISE
+        await client.get(f'/api/v1/revendedor/{CPF}/compras')
+        with patch.object(src.api.decoradores, 'ADMIN_TOKEN', 'admin'):
+            sem_token = await client.get('/metrics')
+            response = await client.get('/metrics', headers={'X-Admin-Token': 'admin'})
+
+        # ASSERTS
+        self.assertEqual(403, sem_token.status_code)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            1, metrics.requisicao_segundos.quantidade('/api/v1/revendedor/<string:cpf>/compras', 'GET', '200')
+        )
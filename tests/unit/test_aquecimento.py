@@ -0,0 +1,133 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, Mock, MagicMock
+
+import src
+import src.aquecimento
+import src.database
+import src.gunicorn_conf
+from src import create_app, repositorio
+from src.aquecimento import abrir_conexoes, aquecer, memoria
+from src.domain.pre_aprovado import revendedor_pre_aprovado_cache
+from src.domain.token import token_revogado_cache
+
+
+class AbrirConexoesTest(unittest.TestCase):
+
+    def test_abrir_conexoes__quantidade__expected_um_ping_por_conexao(self):
+        # FIXTURES
+        cliente = MagicMock()
+
+        # EXERCISE
+        abertas = abrir_conexoes(cliente, 4)
+
+        # ASSERTS
+        self.assertEqual(4, abertas)
+        self.assertEqual(4, cliente.admin.command.call_count)
+        cliente.admin.command.assert_called_with('ping')
+
+    @patch.object(src.aquecimento, 'MONGO_MAX_POOL_SIZE', 2)
+    def test_abrir_conexoes__acima_do_pool__expected_limitado_ao_max_pool_size(self):
+        cliente = MagicMock()
+
+        self.assertEqual(2, abrir_conexoes(cliente, 10))
+        self.assertEqual(2, cliente.admin.command.call_count)
+
+    def test_abrir_conexoes__zero__expected_sem_comandos(self):
+        cliente = MagicMock()
+
+        self.assertEqual(0, abrir_conexoes(cliente, 0))
+        cliente.admin.command.assert_not_called()
+
+
+class AquecerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+
+    @patch.object(src.aquecimento, 'mongo')
+    @patch.object(src.aquecimento, 'CRIAR_INDICES_NA_INICIALIZACAO', True)
+    @patch.object(src.database, 'ensure_indexes')
+    @patch.object(revendedor_pre_aprovado_cache, 'carregar', return_value=3)
+    def test_aquecer__mongo__expected_conexoes_indices_e_caches(self, carregar_mock, ensure_indexes_mock, mongo_mock):
+        # FIXTURES
+        app = SimpleNamespace(config={'REPOSITORIO_BACKEND': repositorio.BACKEND_MONGO})
+
+        # EXERCISE
+        resultado = aquecer(app, conexoes=2)
+
+        # ASSERTS
+        self.assertEqual(2, resultado['conexoes'])
+        self.assertEqual({'revendedor-pre-aprovado': 3}, resultado['caches'])
+        self.assertGreaterEqual(resultado['segundos'], 0)
+        self.assertEqual(2, mongo_mock.cx.admin.command.call_count)
+        ensure_indexes_mock.assert_called_once_with(mongo_mock.db)
+        carregar_mock.assert_called_once_with()
+
+    @patch.object(src.aquecimento, 'mongo')
+    @patch.object(src.aquecimento, 'TOKEN_MODO', 'assinado')
+    @patch.object(token_revogado_cache, 'carregar', return_value=5)
+    @patch.object(revendedor_pre_aprovado_cache, 'carregar', return_value=1)
+    def test_aquecer__memoria_token_assinado__expected_sem_conexoes_e_tokens_revogados(self, _, __, mongo_mock):
+        app = SimpleNamespace(config={'REPOSITORIO_BACKEND': repositorio.BACKEND_MEMORIA})
+
+        resultado = aquecer(app, conexoes=2)
+
+        self.assertEqual(0, resultado['conexoes'])
+        self.assertEqual({'revendedor-pre-aprovado': 1, 'token-revogado': 5}, resultado['caches'])
+        mongo_mock.cx.admin.command.assert_not_called()
+
+    @patch.object(revendedor_pre_aprovado_cache, 'carregar')
+    def test_create_app__aquecer_false__expected_sem_carga_dos_caches(self, carregar_mock):
+        create_app('', backend=repositorio.BACKEND_MEMORIA, aquecer=False)
+
+        carregar_mock.assert_not_called()
+
+    @patch.object(revendedor_pre_aprovado_cache, 'carregar', return_value=0)
+    @patch.object(src.mongo, 'init_app')
+    def test_create_app__mongo__expected_client_sem_conectar_e_caches_carregados(self, init_app_mock, carregar_mock):
+        create_app('mongodb://localhost:1/cashback')
+
+        self.assertFalse(init_app_mock.call_args.kwargs['connect'])
+        carregar_mock.assert_called_once_with()
+
+    def test_memoria__expected_residente_e_pico(self):
+        uso = memoria()
+
+        self.assertGreater(uso['pico_mb'], 0)
+        if uso['residente_mb'] is not None:
+            self.assertGreater(uso['residente_mb'], 0)
+
+
+class GunicornConfTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+        app = create_app('', backend=repositorio.BACKEND_MEMORIA, aquecer=False)
+        self.worker = SimpleNamespace(pid=123, wsgi=app, log=Mock())
+        src.gunicorn_conf.post_fork(Mock(), self.worker)
+
+    @patch.object(src.gunicorn_conf, 'aquecer', return_value={'conexoes': 8, 'caches': {}, 'segundos': 0.1})
+    def test_post_worker_init__expected_aquecimento_e_relatorio(self, aquecer_mock):
+        # EXERCISE
+        src.gunicorn_conf.post_worker_init(self.worker)
+
+        # ASSERTS
+        aquecer_mock.assert_called_once_with(self.worker.wsgi, src.gunicorn_conf.AQUECIMENTO_CONEXOES)
+        mensagem = self.worker.log.info.call_args.args[0] % self.worker.log.info.call_args.args[1:]
+        self.assertIn('Worker 123 pronto em', mensagem)
+        self.assertIn('8 conexões', mensagem)
+        self.assertIn('pico', mensagem)
+
+    @patch.object(src.gunicorn_conf, 'aquecer', side_effect=RuntimeError('mongo indisponível'))
+    def test_post_worker_init__erro_no_aquecimento__expected_worker_sobe_sem_aquecimento(self, _):
+        src.gunicorn_conf.post_worker_init(self.worker)
+
+        self.worker.log.exception.assert_called_once()
+        mensagem = self.worker.log.info.call_args.args[0] % self.worker.log.info.call_args.args[1:]
+        self.assertIn('sem aquecimento', mensagem)
+
+    def test_configuracao__expected_workers_threads_sem_preload(self):
+        self.assertEqual('gthread', src.gunicorn_conf.worker_class)
+        self.assertFalse(src.gunicorn_conf.preload_app)
+        self.assertEqual('src.wsgi:app', src.gunicorn_conf.wsgi_app)
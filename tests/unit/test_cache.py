@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import Mock, AsyncMock
+
+from src.cache import TTLCache, StaleWhileRevalidateCache, AsyncStaleWhileRevalidateCache
+
+
+class _ExecutorSincrono:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.agora = 0
+        self.cache = TTLCache(ttl=10, tamanho_maximo=2, relogio=lambda: self.agora)
+
+    def test_obter__item_dentro_do_ttl__expected_valor(self):
+        self.cache.definir('a', 1)
+        self.agora = 9
+
+        self.assertEqual(1, self.cache.obter('a'))
+
+    def test_obter__item_expirado__expected_none(self):
+        self.cache.definir('a', 1)
+        self.agora = 10
+
+        self.assertIsNone(self.cache.obter('a'))
+
+    def test_definir__tamanho_maximo__expected_remover_menos_usado(self):
+        self.cache.definir('a', 1)
+        self.cache.definir('b', 2)
+        self.cache.obter('a')
+
+        self.cache.definir('c', 3)
+
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(1, self.cache.obter('a'))
+        self.assertIsNone(self.cache.obter('b'))
+        self.assertEqual(3, self.cache.obter('c'))
+
+    def test_estatisticas__acertos_e_falhas__expected_contadores(self):
+        self.cache.definir('a', 1)
+        self.cache.obter('a')
+        self.cache.obter('b')
+        self.agora = 10
+        self.cache.obter('a')
+
+        self.assertEqual({'acertos': 1, 'falhas': 2, 'tamanho': 1}, self.cache.estatisticas())
+
+    def test_invalidar__item_existente__expected_none(self):
+        self.cache.definir('a', 1)
+
+        self.cache.invalidar('a')
+
+        self.assertIsNone(self.cache.obter('a'))
+
+
+class StaleWhileRevalidateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.agora = 0
+        self.cache = StaleWhileRevalidateCache(
+            ttl=10, tempo_stale=20, tamanho_maximo=10, relogio=lambda: self.agora, executor=_ExecutorSincrono()
+        )
+
+    def test_obter_ou_carregar__sem_item__expected_carregar(self):
+        carregar = Mock(return_value=5)
+
+        result = self.cache.obter_ou_carregar('a', carregar)
+
+        self.assertEqual((5, 0), result)
+        carregar.assert_called_once()
+
+    def test_obter_ou_carregar__item_valido__expected_nao_carregar(self):
+        self.cache.obter_ou_carregar('a', Mock(return_value=5))
+        self.agora = 5
+        carregar = Mock(return_value=6)
+
+        result = self.cache.obter_ou_carregar('a', carregar)
+
+        self.assertEqual((5, 0), result)
+        carregar.assert_not_called()
+
+    def test_obter_ou_carregar__item_stale__expected_valor_antigo_e_atualizar(self):
+        self.cache.obter_ou_carregar('a', Mock(return_value=5))
+        self.agora = 15
+        carregar = Mock(return_value=6)
+
+        result = self.cache.obter_ou_carregar('a', carregar)
+
+        self.assertEqual((5, 0), result)
+        carregar.assert_called_once()
+        self.assertEqual((6, 15), self.cache.obter_ou_carregar('a', carregar))
+
+    def test_obter_ou_carregar__item_alem_do_stale__expected_carregar(self):
+        self.cache.obter_ou_carregar('a', Mock(return_value=5))
+        self.agora = 30
+
+        result = self.cache.obter_ou_carregar('a', Mock(return_value=6))
+
+        self.assertEqual((6, 30), result)
+
+    def test_obter_ou_carregar__erro_ao_carregar__expected_erro_sem_cache(self):
+        with self.assertRaises(ValueError):
+            self.cache.obter_ou_carregar('a', Mock(side_effect=ValueError()))
+
+        self.assertEqual((1, 0), self.cache.obter_ou_carregar('a', Mock(return_value=1)))
+
+    def test_obter_ou_carregar__cargas_simultaneas__expected_uma_chamada(self):
+        liberar = threading.Event()
+        chamadas = []
+
+        def carregar():
+            chamadas.append(1)
+            liberar.wait(1)
+            return 7
+
+        resultados = []
+        threads = [
+            threading.Thread(target=lambda: resultados.append(self.cache.obter_ou_carregar('a', carregar)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        liberar.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(chamadas))
+        self.assertEqual([(7, 0)] * 5, resultados)
+
+
+class AsyncStaleWhileRevalidateCacheTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.agora = 0
+        self.cache = AsyncStaleWhileRevalidateCache(
+            ttl=10, tempo_stale=20, tamanho_maximo=10, relogio=lambda: self.agora
+        )
+
+    async def test_obter_ou_carregar__item_valido__expected_nao_carregar(self):
+        await self.cache.obter_ou_carregar('a', AsyncMock(return_value=5))
+        self.agora = 5
+        carregar = AsyncMock(return_value=6)
+
+        result = await self.cache.obter_ou_carregar('a', carregar)
+
+        self.assertEqual((5, 0), result)
+        carregar.assert_not_called()
+
+    async def test_obter_ou_carregar__item_stale__expected_valor_antigo_e_atualizar(self):
+        await self.cache.obter_ou_carregar('a', AsyncMock(return_value=5))
+        self.agora = 15
+        carregar = AsyncMock(return_value=6)
+
+        result = await self.cache.obter_ou_carregar('a', carregar)
+        await asyncio.sleep(0)
+
+        self.assertEqual((5, 0), result)
+        carregar.assert_awaited_once()
+        self.assertEqual((6, 15), await self.cache.obter_ou_carregar('a', carregar))
+
+    async def test_obter_ou_carregar__erro_ao_carregar__expected_erro_sem_cache(self):
+        with self.assertRaises(ValueError):
+            await self.cache.obter_ou_carregar('a', AsyncMock(side_effect=ValueError()))
+
+        self.assertEqual((1, 0), await self.cache.obter_ou_carregar('a', AsyncMock(return_value=1)))
+
+    async def test_obter_ou_carregar__cargas_simultaneas__expected_uma_chamada(self):
+        liberar = asyncio.Event()
+        chamadas = []
+
+        async def carregar():
+            chamadas.append(1)
+            await liberar.wait()
+            return 7
+
+        tarefas = [asyncio.create_task(self.cache.obter_ou_carregar('a', carregar)) for _ in range(5)]
+        await asyncio.sleep(0)
+        liberar.set()
+        resultados = await asyncio.gather(*tarefas)
+
+        self.assertEqual(1, len(chamadas))
+        self.assertEqual([(7, 0)] * 5, resultados)
+
+    async def test_obter_ou_carregar__requisicao_cancelada__expected_carga_continua(self):
+        liberar = asyncio.Event()
+
+        async def carregar():
+            await liberar.wait()
+            return 7
+
+        tarefa = asyncio.create_task(self.cache.obter_ou_carregar('a', carregar))
+        await asyncio.sleep(0)
+        tarefa.cancel()
+        liberar.set()
+
+        self.assertEqual((7, 0), await self.cache.obter_ou_carregar('a', carregar))
@@ -0,0 +1,214 @@
+import unittest
+from unittest.mock import patch, Mock
+
+import requests
+
+import src.domain.cashback_api
+from src.domain.cashback_api import CashbackApiClient, CashbackApiError, CircuitBreaker, CircuitoAbertoError
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.agora = 0
+        self.circuit_breaker = CircuitBreaker(limite_falhas=2, tempo_espera=30, relogio=lambda: self.agora)
+
+    def test_permitir__falhas_abaixo_do_limite__expected_fechado(self):
+        self.circuit_breaker.registrar_falha()
+
+        self.assertTrue(self.circuit_breaker.permitir())
+        self.assertEqual(CircuitBreaker.FECHADO, self.circuit_breaker.estado)
+
+    def test_permitir__falhas_no_limite__expected_aberto(self):
+        self.circuit_breaker.registrar_falha()
+        self.circuit_breaker.registrar_falha()
+
+        self.assertFalse(self.circuit_breaker.permitir())
+        self.assertEqual(CircuitBreaker.ABERTO, self.circuit_breaker.estado)
+
+    def test_permitir__tempo_espera_passou__expected_uma_chamada_de_teste(self):
+        self.circuit_breaker.registrar_falha()
+        self.circuit_breaker.registrar_falha()
+        self.agora = 30
+
+        self.assertTrue(self.circuit_breaker.permitir())
+        self.assertFalse(self.circuit_breaker.permitir())
+
+        self.circuit_breaker.registrar_sucesso()
+        self.assertTrue(self.circuit_breaker.permitir())
+        self.assertEqual(CircuitBreaker.FECHADO, self.circuit_breaker.estado)
+
+    def test_registrar_falha__chamada_de_teste_falhou__expected_aberto(self):
+        self.circuit_breaker.registrar_falha()
+        self.circuit_breaker.registrar_falha()
+        self.agora = 30
+        self.circuit_breaker.permitir()
+
+        self.circuit_breaker.registrar_falha()
+
+        self.assertFalse(self.circuit_breaker.permitir())
+
+    def test_permitir__chamada_de_teste_sem_resultado__expected_nova_chamada_apos_espera(self):
+        self.circuit_breaker.registrar_falha()
+        self.circuit_breaker.registrar_falha()
+        self.agora = 30
+        self.circuit_breaker.permitir()
+
+        self.agora = 45
+        self.assertFalse(self.circuit_breaker.permitir())
+        self.agora = 60
+        self.assertTrue(self.circuit_breaker.permitir())
+        self.assertEqual(CircuitBreaker.MEIO_ABERTO, self.circuit_breaker.estado)
+
+
+@patch.object(src.domain.cashback_api, 'time')
+class CashbackApiClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.circuit_breaker_mock = Mock()
+        self.circuit_breaker_mock.permitir.return_value = True
+        self.client = CashbackApiClient(
+            url='http://cashback/v1/cashback',
+            token='token',
+            connect_timeout=1,
+            read_timeout=2,
+            max_tentativas=3,
+            circuit_breaker=self.circuit_breaker_mock
+        )
+        self.session_mock = Mock()
+        self.client._session = self.session_mock
+
+    @staticmethod
+    def _response(status_code, json=None):
+        response = Mock()
+        response.ok = status_code < 400
+        response.status_code = status_code
+        response.json.return_value = json
+        return response
+
+    def test_obter_credito__resposta_ok__expected_credito(self, time_mock):
+        # FIXTURES
+        self.session_mock.get.return_value = self._response(200, {'body': {'credit': 1234}})
+
+        # EXERCISE
+        result = self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.assertEqual(1234, result)
+        self.session_mock.get.assert_called_once_with(
+            'http://cashback/v1/cashback', params={'cpf': '23423434343'}, timeout=(1, 2)
+        )
+        self.circuit_breaker_mock.registrar_sucesso.assert_called_once()
+
+    def test_obter_credito__timeout_e_depois_ok__expected_nova_tentativa(self, time_mock):
+        # FIXTURES
+        self.session_mock.get.side_effect = [
+            requests.Timeout(), self._response(503), self._response(200, {'body': {'credit': 10}})
+        ]
+
+        # EXERCISE
+        result = self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.assertEqual(10, result)
+        self.assertEqual(3, self.session_mock.get.call_count)
+        self.assertEqual(2, time_mock.sleep.call_count)
+        self.circuit_breaker_mock.registrar_falha.assert_not_called()
+
+    @patch.object(src.domain.cashback_api, 'observar_upstream')
+    def test_obter_credito__tentativas__expected_duracao_de_cada_chamada(self, observar_upstream_mock, time_mock):
+        # FIXTURES
+        self.session_mock.get.side_effect = [requests.Timeout(), self._response(200, {'body': {'credit': 10}})]
+
+        # EXERCISE
+        self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.assertEqual(['erro', '200'], [_call.args[1] for _call in observar_upstream_mock.call_args_list])
+        self.assertEqual({'cashback'}, {_call.args[0] for _call in observar_upstream_mock.call_args_list})
+
+    def test_obter_credito__tentativas_esgotadas__expected_erro_e_falha_no_circuito(self, time_mock):
+        # FIXTURES
+        self.session_mock.get.side_effect = requests.ConnectionError()
+
+        # EXERCISE
+        with self.assertRaises(CashbackApiError):
+            self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.assertEqual(3, self.session_mock.get.call_count)
+        self.circuit_breaker_mock.registrar_falha.assert_called_once()
+
+    def test_obter_credito__erro_do_cliente__expected_erro_sem_nova_tentativa(self, time_mock):
+        # FIXTURES
+        self.session_mock.get.return_value = self._response(401)
+
+        # EXERCISE
+        with self.assertRaises(CashbackApiError):
+            self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.session_mock.get.assert_called_once()
+
+    def test_obter_credito__circuito_aberto__expected_falhar_sem_chamar_api(self, time_mock):
+        # FIXTURES
+        self.circuit_breaker_mock.permitir.return_value = False
+
+        # EXERCISE
+        with self.assertRaises(CircuitoAbertoError):
+            self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.session_mock.get.assert_not_called()
+
+    def test_obter_credito__corpo_incompleto__expected_nova_tentativa_e_falha_no_circuito(self, time_mock):
+        # FIXTURES
+        self.session_mock.get.side_effect = requests.exceptions.ChunkedEncodingError()
+
+        # EXERCISE
+        with self.assertRaises(CashbackApiError):
+            self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.assertEqual(3, self.session_mock.get.call_count)
+        self.circuit_breaker_mock.registrar_falha.assert_called_once()
+
+    def test_obter_credito__resposta_invalida__expected_erro_e_falha_no_circuito(self, time_mock):
+        # FIXTURES
+        self.session_mock.get.return_value = self._response(200, {'erro': 'sem body'})
+
+        # EXERCISE
+        with self.assertRaises(CashbackApiError):
+            self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.circuit_breaker_mock.registrar_falha.assert_called_once()
+        self.circuit_breaker_mock.registrar_sucesso.assert_not_called()
+
+    def test_obter_credito__excecao_inesperada__expected_falha_no_circuito(self, time_mock):
+        self.session_mock.get.side_effect = RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            self.client.obter_credito('23423434343')
+
+        self.circuit_breaker_mock.registrar_falha.assert_called_once()
+
+    def test_obter_credito__chamada_de_teste_com_resposta_invalida__expected_circuito_aberto(self, time_mock):
+        # FIXTURES
+        agora = [0]
+        self.client._circuit_breaker = CircuitBreaker(limite_falhas=1, tempo_espera=30, relogio=lambda: agora[0])
+        self.client._circuit_breaker.registrar_falha()
+        agora[0] = 30
+        response = self._response(200)
+        response.json.side_effect = ValueError()
+        self.session_mock.get.return_value = response
+
+        # EXERCISE
+        with self.assertRaises(CashbackApiError):
+            self.client.obter_credito('23423434343')
+
+        # ASSERTS
+        self.assertEqual(CircuitBreaker.ABERTO, self.client._circuit_breaker.estado)
+        agora[0] = 60
+        self.session_mock.get.return_value = self._response(200, {'body': {'credit': 5}})
+        self.assertEqual(5, self.client.obter_credito('23423434343'))
@@ -1,25 +1,39 @@
 import datetime
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, call
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 import src.domain.service
-from src.domain.service import CompraService
-from src.model import Revendedor, Compra, CompraCashBack
+from src.api.errors import ApiValidationError
+from src.domain.cashback_api import CircuitoAbertoError
+from src.domain.service import CompraService, TAMANHO_PAGINA, codificar_cursor, decodificar_cursor
+from src.model import Compra
 
 
 class CompraServiceTest(unittest.TestCase):
 
     def setUp(self):
         self.revendedor_collection_mock = Mock()
-        self.revendedor_pre_aprovado_collection_mock = Mock()
         self.compra_collection_mock = Mock()
+        self.compra_mensal_collection_mock = Mock()
+        self.controle_collection_mock = Mock()
         self.revendedor_service_mock = Mock()
+        src.domain.service.saldo_cashback_cache.limpar()
+
+        patcher = patch.object(src.domain.service, 'revendedor_pre_aprovado_cache')
+        self.pre_aprovado_cache_mock = patcher.start()
+        self.pre_aprovado_cache_mock.contem.return_value = False
+        self.addCleanup(patcher.stop)
 
     def mock_objects(self, mongo_mock, revendedor_service):
         collections = {
             'revendedor': self.revendedor_collection_mock,
-            'revendedor-pre-aprovado': self.revendedor_pre_aprovado_collection_mock,
-            'compra': self.compra_collection_mock
+            'compra': self.compra_collection_mock,
+            'compra-mensal': self.compra_mensal_collection_mock,
+            'controle': self.controle_collection_mock
         }
 
         def _get_collection(name):
@@ -34,7 +48,7 @@ class CompraServiceTest(unittest.TestCase):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_service_mock)
         self.compra_collection_mock.find_one.return_value = None
-        self.revendedor_pre_aprovado_collection_mock.find_one.return_value = None
+        self.pre_aprovado_cache_mock.contem.return_value = False
         compra = Compra(codigo='333', cpf_revendedor='23232323', valor=22.1, data=datetime.datetime(2020, 1, 1))
 
         # EXERCISE
@@ -43,17 +57,25 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.revendedor_service_mock.obter.assert_called_once_with('23232323')
-        self.revendedor_pre_aprovado_collection_mock.find_one.assert_called_once_with({'cpf': '23232323'})
+        self.pre_aprovado_cache_mock.contem.assert_called_once_with('23232323')
         self.compra_collection_mock.find_one.assert_called_once_with({'codigo': '333'})
         self.compra_collection_mock.insert_one.assert_called_once_with(
             {
                 'codigo': '333',
                 'cpf_revendedor': '23232323',
-                'data': datetime.datetime(2020, 1, 1).isoformat(),
+                'data': datetime.datetime(2020, 1, 1),
                 'status': 'Em Validação',
                 'valor': 22.1
             }
         )
+        self.compra_mensal_collection_mock.update_one.assert_called_once_with(
+            {'cpf_revendedor': '23232323', 'ano_mes': '2020-01'},
+            {'$inc': {'total': 22.1, 'quantidade': 1}},
+            upsert=True
+        )
+        self.controle_collection_mock.update_one.assert_called_once_with(
+            {'_id': 'compra:23232323'}, {'$inc': {'versao': 1}}, upsert=True
+        )
 
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
@@ -63,6 +85,7 @@ class CompraServiceTest(unittest.TestCase):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_service_mock)
         self.compra_collection_mock.find_one.return_value = None
+        self.pre_aprovado_cache_mock.contem.return_value = True
         compra = Compra(codigo='333', cpf_revendedor='23232323', valor=22.1, data=datetime.datetime(2020, 1, 1))
 
         # EXERCISE
@@ -71,24 +94,49 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.revendedor_service_mock.obter.assert_called_once_with('23232323')
-        self.revendedor_pre_aprovado_collection_mock.find_one.assert_called_once_with({'cpf': '23232323'})
+        self.pre_aprovado_cache_mock.contem.assert_called_once_with('23232323')
         self.compra_collection_mock.find_one.assert_called_once_with({'codigo': '333'})
         self.compra_collection_mock.insert_one.assert_called_once_with(
             {
                 'codigo': '333',
                 'cpf_revendedor': '23232323',
-                'data': datetime.datetime(2020, 1, 1).isoformat(),
+                'data': datetime.datetime(2020, 1, 1),
                 'status': 'Aprovado',
                 'valor': 22.1
             }
         )
 
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_salvar__compra_nao_cadastrada__expected_compra_serializada(self, mongo_mock, revendedor_service_mock):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_service_mock)
+        self.compra_collection_mock.find_one.return_value = None
+        self.pre_aprovado_cache_mock.contem.return_value = False
+        compra = Compra(codigo='333', cpf_revendedor='23232323', valor=22.1, data=datetime.datetime(2020, 1, 1))
+
+        # EXERCISE
+        service = CompraService()
+        result = service.salvar(compra)
+
+        # ASSERTS
+        self.assertEqual(
+            {
+                'codigo': '333',
+                'cpf_revendedor': '23232323',
+                'data': '2020-01-01T00:00:00',
+                'status': 'Em Validação',
+                'valor': 22.1
+            },
+            result
+        )
+
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
     def test_salvar__compra_cadastrada__expected_exception(self, mongo_mock, revendedor_service_mock):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_service_mock)
-        self.revendedor_pre_aprovado_collection_mock.find_one.return_value = None
+        self.pre_aprovado_cache_mock.contem.return_value = False
         compra = Compra(codigo='333', cpf_revendedor='23232323', valor=22.1, data=datetime.datetime(2020, 1, 1))
 
         # EXERCISE
@@ -99,9 +147,10 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.revendedor_service_mock.obter.assert_called_once_with('23232323')
-        self.revendedor_pre_aprovado_collection_mock.assert_not_called()
+        self.pre_aprovado_cache_mock.contem.assert_not_called()
         self.compra_collection_mock.find_one.assert_called_once_with({'codigo': '333'})
         self.compra_collection_mock.insert_one.assert_not_called()
+        self.compra_mensal_collection_mock.update_one.assert_not_called()
 
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
@@ -119,9 +168,10 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.revendedor_service_mock.obter.assert_called_once_with('23232323')
-        self.revendedor_pre_aprovado_collection_mock.assert_not_called()
+        self.pre_aprovado_cache_mock.contem.assert_not_called()
         self.compra_collection_mock.find_one.assert_not_called()
         self.compra_collection_mock.insert_one.assert_not_called()
+        self.compra_mensal_collection_mock.update_one.assert_not_called()
 
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
@@ -131,7 +181,7 @@ class CompraServiceTest(unittest.TestCase):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_mock)
 
-        self.compra_collection_mock.aggregate.return_value = yield {'total', 999.99}
+        self.compra_mensal_collection_mock.find_one.return_value = {'total': 999.99}
         cpf = '123123233'
         ano = 2020
         mes = 1
@@ -142,15 +192,10 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.assertEqual(10, result)
-        self.compra_collection_mock.aggregate.assert_called_once_with([
-                {'$match': {'$and': [
-                    {'cpf_revendedor': cpf},
-                    {'data': {'$gte': datetime.datetime(2020, 1, 1).isoformat()}},
-                    {'data': {'$lt': datetime.datetime(2020, 2, 1).isoformat()}}
-                ]}
-                },
-                {'$group': {'_id': '$cpf_revendedor', 'total': {'$sum': '$valor'}}}
-            ])
+        self.compra_mensal_collection_mock.find_one.assert_called_once_with(
+            {'cpf_revendedor': cpf, 'ano_mes': '2020-01'}
+        )
+        self.compra_collection_mock.aggregate.assert_not_called()
 
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
@@ -160,7 +205,7 @@ class CompraServiceTest(unittest.TestCase):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_mock)
 
-        self.compra_collection_mock.aggregate.return_value = yield {'total', 1499.99}
+        self.compra_mensal_collection_mock.find_one.return_value = {'total': 1499.99}
         cpf = '123123233'
         ano = 2020
         mes = 1
@@ -171,16 +216,10 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.assertEqual(15, result)
-        self.compra_collection_mock.aggregate.assert_called_once_with([
-                {'$match': {'$and': [
-                    {'cpf_revendedor': cpf},
-                    {'data': {'$gte': datetime.datetime(2020, 1, 1).isoformat()}},
-                    {'data': {'$lt': datetime.datetime(2020, 2, 1).isoformat()}}
-                ]}
-                },
-                {'$group': {'_id': '$cpf_revendedor', 'total': {'$sum': '$valor'}}}
-            ])
-
+        self.compra_mensal_collection_mock.find_one.assert_called_once_with(
+            {'cpf_revendedor': cpf, 'ano_mes': '2020-01'}
+        )
+        self.compra_collection_mock.aggregate.assert_not_called()
 
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
@@ -190,7 +229,7 @@ class CompraServiceTest(unittest.TestCase):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_mock)
 
-        self.compra_collection_mock.aggregate.return_value = yield {'total', 1501.00}
+        self.compra_mensal_collection_mock.find_one.return_value = {'total': 1501.00}
         cpf = '123123233'
         ano = 2020
         mes = 1
@@ -201,15 +240,26 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.assertEqual(20, result)
-        self.compra_collection_mock.aggregate.assert_called_once_with([
-            {'$match': {'$and': [
-                {'cpf_revendedor': cpf},
-                {'data': {'$gte': datetime.datetime(2020, 1, 1).isoformat()}},
-                {'data': {'$lt': datetime.datetime(2020, 2, 1).isoformat()}}
-            ]}
-            },
-            {'$group': {'_id': '$cpf_revendedor', 'total': {'$sum': '$valor'}}}
-        ])
+        self.compra_mensal_collection_mock.find_one.assert_called_once_with(
+            {'cpf_revendedor': cpf, 'ano_mes': '2020-01'}
+        )
+        self.compra_collection_mock.aggregate.assert_not_called()
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_obter_percentual_cashback__sem_compras_no_mes__expected_10_porcento(
+            self, mongo_mock, revendedor_mock
+    ):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        self.compra_mensal_collection_mock.find_one.return_value = None
+
+        # EXERCISE
+        service = CompraService()
+        result = service.obter_percentual_cashback('123123233', 2020, 1)
+
+        # ASSERTS
+        self.assertEqual(10, result)
 
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
@@ -219,7 +269,7 @@ class CompraServiceTest(unittest.TestCase):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_mock)
 
-        self.compra_collection_mock.aggregate.return_value = yield {'total', 1501.00}
+        self.compra_mensal_collection_mock.find.return_value = [{'ano_mes': '2020-01', 'total': 1501.00}]
         cpf = '30672391643'
         compra = Compra(codigo='333', cpf_revendedor=cpf, valor=22.1, data=datetime.datetime(2020, 1, 15))
 
@@ -229,35 +279,334 @@ class CompraServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.assertIsNotNone(result)
-        self.assertEqual(
-            [
-                CompraCashBack(
-                    codigo=compra.codigo,
-                    cpf_revendedor=compra.cpf_revendedor,
-                    valor=compra.valor,
-                    data=compra.data,
-                    status=compra.status,
-                    percentual_cashback=20,
-                    valor_cashback=4.42
-                )
-            ],
-            result)
-
-    @patch.object(src.domain.service, 'requests')
+        self.assertEqual(1, len(result))
+        self.assertEqual(compra.codigo, result[0].codigo)
+        self.assertEqual(compra.cpf_revendedor, result[0].cpf_revendedor)
+        self.assertEqual(compra.valor, result[0].valor)
+        self.assertEqual(compra.data, result[0].data)
+        self.assertEqual(compra.status, result[0].status)
+        self.assertEqual(20, result[0].percentual_cashback)
+        self.assertEqual(4.42, result[0].valor_cashback)
+
+    @patch.object(src.domain.service, 'cashback_api_client')
     @patch.object(src.domain.service, 'RevendedorService')
     @patch.object(src.domain.service, 'mongo')
     def test_obter_cashback_acumulado__cashback_compras__expected_cashback(
-            self, mongo_mock, revendedor_mock, requests_mock
+            self, mongo_mock, revendedor_mock, cashback_api_client_mock
     ):
         # FIXTURES
         self.mock_objects(mongo_mock, revendedor_mock)
-        response_mock = Mock()
-        response_mock.json.return_value = {'body': {'credit': 999999.98}}
-        requests_mock.get.return_value = response_mock
+        cashback_api_client_mock.return_value.obter_credito.return_value = 999999.98
 
         # EXERCISE
         service = CompraService()
         result = service.obter_cashback_acumulado('23423434343')
 
         # ASSERTS
-        self.assertEqual({'cpf': '23423434343', 'saldo': 999999.98}, result)
+        cashback_api_client_mock.return_value.obter_credito.assert_called_once_with('23423434343')
+        self.assertEqual('23423434343', result['cpf'])
+        self.assertEqual(999999.98, result['saldo'])
+        self.assertIn('atualizado_em', result)
+        self.assertLess(result['idade_segundos'], 1)
+
+    @patch.object(src.domain.service, 'cashback_api_client')
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_obter_cashback_acumulado__saldo_em_cache__expected_nao_chamar_api(
+            self, mongo_mock, revendedor_mock, cashback_api_client_mock
+    ):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        cashback_api_client_mock.return_value.obter_credito.return_value = 10.5
+        service = CompraService()
+        service.obter_cashback_acumulado('23423434343')
+
+        # EXERCISE
+        result = service.obter_cashback_acumulado('23423434343')
+
+        # ASSERTS
+        cashback_api_client_mock.return_value.obter_credito.assert_called_once_with('23423434343')
+        self.assertEqual(10.5, result['saldo'])
+
+    @patch.object(src.domain.service, 'cashback_api_client')
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_obter_cashback_acumulado__api_indisponivel__expected_erro_503(
+            self, mongo_mock, revendedor_mock, cashback_api_client_mock
+    ):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        cashback_api_client_mock.return_value.obter_credito.side_effect = CircuitoAbertoError()
+
+        # EXERCISE
+        service = CompraService()
+
+        with self.assertRaises(ApiValidationError) as context:
+            service.obter_cashback_acumulado('23423434343')
+
+        # ASSERTS
+        self.assertEqual(503, context.exception.status_code)
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_obter_percentuais_cashback__varios_meses__expected_uma_consulta(self, mongo_mock, revendedor_mock):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        self.compra_mensal_collection_mock.find.return_value = [
+            {'ano_mes': '2020-01', 'total': 999.99},
+            {'ano_mes': '2020-03', 'total': 1501.00},
+        ]
+        cpf = '30672391643'
+
+        # EXERCISE
+        service = CompraService()
+        result = service.obter_percentuais_cashback(cpf, [(2020, 3), (2020, 1), (2020, 2), (2020, 1)])
+
+        # ASSERTS
+        self.assertEqual({(2020, 1): 10, (2020, 2): 10, (2020, 3): 20}, result)
+        self.compra_mensal_collection_mock.find.assert_called_once_with(
+            {'cpf_revendedor': cpf, 'ano_mes': {'$in': ['2020-01', '2020-02', '2020-03']}}
+        )
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_calcular_cashback__compras_meses_diferentes__expected_percentual_por_mes(
+            self, mongo_mock, revendedor_mock
+    ):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        self.compra_mensal_collection_mock.find.return_value = [
+            {'ano_mes': '2020-01', 'total': 1200.00},
+            {'ano_mes': '2020-02', 'total': 1501.00},
+        ]
+        cpf = '30672391643'
+        compras = [
+            Compra(codigo='1', cpf_revendedor=cpf, valor=100.0, data=datetime.datetime(2020, 1, 15)),
+            Compra(codigo='2', cpf_revendedor=cpf, valor=22.1, data=datetime.datetime(2020, 2, 15)),
+            Compra(codigo='3', cpf_revendedor=cpf, valor=10.0, data=datetime.datetime(2020, 1, 20)),
+        ]
+
+        # EXERCISE
+        service = CompraService()
+        result = service.calcular_cashback(compras)
+
+        # ASSERTS
+        self.compra_mensal_collection_mock.find.assert_called_once()
+        self.assertEqual(['1', '2', '3'], [compra.codigo for compra in result])
+        self.assertEqual([15, 20, 15], [compra.percentual_cashback for compra in result])
+        self.assertEqual([15.0, 4.42, 1.5], [compra.valor_cashback for compra in result])
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_listar_por_cursor__mais_compras_que_pagina__expected_next(self, mongo_mock, revendedor_mock):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        cpf = '67976752006'
+        compras = [
+            {'_id': ObjectId(), 'codigo': str(i), 'valor': 1.0, 'cpf_revendedor': cpf,
+             'data': datetime.datetime(2020, 1, 1, 0, i % 60), 'status': 'Aprovado'}
+            for i in range(TAMANHO_PAGINA + 1)
+        ]
+        self.compra_collection_mock.find.return_value.sort.return_value.limit.return_value = compras
+        self.compra_mensal_collection_mock.aggregate.return_value = iter([{'quantidade': 250}])
+
+        # EXERCISE
+        service = CompraService()
+        result = service.listar_por_cursor(cpf)
+
+        # ASSERTS
+        self.compra_collection_mock.find.assert_called_once_with({'cpf_revendedor': cpf})
+        self.compra_collection_mock.find.return_value.sort.assert_called_once_with([('data', 1), ('_id', 1)])
+        self.compra_collection_mock.find.return_value.sort.return_value.limit.assert_called_once_with(
+            TAMANHO_PAGINA + 1
+        )
+        self.compra_collection_mock.count_documents.assert_not_called()
+        self.assertEqual(250, result['total'])
+        self.assertEqual(TAMANHO_PAGINA, len(result['compras']))
+        ultima = compras[TAMANHO_PAGINA - 1]
+        self.assertEqual((ultima['data'], ultima['_id']), decodificar_cursor(result['next']))
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_listar_por_cursor__ultima_pagina_total_exato__expected_sem_next(self, mongo_mock, revendedor_mock):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        cpf = '67976752006'
+        data = datetime.datetime(2020, 1, 10)
+        _id = ObjectId()
+        self.compra_collection_mock.find.return_value.sort.return_value.limit.return_value = [
+            {'_id': ObjectId(), 'codigo': '1', 'valor': 1.0, 'cpf_revendedor': cpf, 'data': data}
+        ]
+        self.compra_collection_mock.count_documents.return_value = 101
+
+        # EXERCISE
+        service = CompraService()
+        result = service.listar_por_cursor(cpf, codificar_cursor(data, _id), total_exato=True)
+
+        # ASSERTS
+        self.compra_collection_mock.find.assert_called_once_with({
+            'cpf_revendedor': cpf,
+            '$or': [{'data': {'$gt': data}}, {'data': data, '_id': {'$gt': _id}}]
+        })
+        self.compra_collection_mock.count_documents.assert_called_once_with({'cpf_revendedor': cpf})
+        self.assertEqual(101, result['total'])
+        self.assertEqual(1, len(result['compras']))
+        self.assertIsNone(result['next'])
+
+    def test_decodificar_cursor__cursor_invalido__expected_exception(self):
+        with self.assertRaises(ApiValidationError):
+            decodificar_cursor('nao-e-um-cursor')
+
+    def test_codificar_cursor__data_em_string__expected_texto_original(self):
+        _id = ObjectId()
+
+        result = decodificar_cursor(codificar_cursor('2020-01-10T10:00:00', _id))
+
+        self.assertEqual(('2020-01-10T10:00:00', _id), result)
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_salvar_lote__compras_validas_e_invalidas__expected_resultado_por_compra(
+            self, mongo_mock, revendedor_mock
+    ):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        self.pre_aprovado_cache_mock.contem.return_value = False
+        self.compra_collection_mock.find.return_value = [{'codigo': '3'}]
+        cpf = '67976752006'
+        compras = [
+            {'codigo': '1', 'valor': 10, 'cpf_revendedor': cpf, 'data': '2020-01-10T00:00:00'},
+            {'codigo': '2', 'valor': 'abc', 'cpf_revendedor': cpf, 'data': '2020-01-10T00:00:00'},
+            {'codigo': '3', 'valor': 10, 'cpf_revendedor': cpf, 'data': '2020-01-10T00:00:00'},
+            {'codigo': '1', 'valor': 10, 'cpf_revendedor': cpf, 'data': '2020-01-10T00:00:00'},
+            {'codigo': '4', 'valor': 10, 'cpf_revendedor': '86342733775', 'data': '2020-01-10T00:00:00'},
+            {'codigo': '5', 'valor': 5.5, 'cpf_revendedor': cpf, 'data': '2020-02-01T00:00:00'},
+            {'codigo': '6', 'valor': 2, 'cpf_revendedor': cpf, 'data': '2020-01-20T00:00:00'},
+        ]
+
+        # EXERCISE
+        service = CompraService()
+        result = service.salvar_lote(cpf, compras)
+
+        # ASSERTS
+        self.revendedor_service_mock.obter.assert_called_once_with(cpf)
+        self.pre_aprovado_cache_mock.contem.assert_called_once_with(cpf)
+        self.compra_collection_mock.find.assert_called_once_with(
+            {'codigo': {'$in': ['1', '3', '5', '6']}}, {'codigo': 1}
+        )
+        self.assertEqual(
+            ['criada', 'erro', 'erro', 'erro', 'erro', 'criada', 'criada'],
+            [resultado['status'] for resultado in result]
+        )
+        self.assertEqual(list(range(7)), [resultado['indice'] for resultado in result])
+        self.assertEqual({'codigo': ['Compra já cadastrada.']}, result[2]['erros'])
+        self.assertEqual({'codigo': ['Compra duplicada no lote.']}, result[3]['erros'])
+        self.assertIn('valor', result[1]['erros'])
+        self.assertIn('cpf_revendedor', result[4]['erros'])
+        self.compra_collection_mock.insert_many.assert_called_once_with([
+            {'codigo': '1', 'valor': 10.0, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 1, 10),
+             'status': 'Em Validação'},
+            {'codigo': '5', 'valor': 5.5, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 2, 1),
+             'status': 'Em Validação'},
+            {'codigo': '6', 'valor': 2.0, 'cpf_revendedor': cpf, 'data': datetime.datetime(2020, 1, 20),
+             'status': 'Em Validação'},
+        ], ordered=False)
+        self.compra_mensal_collection_mock.bulk_write.assert_called_once_with([
+            UpdateOne({'cpf_revendedor': cpf, 'ano_mes': '2020-01'}, {'$inc': {'total': 12.0, 'quantidade': 2}},
+                      upsert=True),
+            UpdateOne({'cpf_revendedor': cpf, 'ano_mes': '2020-02'}, {'$inc': {'total': 5.5, 'quantidade': 1}},
+                      upsert=True),
+        ], ordered=False)
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_salvar_lote__codigo_duplicado_no_insert__expected_erro_somente_na_duplicada(
+            self, mongo_mock, revendedor_mock
+    ):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        self.compra_collection_mock.find.return_value = []
+        self.compra_collection_mock.insert_many.side_effect = BulkWriteError(
+            {'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'duplicate key'}]}
+        )
+        cpf = '67976752006'
+        compras = [
+            {'codigo': '1', 'valor': 10, 'cpf_revendedor': cpf, 'data': '2020-01-10T00:00:00'},
+            {'codigo': '2', 'valor': 20, 'cpf_revendedor': cpf, 'data': '2020-01-10T00:00:00'},
+        ]
+
+        # EXERCISE
+        service = CompraService()
+        result = service.salvar_lote(cpf, compras)
+
+        # ASSERTS
+        self.assertEqual(['erro', 'criada'], [resultado['status'] for resultado in result])
+        self.assertEqual({'codigo': ['Compra já cadastrada.']}, result[0]['erros'])
+        self.compra_mensal_collection_mock.bulk_write.assert_called_once_with([
+            UpdateOne({'cpf_revendedor': cpf, 'ano_mes': '2020-01'}, {'$inc': {'total': 20.0, 'quantidade': 1}},
+                      upsert=True),
+        ], ordered=False)
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_salvar_lote__revendedor_nao_cadastrado__expected_exception(self, mongo_mock, revendedor_mock):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        self.revendedor_service_mock.obter.return_value = None
+
+        # EXERCISE
+        service = CompraService()
+
+        with self.assertRaises(ApiValidationError):
+            service.salvar_lote('67976752006', [])
+
+        # ASSERTS
+        self.compra_collection_mock.insert_many.assert_not_called()
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_exportar__revendedor_nao_cadastrado__expected_erro_404(self, mongo_mock, revendedor_mock):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        self.revendedor_service_mock.obter.return_value = None
+
+        # EXERCISE
+        service = CompraService()
+
+        with self.assertRaises(ApiValidationError) as contexto:
+            service.exportar('67976752006')
+
+        # ASSERTS
+        self.assertEqual(404, contexto.exception.status_code)
+        self.compra_collection_mock.find.assert_not_called()
+
+    @patch.object(src.domain.service, 'RevendedorService')
+    @patch.object(src.domain.service, 'mongo')
+    def test_exportar__compras_varios_meses__expected_um_percentual_por_mes(self, mongo_mock, revendedor_mock):
+        # FIXTURES
+        self.mock_objects(mongo_mock, revendedor_mock)
+        cpf = '67976752006'
+        self.compra_collection_mock.find.return_value.sort.return_value.batch_size.return_value = iter([
+            {'_id': ObjectId(), 'codigo': '1', 'valor': 100.0, 'cpf_revendedor': cpf,
+             'data': datetime.datetime(2020, 1, 10)},
+            {'_id': ObjectId(), 'codigo': '2', 'valor': 10.0, 'cpf_revendedor': cpf,
+             'data': datetime.datetime(2020, 1, 20)},
+            {'_id': ObjectId(), 'codigo': '3', 'valor': 50.0, 'cpf_revendedor': cpf,
+             'data': datetime.datetime(2020, 2, 1)},
+        ])
+        self.compra_mensal_collection_mock.find_one.side_effect = [{'total': 1200.0}, {'total': 1600.0}]
+
+        # EXERCISE
+        service = CompraService()
+        result = list(service.exportar(cpf))
+
+        # ASSERTS
+        self.compra_collection_mock.find.assert_called_once_with({'cpf_revendedor': cpf})
+        self.compra_collection_mock.find.return_value.sort.assert_called_once_with([('data', 1), ('_id', 1)])
+        self.assertEqual(
+            [call({'cpf_revendedor': cpf, 'ano_mes': '2020-01'}), call({'cpf_revendedor': cpf, 'ano_mes': '2020-02'})],
+            self.compra_mensal_collection_mock.find_one.call_args_list
+        )
+        self.assertEqual(['1', '2', '3'], [compra.codigo for compra in result])
+        self.assertEqual([15, 15, 20], [compra.percentual_cashback for compra in result])
+        self.assertEqual([15.0, 1.5, 10.0], [compra.valor_cashback for compra in result])
@@ -0,0 +1,148 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import src
+import src.aquecimento
+import src.api.decoradores
+from src import create_app, repositorio
+from src.consulta_lenta import ConsultaLentaListener, consulta_lenta_listener, formato
+
+
+class _ExecutorSincrono:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def _evento(command_name: str, command: dict = None, request_id: int = 1, duration_micros: int = 0):
+    return SimpleNamespace(command_name=command_name, command=command, database_name='cashback',
+                           connection_id=('localhost', 27017), request_id=request_id, duration_micros=duration_micros)
+
+
+def _executar(listener, command: dict, duration_micros: int, request_id: int = 1):
+    command_name = next(iter(command))
+    listener.started(_evento(command_name, command, request_id))
+    listener.succeeded(_evento(command_name, request_id=request_id, duration_micros=duration_micros))
+
+
+class FormatoTest(unittest.TestCase):
+
+    def test_formato__expected_valores_redigidos_e_estrutura_mantida(self):
+        consulta = {
+            'filter': {'cpf_revendedor': '70249837285', 'codigo': {'$in': ['1', '2', '3']}},
+            'sort': {'data': -1, '_id': -1},
+            'pipeline': [{'$group': {'_id': '$cpf_revendedor', 'total': {'$sum': '$valor'}}}],
+        }
+
+        self.assertEqual({
+            'filter': {'cpf_revendedor': '?', 'codigo': {'$in': ['?']}},
+            'sort': {'data': -1, '_id': -1},
+            'pipeline': [{'$group': {'_id': '$cpf_revendedor', 'total': {'$sum': '$valor'}}}],
+        }, formato(consulta))
+
+
+class ConsultaLentaListenerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cliente = MagicMock()
+        self.cliente['cashback'].command.return_value = {'queryPlanner': {
+            'parsedQuery': {'cpf': {'$eq': '70249837285'}},
+            'winningPlan': {'stage': 'COLLSCAN', 'filter': {'cpf': {'$eq': '70249837285'}}, 'direction': 'forward'},
+            'rejectedPlans': [],
+        }}
+        self.listener = ConsultaLentaListener(limite_ms=100, tamanho=10, executor=_ExecutorSincrono())
+        self.listener.configurar(self.cliente)
+
+    def test_succeeded__abaixo_do_limite__expected_sem_registro(self):
+        _executar(self.listener, {'find': 'token', 'filter': {'cpf': '70249837285'}}, duration_micros=99000)
+
+        self.assertEqual([], self.listener.registros())
+
+    def test_succeeded__acima_do_limite__expected_registro_com_plano_redigido(self):
+        # FIXTURES
+        comando = {'find': 'token', 'filter': {'cpf': '70249837285'}, 'lsid': {'id': 1}, '$db': 'cashback'}
+
+        # EXERCISE
+        _executar(self.listener, comando, duration_micros=250000)
+
+        # ASSERTS
+        registro = self.listener.registros()[0]
+        self.assertEqual(('token', 'find', 250.0), (registro['colecao'], registro['comando'], registro['duracao_ms']))
+        self.assertEqual({'filter': {'cpf': '?'}}, registro['formato'])
+        self.assertEqual(['COLLSCAN'], registro['estagios'])
+        self.assertEqual({'cpf': {'$eq': '?'}}, registro['plano']['winningPlan']['filter'])
+        self.cliente['cashback'].command.assert_called_once_with(
+            {'explain': {'find': 'token', 'filter': {'cpf': '70249837285'}}, 'verbosity': 'queryPlanner'}
+        )
+
+    def test_succeeded__mesma_forma__expected_plano_reaproveitado(self):
+        _executar(self.listener, {'find': 'token', 'filter': {'cpf': '70249837285'}}, 250000, request_id=1)
+        _executar(self.listener, {'find': 'token', 'filter': {'cpf': '15350946056'}}, 250000, request_id=2)
+
+        self.assertEqual(2, len(self.listener.registros()))
+        self.assertEqual(['COLLSCAN'], self.listener.registros()[0]['estagios'])
+        self.cliente['cashback'].command.assert_called_once()
+
+    def test_succeeded__insert__expected_registro_sem_explain(self):
+        _executar(self.listener, {'insert': 'compra', 'documents': [{'codigo': '1'}]}, duration_micros=300000)
+
+        self.assertIsNone(self.listener.registros()[0]['plano'])
+        self.cliente['cashback'].command.assert_not_called()
+
+    def test_registros__colecao_e_limite__expected_mais_recentes_primeiro(self):
+        for request_id, colecao in enumerate(['compra', 'token', 'compra', 'compra']):
+            _executar(self.listener, {'count': colecao, 'query': {'i': request_id}}, 200000, request_id)
+
+        registros = self.listener.registros(colecao='compra', limite=2)
+
+        self.assertEqual(['compra', 'compra'], [registro['colecao'] for registro in registros])
+        self.assertEqual(2, len(registros))
+        self.assertEqual(3, len(self.listener.registros('compra')))
+
+    def test_registros__listener_incluindo_em_outra_thread__expected_sem_erro(self):
+        # FIXTURES
+        listener = ConsultaLentaListener(limite_ms=0, tamanho=5000)
+        for request_id in range(5000):
+            _executar(listener, {'insert': 'compra', 'documents': []}, 0, request_id)
+        parar = threading.Event()
+
+        def _incluir():
+            request_id = 0
+            while not parar.is_set():
+                request_id += 1
+                _executar(listener, {'insert': 'compra', 'documents': []}, 0, request_id)
+
+        thread = threading.Thread(target=_incluir)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(parar.set)
+
+        # EXERCISE / ASSERTS
+        for _ in range(200):
+            listener.registros(colecao='compra')
+
+
+@patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False)
+@patch.object(src.api.decoradores, 'ADMIN_TOKEN', 'admin')
+class ConsultasLentasRotaTest(unittest.TestCase):
+
+    def setUp(self):
+        consulta_lenta_listener.limpar()
+        self.addCleanup(consulta_lenta_listener.limpar)
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+
+    def test_listar_consultas_lentas__expected_registros_filtrados(self):
+        # FIXTURES
+        client = create_app('', backend=repositorio.BACKEND_MEMORIA).test_client()
+        _executar(consulta_lenta_listener, {'insert': 'compra', 'documents': []}, 10 ** 7, request_id=1)
+        _executar(consulta_lenta_listener, {'insert': 'token', 'documents': []}, 10 ** 7, request_id=2)
+
+        # EXERCISE
+        response = client.get('/api/v1/admin/consultas-lentas?colecao=compra', headers={'X-Admin-Token': 'admin'})
+        sem_token = client.get('/api/v1/admin/consultas-lentas')
+
+        # ASSERTS
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['compra'], [registro['colecao'] for registro in response.json])
+        self.assertEqual(403, sem_token.status_code)
@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from src.cpf import cpf_valido
+
+
+def _validate_cpf_original(value):
+    #  Implementação anterior de schema._validate_cpf, usada como referência
+    cpf = [int(char) for char in value if char.isdigit()]
+    if len(cpf) != 11:
+        return False
+    if cpf == cpf[::-1]:
+        return False
+    for i in range(9, 11):
+        value = sum((cpf[num] * ((i + 1) - num) for num in range(0, i)))
+        digit = ((value * 10) % 11) % 10
+        if digit != cpf[i]:
+            return False
+    return True
+
+
+class CpfTest(unittest.TestCase):
+    CPFS = [
+        '87535514600', '875.355.146-00', '67976752006', '86342733775', '15350946056',
+        '87535514601', '11111111111', '12345', '', 'abc', '1234567890123', '12345678909', '123.456.789-09',
+    ]
+
+    def setUp(self):
+        cpf_valido.cache_clear()
+        random.seed(42)
+        self.aleatorios = [''.join(random.choice('0123456789') for _ in range(11)) for _ in range(3000)]
+
+    def test_cpf_valido__cpfs_conhecidos__expected_mesmo_resultado_implementacao_anterior(self):
+        for cpf in self.CPFS + self.aleatorios:
+            self.assertEqual(_validate_cpf_original(cpf), cpf_valido(cpf), cpf)
+
+    def test_cpf_valido__cpf_repetido__expected_resultado_do_cache(self):
+        cpf_valido('87535514600')
+        cpf_valido('87535514600')
+
+        self.assertEqual(1, cpf_valido.cache_info().hits)
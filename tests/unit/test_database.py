@@ -0,0 +1,197 @@
+import datetime
+import unittest
+from unittest.mock import Mock, MagicMock, patch, call
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+import src.database
+from src.database import INDICES, ensure_indexes, relatorio_indices, migrar_data_compra, recalcular_compra_mensal
+
+
+class DatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collections = {colecao: Mock() for colecao in INDICES}
+        self.database_mock = Mock()
+        self.database_mock.get_collection.side_effect = lambda name: self.collections[name]
+
+    def test_ensure_indexes__todas_collections__expected_criar_indices(self):
+        # EXERCISE
+        ensure_indexes(self.database_mock)
+
+        # ASSERTS
+        for colecao, indices in INDICES.items():
+            if indices:
+                self.collections[colecao].create_indexes.assert_called_once_with(indices)
+            else:
+                self.collections[colecao].create_indexes.assert_not_called()
+
+    def test_ensure_indexes__indices_compra__expected_codigo_unico_e_cpf_data(self):
+        indices = {indice.document['name']: indice.document for indice in INDICES['compra']}
+
+        self.assertTrue(indices['codigo_1']['unique'])
+        self.assertEqual(
+            [('cpf_revendedor', 1), ('data', 1), ('_id', 1)],
+            list(indices['cpf_revendedor_1_data_1__id_1']['key'].items())
+        )
+
+    def _indices_existentes(self):
+        #  index_information no formato do pymongo: chave como lista de pares, versão e as opções do índice
+        for colecao, indices in INDICES.items():
+            self.collections[colecao].index_information.return_value = dict(
+                [('_id_', {'v': 2, 'key': [('_id', 1)]})] +
+                [(indice.document['name'], dict(indice.document, v=2, key=list(indice.document['key'].items())))
+                 for indice in indices]
+            )
+
+    def test_relatorio_indices__indices_faltando_e_extras__expected_relatorio(self):
+        # FIXTURES
+        self._indices_existentes()
+        self.collections['token'].index_information.return_value = {
+            '_id_': {'v': 2, 'key': [('_id', 1)]},
+            'created_at_1': {'v': 2, 'key': [('created_at', 1)], 'expireAfterSeconds': 3600*24},
+        }
+        self.collections['compra'].index_information.return_value = {
+            '_id_': {'v': 2, 'key': [('_id', 1)]},
+            'codigo_1': {'v': 2, 'key': [('codigo', 1)], 'unique': True},
+            'cpf_revendedor_1_data_1__id_1': {'v': 2, 'key': [('cpf_revendedor', 1), ('data', 1), ('_id', 1)]},
+            'status_1': {'v': 2, 'key': [('status', 1)]},
+        }
+
+        # EXERCISE
+        result = relatorio_indices(self.database_mock)
+
+        # ASSERTS
+        self.assertEqual({'faltando': ['cpf_1', 'token_1'], 'divergentes': [], 'extras': []}, result['token'])
+        self.assertEqual({'faltando': [], 'divergentes': [], 'extras': ['status_1']}, result['compra'])
+        self.assertEqual({'faltando': [], 'divergentes': [], 'extras': []}, result['revendedor'])
+
+    def test_relatorio_indices__opcoes_diferentes__expected_divergentes(self):
+        # FIXTURES
+        self._indices_existentes()
+        self.collections['revendedor'].index_information.return_value = {
+            '_id_': {'v': 2, 'key': [('_id', 1)]},
+            'cpf_1': {'v': 2, 'key': [('cpf', 1)]},
+        }
+        self.collections['token-revogado'].index_information.return_value = {
+            '_id_': {'v': 2, 'key': [('_id', 1)]},
+            'jti_1': {'v': 2, 'key': [('jti', 1)], 'unique': True,
+                      'partialFilterExpression': {'jti': {'$exists': True}}},
+            'expira_em_1': {'v': 2, 'key': [('expira_em', 1)], 'expireAfterSeconds': 60},
+        }
+        self.collections['compra'].index_information.return_value = {
+            '_id_': {'v': 2, 'key': [('_id', 1)]},
+            'codigo_1': {'v': 2, 'key': [('codigo', -1)], 'unique': True},
+            'cpf_revendedor_1_data_1__id_1': {'v': 2, 'key': [('cpf_revendedor', 1), ('data', 1), ('_id', 1)]},
+        }
+
+        # EXERCISE
+        result = relatorio_indices(self.database_mock)
+
+        # ASSERTS
+        self.assertEqual({'faltando': [], 'divergentes': ['cpf_1'], 'extras': []}, result['revendedor'])
+        self.assertEqual(
+            {'faltando': [], 'divergentes': ['expira_em_1', 'jti_1'], 'extras': []}, result['token-revogado']
+        )
+        self.assertEqual({'faltando': [], 'divergentes': ['codigo_1'], 'extras': []}, result['compra'])
+        self.assertEqual({'faltando': [], 'divergentes': [], 'extras': []}, result['token'])
+
+    @patch.object(src.database, 'time')
+    @patch.object(src.database, '_obter_database')
+    def test_migrar_data_compra__datas_em_string__expected_converter_em_lotes(self, obter_database_mock, time_mock):
+        # FIXTURES
+        compra_collection_mock = Mock()
+        database_mock = MagicMock()
+        database_mock.__getitem__.side_effect = {'compra': compra_collection_mock}.__getitem__
+        obter_database_mock.return_value = database_mock
+        lote_1 = [
+            {'_id': ObjectId(), 'data': '2020-01-10T00:00:00'},
+            {'_id': ObjectId(), 'data': '2020-01-10T21:30:00-03:00'},
+        ]
+        lote_2 = [{'_id': ObjectId(), 'data': 'data invalida'}]
+        compra_collection_mock.find.return_value.sort.return_value.limit.side_effect = [lote_1, lote_2, []]
+        compra_collection_mock.bulk_write.return_value.modified_count = 2
+
+        # EXERCISE
+        migrar_data_compra(tamanho_lote=2)
+
+        # ASSERTS
+        self.assertEqual(
+            [
+                call({'data': {'$type': 'string'}}, {'data': 1}),
+                call({'data': {'$type': 'string'}, '_id': {'$gt': lote_1[-1]['_id']}}, {'data': 1}),
+                call({'data': {'$type': 'string'}, '_id': {'$gt': lote_2[-1]['_id']}}, {'data': 1}),
+            ],
+            compra_collection_mock.find.call_args_list
+        )
+        compra_collection_mock.bulk_write.assert_called_once_with(
+            [
+                UpdateOne(
+                    {'_id': lote_1[0]['_id'], 'data': '2020-01-10T00:00:00'},
+                    {'$set': {'data': datetime.datetime(2020, 1, 10)}}
+                ),
+                UpdateOne(
+                    {'_id': lote_1[1]['_id'], 'data': '2020-01-10T21:30:00-03:00'},
+                    {'$set': {'data': datetime.datetime(2020, 1, 11, 0, 30)}}
+                ),
+            ],
+            ordered=False
+        )
+        database_mock.get_collection('controle').update_one.assert_called_once_with(
+            {'_id': 'compra'}, {'$inc': {'versao': 1}}, upsert=True
+        )
+
+    @patch.object(src.database, '_obter_database')
+    def test_recalcular_compra_mensal__por_revendedor__expected_set_com_upsert_sem_trocar_collection(
+            self, obter_database_mock):
+        # FIXTURES
+        compra_collection_mock = Mock()
+        compra_mensal_collection_mock = Mock()
+        database_mock = MagicMock()
+        database_mock.__getitem__.side_effect = {
+            'compra': compra_collection_mock, 'compra-mensal': compra_mensal_collection_mock
+        }.__getitem__
+        obter_database_mock.return_value = database_mock
+        compra_collection_mock.aggregate.side_effect = [
+            iter([{'_id': '111'}, {'_id': '222'}]),
+            iter([{'_id': '2021-01', 'total': 15.0, 'quantidade': 2}, {'_id': '2021-02', 'total': 1.0, 'quantidade': 1}]),
+            iter([]),
+        ]
+
+        # EXERCISE
+        recalcular_compra_mensal()
+
+        # ASSERTS
+        self.assertEqual(
+            {'$match': {'cpf_revendedor': '111'}}, compra_collection_mock.aggregate.call_args_list[1].args[0][0]
+        )
+        compra_mensal_collection_mock.bulk_write.assert_called_once_with(
+            [
+                UpdateOne({'cpf_revendedor': '111', 'ano_mes': '2021-01'},
+                          {'$set': {'total': 15.0, 'quantidade': 2}}, upsert=True),
+                UpdateOne({'cpf_revendedor': '111', 'ano_mes': '2021-02'},
+                          {'$set': {'total': 1.0, 'quantidade': 1}}, upsert=True),
+            ],
+            ordered=False
+        )
+        compra_mensal_collection_mock.rename.assert_not_called()
+        database_mock.get_collection('controle').update_one.assert_called_once_with(
+            {'_id': 'compra'}, {'$inc': {'versao': 1}}, upsert=True
+        )
+
+
+class OpcoesClienteTest(unittest.TestCase):
+
+    def test_opcoes_cliente__padrao__expected_pool_e_timeout_sem_opcionais(self):
+        self.assertEqual(
+            {'maxPoolSize': 100, 'minPoolSize': 0, 'serverSelectionTimeoutMS': 30000}, src.database.opcoes_cliente()
+        )
+
+    @patch.object(src.database, 'MONGO_WAIT_QUEUE_TIMEOUT_MS', 500)
+    @patch.object(src.database, 'MONGO_COMPRESSORES', 'zstd,zlib')
+    def test_opcoes_cliente__espera_e_compressao__expected_opcoes(self):
+        opcoes = src.database.opcoes_cliente()
+
+        self.assertEqual(500, opcoes['waitQueueTimeoutMS'])
+        self.assertEqual('zstd,zlib', opcoes['compressors'])
@@ -0,0 +1,127 @@
+import gzip
+import unittest
+from unittest.mock import patch
+
+import src
+import src.aquecimento
+import src.api.compressao
+import src.api.decoradores
+import src.domain.senha
+import src.domain.service
+from src import create_app, repositorio
+from src.cache import TTLCache
+from src.domain.service import CompraService
+
+CPF = '70249837285'
+URL_COMPRAS = f'/api/v1/revendedor/{CPF}/compras'
+
+
+def _compras(quantidade: int, inicio: int = 0) -> [dict]:
+    return [{'codigo': str(i), 'valor': 100, 'cpf_revendedor': CPF, 'data': '2021-01-02T00:00:00'}
+            for i in range(inicio, inicio + quantidade)]
+
+
+@patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False)
+@patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0)
+@patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', 1000)
+class EtagTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(src.domain.service, 'revendedor_cache', TTLCache(60, 10))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+        self.client = create_app('', backend=repositorio.BACKEND_MEMORIA).test_client()
+        self.client.post('/api/v1/revendedor/', json={
+            'nome': 'Teste nome complente', 'cpf': CPF, 'senha': 'Senhaboita', 'email': 'email@asd.com'
+        })
+        self.client.post(URL_COMPRAS, json=_compras(2))
+
+    def test_listar__if_none_match_igual__expected_304_sem_consultar_compras(self):
+        # FIXTURES
+        etag = self.client.get(URL_COMPRAS).headers['ETag']
+
+        # EXERCISE
+        with patch.object(CompraService, 'listar_paginado', side_effect=AssertionError):
+            response = self.client.get(URL_COMPRAS, headers={'If-None-Match': etag})
+
+        # ASSERTS
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response.headers['ETag'])
+        self.assertEqual(b'', response.data)
+
+    def test_listar__compra_gravada__expected_nova_etag(self):
+        etag = self.client.get(URL_COMPRAS).headers['ETag']
+        self.client.post(f'/api/v1/revendedor/{CPF}/compra', json=_compras(1, inicio=10)[0])
+
+        response = self.client.get(URL_COMPRAS, headers={'If-None-Match': etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers['ETag'])
+        self.assertEqual(3, response.json['total'])
+
+    def test_listar__leitura_secundaria__expected_sem_etag(self):
+        etag = self.client.get(URL_COMPRAS).headers['ETag']
+
+        with patch.object(src.api.decoradores, 'MONGO_LEITURA_SECUNDARIA', True):
+            response = self.client.get(URL_COMPRAS, headers={'If-None-Match': etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('ETag', response.headers)
+
+    def test_listar__parametros_diferentes__expected_etags_diferentes(self):
+        etags = {self.client.get(f'{URL_COMPRAS}{query}').headers['ETag'] for query in ('', '?offset=1', '?cursor=')}
+
+        self.assertEqual(3, len(etags))
+
+    def test_exportar__if_none_match_igual__expected_304(self):
+        url = f'{URL_COMPRAS}/exportar?formato=csv'
+        etag = self.client.get(url).headers['ETag']
+
+        self.assertEqual(304, self.client.get(url, headers={'If-None-Match': etag}).status_code)
+
+    def test_obter_saldo_cashback__mesmo_saldo__expected_304(self):
+        # FIXTURES
+        saldo = {'cpf': CPF, 'saldo': 10.5, 'atualizado_em': '2021-01-01T00:00:00+00:00', 'idade_segundos': 1}
+        url = f'/api/v1/revendedor/{CPF}/cashback'
+
+        with patch.object(CompraService, 'obter_cashback_acumulado', return_value=saldo):
+            etag = self.client.get(url).headers['ETag']
+            # EXERCISE
+            response = self.client.get(url, headers={'If-None-Match': etag})
+
+        # ASSERTS
+        self.assertEqual(304, response.status_code)
+
+    @patch.object(src.api.compressao, 'brotli', None)
+    def test_listar__aceita_gzip__expected_resposta_comprimida_e_etag_da_codificacao(self):
+        # FIXTURES
+        self.client.post(URL_COMPRAS, json=_compras(20, inicio=100))
+
+        # EXERCISE
+        response = self.client.get(URL_COMPRAS, headers={'Accept-Encoding': 'gzip, deflate'})
+        repetida = self.client.get(
+            URL_COMPRAS, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']}
+        )
+
+        # ASSERTS
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertTrue(response.headers['ETag'].endswith('-gzip"'))
+        self.assertEqual(self.client.get(URL_COMPRAS).data, gzip.decompress(response.data))
+        self.assertEqual(304, repetida.status_code)
+
+    @unittest.skipUnless(src.api.compressao.brotli, 'brotli não instalado')
+    def test_listar__aceita_br_e_gzip__expected_brotli(self):
+        self.client.post(URL_COMPRAS, json=_compras(20, inicio=100))
+
+        response = self.client.get(URL_COMPRAS, headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual('br', response.headers['Content-Encoding'])
+        self.assertEqual(self.client.get(URL_COMPRAS).data, src.api.compressao.brotli.decompress(response.data))
+
+    def test_listar__resposta_pequena__expected_sem_compressao(self):
+        response = self.client.get(f'{URL_COMPRAS}?offset=1', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
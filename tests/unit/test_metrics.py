@@ -0,0 +1,165 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from flask import Flask
+
+import src
+import src.api.decoradores
+import src.aquecimento
+from src import create_app, metrics, repositorio
+from src.metrics import Contador, Histograma, mongo_listener
+
+
+def _evento(command_name: str, command: dict, request_id: int = 1, duration_micros: int = 2000):
+    return SimpleNamespace(command_name=command_name, command=command, connection_id=('localhost', 27017),
+                           request_id=request_id, duration_micros=duration_micros)
+
+
+class HistogramaTest(unittest.TestCase):
+
+    def test_exportar__expected_buckets_acumulados_soma_e_total(self):
+        # FIXTURES
+        histograma = Histograma('teste_segundos', 'Teste', ('rota',), limites=(0.1, 1.0))
+        histograma.observar(0.05, '/a')
+        histograma.observar(0.5, '/a')
+        histograma.observar(3, '/a')
+
+        # EXERCISE
+        linhas = histograma.exportar()
+
+        # ASSERTS
+        self.assertEqual([
+            '# HELP teste_segundos Teste',
+            '# TYPE teste_segundos histogram',
+            'teste_segundos_bucket{rota="/a",le="0.1"} 1',
+            'teste_segundos_bucket{rota="/a",le="1.0"} 2',
+            'teste_segundos_bucket{rota="/a",le="+Inf"} 3',
+            'teste_segundos_sum{rota="/a"} 3.55',
+            'teste_segundos_count{rota="/a"} 3',
+        ], linhas)
+
+    def test_contador__rotulo_com_aspas__expected_escapado(self):
+        contador = Contador('teste_total', 'Teste', ('colecao',))
+        contador.incrementar('a"b', quantidade=2)
+
+        self.assertEqual('teste_total{colecao="a\\"b"} 2', contador.exportar()[-1])
+
+
+class ComandoMongoListenerTest(unittest.TestCase):
+
+    def setUp(self):
+        metrics.limpar()
+
+    def test_succeeded__expected_duracao_por_colecao(self):
+        mongo_listener.started(_evento('find', {'find': 'compra', 'filter': {}}))
+        mongo_listener.succeeded(_evento('find', {}))
+        mongo_listener.started(_evento('getMore', {'getMore': 123, 'collection': 'compra'}, request_id=2))
+        mongo_listener.failed(_evento('getMore', {}, request_id=2))
+
+        self.assertEqual(1, metrics.mongo_comando_segundos.quantidade('compra', 'find'))
+        self.assertEqual(0.002, metrics.mongo_comando_segundos.soma('compra', 'find'))
+        self.assertEqual(1, metrics.mongo_falhas.valor('compra', 'getMore'))
+
+    def test_started__fora_de_requisicao__expected_sem_metricas_por_rota(self):
+        mongo_listener.started(_evento('ping', {'ping': 1}))
+
+        self.assertEqual([], metrics.mongo_comandos_por_rota.exportar()[2:])
+
+
+@patch.object(src.api.decoradores, 'ADMIN_TOKEN', 'admin')
+class MetricasFlaskTest(unittest.TestCase):
+
+    def setUp(self):
+        metrics.limpar()
+        self.app = Flask(__name__)
+        metrics.init_app(self.app)
+
+        @self.app.route('/revendedor/<string:cpf>/compras')
+        def listar(cpf):
+            for request_id in range(3):
+                mongo_listener.started(_evento('aggregate', {'aggregate': 'compra-mensal'}, request_id))
+                mongo_listener.succeeded(_evento('aggregate', {}, request_id))
+            return 'ok'
+
+        @self.app.route('/erro')
+        def erro():
+            raise RuntimeError()
+
+    def test_requisicao__expected_latencia_e_comandos_pela_rota_registrada(self):
+        # EXERCISE
+        self.app.test_client().get('/revendedor/70249837285/compras')
+        self.app.test_client().get('/revendedor/15350946056/compras')
+
+        # ASSERTS
+        rota = '/revendedor/<string:cpf>/compras'
+        self.assertEqual(2, metrics.requisicao_segundos.quantidade(rota, 'GET', '200'))
+        self.assertEqual(2, metrics.mongo_idas_por_requisicao.quantidade(rota))
+        self.assertEqual(6, metrics.mongo_idas_por_requisicao.soma(rota))
+        self.assertEqual(6, metrics.mongo_comandos_por_rota.valor(rota, 'compra-mensal', 'aggregate'))
+
+    def test_requisicao__excecao_nao_tratada__expected_status_500(self):
+        self.app.test_client().get('/erro')
+
+        self.assertEqual(1, metrics.requisicao_segundos.quantidade('/erro', 'GET', '500'))
+
+    def test_metrics__expected_formato_prometheus(self):
+        # FIXTURES
+        client = self.app.test_client()
+        client.get('/revendedor/70249837285/compras')
+
+        # EXERCISE
+        response = client.get('/metrics', headers={'X-Admin-Token': 'admin'})
+
+        # ASSERTS
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(metrics.CONTENT_TYPE, response.content_type)
+        self.assertIn(
+            'cashback_mongo_comandos_total{rota="/revendedor/<string:cpf>/compras",colecao="compra-mensal",'
+            'comando="aggregate"} 3', response.get_data(as_text=True)
+        )
+
+    def test_metrics__bearer_admin_token__expected_200(self):
+        response = self.app.test_client().get('/metrics', headers={'Authorization': 'Bearer admin'})
+
+        self.assertEqual(200, response.status_code)
+
+    def test_metrics__sem_token_ou_token_invalido__expected_403(self):
+        client = self.app.test_client()
+
+        self.assertEqual(403, client.get('/metrics').status_code)
+        self.assertEqual(403, client.get('/metrics', headers={'X-Admin-Token': 'outro'}).status_code)
+        self.assertEqual(403, client.get('/metrics', headers={'X-Admin-Token': 'é'}).status_code)
+
+    @patch.object(src.api.decoradores, 'ADMIN_TOKEN', '')
+    def test_metrics__admin_token_nao_configurado__expected_403(self):
+        response = self.app.test_client().get('/metrics', headers={'X-Admin-Token': ''})
+
+        self.assertEqual(403, response.status_code)
+
+
+@patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False)
+class CreateAppMetricasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+
+    @patch.object(src, 'METRICAS_HABILITADAS', False)
+    def test_create_app__metricas_desabilitadas__expected_sem_rota(self):
+        client = create_app('', backend=repositorio.BACKEND_MEMORIA).test_client()
+
+        self.assertEqual(404, client.get('/metrics').status_code)
+
+    def test_create_app__padrao__expected_sem_rota(self):
+        client = create_app('', backend=repositorio.BACKEND_MEMORIA).test_client()
+
+        self.assertEqual(404, client.get('/metrics').status_code)
+
+    @patch.object(src, 'METRICAS_HABILITADAS', True)
+    @patch.object(src.api.decoradores, 'ADMIN_TOKEN', 'admin')
+    @patch.object(src.mongo, 'init_app')
+    def test_create_app__mongo__expected_listener_registrado(self, init_app_mock):
+        client = create_app('mongodb://localhost:1/cashback').test_client()
+
+        self.assertIn(mongo_listener, init_app_mock.call_args.kwargs['event_listeners'])
+        self.assertEqual(200, client.get('/metrics', headers={'X-Admin-Token': 'admin'}).status_code)
@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import patch, Mock
+
+import src.api.decoradores
+import src.aquecimento
+import src.domain.conjunto_cache
+from src import create_app, repositorio
+from src.domain.pre_aprovado import RevendedorPreAprovadoCache
+
+
+@patch.object(src.domain.conjunto_cache, 'mongo')
+class RevendedorPreAprovadoCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.agora = 0
+        self.cache = RevendedorPreAprovadoCache(intervalo_atualizacao=60, relogio=lambda: self.agora)
+        self.pre_aprovado_collection_mock = Mock()
+        self.controle_collection_mock = Mock()
+        self.pre_aprovado_collection_mock.find.return_value = [{'cpf': '15350946056'}]
+        self.controle_collection_mock.find_one.return_value = {'_id': 'revendedor-pre-aprovado', 'versao': 1}
+
+    def mock_collections(self, mongo_mock):
+        collections = {
+            'revendedor-pre-aprovado': self.pre_aprovado_collection_mock,
+            'controle': self.controle_collection_mock
+        }
+        mongo_mock.db.get_collection.side_effect = lambda name: collections[name]
+
+    def test_contem__primeiro_acesso__expected_carregar(self, mongo_mock):
+        self.mock_collections(mongo_mock)
+
+        self.assertTrue(self.cache.contem('15350946056'))
+        self.assertFalse(self.cache.contem('67976752006'))
+
+        self.pre_aprovado_collection_mock.find.assert_called_once_with({}, {'_id': 0, 'cpf': 1})
+        self.assertEqual(1, self.cache.versao)
+
+    def test_contem__dentro_do_intervalo__expected_sem_consulta(self, mongo_mock):
+        self.mock_collections(mongo_mock)
+        self.cache.carregar()
+        self.agora = 59
+
+        with patch.object(self.cache, '_atualizar_em_background') as atualizar_mock:
+            self.cache.contem('15350946056')
+
+        atualizar_mock.assert_not_called()
+        self.pre_aprovado_collection_mock.find.assert_called_once()
+
+    def test_contem__intervalo_expirado__expected_atualizar_em_background(self, mongo_mock):
+        self.mock_collections(mongo_mock)
+        self.cache.carregar()
+        self.agora = 60
+
+        with patch.object(self.cache, '_atualizar_em_background') as atualizar_mock:
+            self.assertTrue(self.cache.contem('15350946056'))
+
+        atualizar_mock.assert_called_once()
+
+    def test_atualizar__mesma_versao__expected_nao_recarregar(self, mongo_mock):
+        self.mock_collections(mongo_mock)
+        self.cache.carregar()
+
+        self.cache.atualizar()
+
+        self.pre_aprovado_collection_mock.find.assert_called_once()
+
+    def test_atualizar__versao_alterada__expected_recarregar(self, mongo_mock):
+        self.mock_collections(mongo_mock)
+        self.cache.carregar()
+        self.controle_collection_mock.find_one.return_value = {'_id': 'revendedor-pre-aprovado', 'versao': 2}
+        self.pre_aprovado_collection_mock.find.return_value = [{'cpf': '67976752006'}]
+
+        self.cache.atualizar()
+
+        self.assertEqual(2, self.cache.versao)
+        self.assertTrue(self.cache.contem('67976752006'))
+        self.assertFalse(self.cache.contem('15350946056'))
+
+
+@patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False)
+@patch.object(src.api.decoradores, 'ADMIN_TOKEN', 'admin')
+class AdminTokenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+        self.client = create_app('', backend=repositorio.BACKEND_MEMORIA).test_client()
+
+    def test_admin__token_valido__expected_200(self):
+        response = self.client.get('/api/v1/admin/caches', headers={'X-Admin-Token': 'admin'})
+
+        self.assertEqual(200, response.status_code)
+
+    def test_admin__token_invalido_ou_nao_ascii__expected_403(self):
+        for token in ('outro', 'é', 'admin\u00e9'):
+            with self.subTest(token=token):
+                # EXERCISE
+                response = self.client.get('/api/v1/admin/caches', headers={'X-Admin-Token': token})
+
+                # ASSERTS
+                self.assertEqual(403, response.status_code)
+
+    @patch.object(src.api.decoradores, 'ADMIN_TOKEN', '')
+    def test_admin__sem_token_configurado__expected_403(self):
+        response = self.client.get('/api/v1/admin/caches', headers={'X-Admin-Token': ''})
+
+        self.assertEqual(403, response.status_code)
@@ -0,0 +1,123 @@
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from flask import Blueprint, Flask
+
+import src
+import src.aquecimento
+import src.api.decoradores
+import src.api.profiling
+from src import create_app, repositorio
+from src.api.profiling import HEADER_ARQUIVO, HEADER_PROFILING, PerfilCProfile
+
+
+def _consultar_compras():
+    time.sleep(0.05)
+    return 'ok'
+
+
+@patch.object(src.api.decoradores, 'ADMIN_TOKEN', 'admin')
+@patch.object(src.api.profiling, 'PROFILING_AMOSTRAGEM', 0)
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = os.path.join(diretorio.name, 'perfis')
+        patcher = patch.object(src.api.profiling, 'PROFILING_DIRETORIO', self.diretorio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        blueprint = Blueprint('teste', __name__)
+        blueprint.add_url_rule('/compras', 'listar', _consultar_compras)
+        src.api.profiling.registrar(blueprint)
+        app = Flask(__name__)
+        app.register_blueprint(blueprint)
+        self.client = app.test_client()
+
+    def test_requisicao__header_com_token__expected_pstats_gravado(self):
+        # EXERCISE
+        response = self.client.get('/compras', headers={HEADER_PROFILING: 'admin'})
+
+        # ASSERTS
+        nome = response.headers[HEADER_ARQUIVO]
+        self.assertTrue(nome.endswith('-teste.listar-' + nome.split('-')[-1]))
+        funcoes = {funcao[2] for funcao in pstats.Stats(os.path.join(self.diretorio, nome)).stats}
+        self.assertIn('_consultar_compras', funcoes)
+
+    @patch.object(src.api.profiling, 'PROFILING_FORMATO', 'collapsed')
+    @patch.object(src.api.profiling, 'PROFILING_INTERVALO_PILHAS', 0.001)
+    def test_requisicao__formato_collapsed__expected_pilhas_com_a_view(self):
+        # EXERCISE
+        response = self.client.get('/compras', headers={HEADER_PROFILING: 'admin'})
+
+        # ASSERTS
+        with open(os.path.join(self.diretorio, response.headers[HEADER_ARQUIVO])) as arquivo:
+            linhas = arquivo.read().splitlines()
+        self.assertTrue(linhas)
+        self.assertTrue(any('_consultar_compras (' in linha for linha in linhas))
+        self.assertTrue(all(linha.rsplit(' ', 1)[1].isdigit() for linha in linhas))
+
+    def test_requisicao__token_invalido_ou_sem_header__expected_sem_perfil(self):
+        response_invalido = self.client.get('/compras', headers={HEADER_PROFILING: 'outro'})
+        response_sem_header = self.client.get('/compras')
+
+        self.assertNotIn(HEADER_ARQUIVO, response_invalido.headers)
+        self.assertNotIn(HEADER_ARQUIVO, response_sem_header.headers)
+        self.assertFalse(os.path.exists(self.diretorio))
+
+    def test_requisicao__header_nao_ascii__expected_sem_perfil(self):
+        response = self.client.get('/compras', headers={HEADER_PROFILING: 'é'})
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(HEADER_ARQUIVO, response.headers)
+
+    def test_requisicao__amostragem__expected_perfil_sem_header(self):
+        with patch.object(src.api.profiling, 'PROFILING_AMOSTRAGEM', 1):
+            response = self.client.get('/compras')
+
+        self.assertEqual(1, len(os.listdir(self.diretorio)))
+        self.assertIn(HEADER_ARQUIVO, response.headers)
+
+    def test_requisicao__pstats_com_perfil_em_andamento__expected_sem_perfil(self):
+        # FIXTURES
+        em_andamento = PerfilCProfile()
+        self.assertTrue(em_andamento.iniciar())
+        self.addCleanup(em_andamento.parar)
+
+        # EXERCISE
+        response = self.client.get('/compras', headers={HEADER_PROFILING: 'admin'})
+
+        # ASSERTS
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(HEADER_ARQUIVO, response.headers)
+        self.assertFalse(os.path.exists(self.diretorio))
+
+    def test_requisicao__pstats_em_sequencia__expected_perfil_liberado_a_cada_requisicao(self):
+        for _ in range(2):
+            response = self.client.get('/compras', headers={HEADER_PROFILING: 'admin'})
+
+            self.assertIn(HEADER_ARQUIVO, response.headers)
+        self.assertEqual(2, len(os.listdir(self.diretorio)))
+
+    @patch.object(src.api.profiling, 'PROFILING_FORMATO', 'svg')
+    def test_registrar__formato_invalido__expected_erro(self):
+        with self.assertRaises(ValueError):
+            src.api.profiling.registrar(Blueprint('invalido', __name__))
+
+
+@patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False)
+class ProfilingDesabilitadoTest(unittest.TestCase):
+
+    def test_api_bp__desabilitado__expected_sem_hooks(self):
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+        app = create_app('', backend=repositorio.BACKEND_MEMORIA)
+
+        hooks = [*app.before_request_funcs.get('api', []), *app.after_request_funcs.get('api', [])]
+
+        self.assertNotIn(src.api.profiling._iniciar, hooks)
+        self.assertNotIn(src.api.profiling._after_request, hooks)
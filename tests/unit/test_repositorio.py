@@ -0,0 +1,254 @@
+import base64
+from abc import ABC, abstractmethod
+import unittest
+from datetime import datetime
+from unittest.mock import patch, Mock, MagicMock
+
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_preferences import SecondaryPreferred
+
+import src
+import src.aquecimento
+import src.domain.senha
+import src.repositorio.mongo
+from src import create_app, repositorio
+from src.repositorio import CompraRepositorio, Repositorios
+from src.database import ensure_indexes
+from src.domain.service import revendedor_cache, codificar_cursor, decodificar_cursor
+from src.repositorio.memoria import RepositoriosMemoria
+from src.repositorio.mongo import RepositoriosMongo
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+CPF = '70249837285'
+
+
+def _compra(codigo: str, dia: int, cpf: str = CPF) -> dict:
+    return {'codigo': codigo, 'valor': 10.0, 'cpf_revendedor': cpf, 'data': datetime(2021, 1, dia), 'status': 'x'}
+
+
+class _RepositoriosContrato(ABC):
+    #  Os mesmos cenários para cada backend
+
+    @abstractmethod
+    def criar_repositorios(self) -> Repositorios:
+        ...
+
+    def setUp(self):
+        self.repositorios = self.criar_repositorios()
+
+    def test_revendedor__inserir_obter_e_atualizar_senha(self):
+        revendedores = self.repositorios.revendedor()
+        revendedores.inserir({'cpf': CPF, 'nome': 'Nome', 'senha': 'a'})
+
+        revendedores.atualizar_senha(CPF, 'outra', 'b')
+        self.assertEqual('a', revendedores.obter(CPF)['senha'])
+        revendedores.atualizar_senha(CPF, 'a', 'b')
+        self.assertEqual('b', revendedores.obter(CPF)['senha'])
+        self.assertIsNone(revendedores.obter('00000000000'))
+        with self.assertRaises(DuplicateKeyError):
+            revendedores.inserir({'cpf': CPF, 'nome': 'Outro', 'senha': 'c'})
+
+    def test_token__inserir_obter_remover_e_revogar(self):
+        tokens = self.repositorios.token()
+        tokens.inserir({'cpf': CPF, 'token': 'abc', 'created_at': datetime.utcnow()})
+
+        self.assertEqual(CPF, tokens.obter('abc')['cpf'])
+        self.assertEqual('abc', tokens.obter_por_cpf(CPF)['token'])
+        tokens.remover('abc')
+        self.assertIsNone(tokens.obter('abc'))
+        self.assertIsNone(tokens.obter_por_cpf(CPF))
+
+        revogados = self.repositorios.conjunto('token-revogado', 'jti')
+        tokens.revogar('jti-1', datetime(2030, 1, 1))
+        self.assertEqual(frozenset({'jti-1'}), revogados.valores())
+        self.assertEqual(1, revogados.versao())
+
+    def test_compra__inserir_varios_com_duplicada__expected_falha_por_indice(self):
+        compras = self.repositorios.compra()
+        compras.inserir(_compra('1', 1))
+
+        falhas = compras.inserir_varios([_compra('2', 2), _compra('1', 3), _compra('3', 3)])
+
+        self.assertEqual([1], list(falhas))
+        self.assertEqual(11000, falhas[1]['code'])
+        self.assertEqual({'1', '2', '3'}, compras.codigos_cadastrados(['1', '2', '3', '4']))
+        self.assertEqual(3, compras.contar(CPF))
+        self.assertEqual(datetime(2021, 1, 2), compras.obter('2')['data'])
+
+    def test_compra__listar_apos__expected_ordem_de_data_e_id(self):
+        compras = self.repositorios.compra()
+        compras.inserir_varios([_compra(str(i), i % 3 + 1) for i in range(7)] + [_compra('x', 1, cpf='1')])
+
+        paginas = []
+        posicao = None
+        while True:
+            pagina = compras.listar_apos(CPF, posicao, 3)
+            paginas.append([compra['codigo'] for compra in pagina])
+            if len(pagina) < 3:
+                break
+            posicao = (pagina[-1]['data'], pagina[-1]['_id'])
+
+        self.assertEqual([['0', '3', '6'], ['1', '4', '2'], ['5']], paginas)
+        self.assertEqual(
+            ['0', '3', '6', '1', '4', '2', '5'], [compra['codigo'] for compra in compras.percorrer(CPF, 2)]
+        )
+        self.assertEqual(2, len(compras.listar(CPF, 5, 10)))
+
+    def test_compra_mensal__incrementos_e_somas(self):
+        mensal = self.repositorios.compra_mensal()
+        mensal.incrementar(CPF, '2021-01', 100, 1)
+        mensal.incrementar_varios({(CPF, '2021-01'): (50, 2), (CPF, '2021-02'): (10, 1), ('1', '2021-01'): (5, 1)})
+
+        self.assertEqual(150, mensal.obter_total(CPF, '2021-01'))
+        self.assertIsNone(mensal.obter_total(CPF, '2021-03'))
+        self.assertEqual({'2021-01': 150, '2021-02': 10}, mensal.obter_totais(CPF, ['2021-01', '2021-02', '2021-03']))
+        self.assertEqual(4, mensal.obter_quantidade(CPF))
+        self.assertEqual(0, mensal.obter_quantidade('2'))
+
+    def test_conjunto__versao(self):
+        conjunto = self.repositorios.conjunto('revendedor-pre-aprovado', 'cpf')
+
+        self.assertIsNone(conjunto.versao())
+        conjunto.incrementar_versao()
+        conjunto.incrementar_versao()
+        self.assertEqual(2, conjunto.versao())
+        self.assertEqual(frozenset(), conjunto.valores())
+
+
+class RepositoriosMemoriaTest(_RepositoriosContrato, unittest.TestCase):
+
+    def criar_repositorios(self):
+        return RepositoriosMemoria()
+
+    def test_backend_incompleto__expected_erro_ao_criar(self):
+        class CompraRepositorioIncompleto(CompraRepositorio):
+            def obter(self, codigo: str) -> dict:
+                return None
+
+        with self.assertRaises(TypeError):
+            CompraRepositorioIncompleto()
+
+
+@unittest.skipUnless(mongomock, 'mongomock não instalado')
+class RepositoriosMongoTest(_RepositoriosContrato, unittest.TestCase):
+
+    def criar_repositorios(self):
+        database = mongomock.MongoClient()['cashback']
+        ensure_indexes(database)
+        return RepositoriosMongo(database)
+
+    def test_compra__listar_por_cursor_datas_em_string_e_data__expected_todas_as_compras(self):
+        #  Durante migrar_data_compra: as strings são listadas antes das datas
+        # FIXTURES
+        compras = [_compra(str(dia), dia) for dia in range(1, 6)]
+        for compra in compras[:3]:
+            compra['data'] = compra['data'].isoformat()
+        self.repositorios.compra().inserir_varios(compras)
+
+        # EXERCISE
+        codigos = []
+        posicao = None
+        while True:
+            pagina = self.repositorios.compra().listar_apos(CPF, posicao, 2)
+            codigos.extend(compra['codigo'] for compra in pagina)
+            if len(pagina) < 2:
+                break
+            posicao = decodificar_cursor(codificar_cursor(pagina[-1]['data'], pagina[-1]['_id']))
+
+        # ASSERTS
+        self.assertEqual(['1', '2', '3', '4', '5'], codigos)
+
+
+@patch.object(src.repositorio.mongo, 'MONGO_LEITURA_SECUNDARIA', True)
+class LeituraSecundariaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = MagicMock()
+        self.secundaria = self.collection.with_options.return_value
+        self.database = Mock()
+        self.database.get_collection.return_value = self.collection
+
+    def test_compra__listagens_no_secundario__expected_duplicadas_no_primario(self):
+        # EXERCISE
+        compras = RepositoriosMongo(self.database).compra()
+        compras.contar(CPF)
+        compras.listar_apos(CPF, None, 10)
+        compras.codigos_cadastrados(['1'])
+
+        # ASSERTS
+        self.collection.with_options.assert_called_once_with(read_preference=SecondaryPreferred(max_staleness=90))
+        self.secundaria.count_documents.assert_called_once()
+        self.secundaria.find.assert_called_once()
+        self.collection.find.assert_called_once_with({'codigo': {'$in': ['1']}}, {'codigo': 1})
+
+    def test_compra_mensal__totais_no_secundario__expected_incremento_no_primario(self):
+        mensal = RepositoriosMongo(self.database).compra_mensal()
+        mensal.obter_totais(CPF, ['2021-01'])
+        mensal.incrementar(CPF, '2021-01', 10, 1)
+
+        self.secundaria.find.assert_called_once()
+        self.collection.update_one.assert_called_once()
+        self.secundaria.update_one.assert_not_called()
+
+    def test_compra__versao__expected_primario_com_versao_geral(self):
+        # FIXTURES
+        self.collection.find.return_value = [{'_id': 'compra', 'versao': 2}, {'_id': f'compra:{CPF}', 'versao': 5}]
+
+        # EXERCISE
+        versao = RepositoriosMongo(self.database).compra().versao(CPF)
+
+        # ASSERTS
+        self.assertEqual(7, versao)
+        self.secundaria.find.assert_not_called()
+        self.collection.find.assert_called_once_with({'_id': {'$in': ['compra', f'compra:{CPF}']}})
+
+    @patch.object(src.repositorio.mongo, 'MONGO_MAX_STALENESS', 30)
+    def test_leitura_secundaria__staleness_abaixo_do_minimo__expected_erro_na_criacao_do_client(self):
+        with self.assertRaises(ValueError):
+            create_app('mongodb://localhost:1/cashback', aquecer=False)
+
+    @patch.object(src.repositorio.mongo, 'MONGO_MAX_STALENESS', 30)
+    def test_leitura_secundaria__staleness_ja_validado__expected_sem_verificacao_por_requisicao(self):
+        RepositoriosMongo(self.database).compra().listar(CPF, 0, 10)
+
+        self.secundaria.find.assert_called_once()
+
+    def test_revendedor__expected_primario(self):
+        RepositoriosMongo(self.database).revendedor().obter(CPF)
+
+        self.collection.with_options.assert_not_called()
+
+
+@patch.object(src.aquecimento, 'PRE_APROVADO_CARREGAR_NA_INICIALIZACAO', False)
+@patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0)
+@patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', 1000)
+class AppMemoriaTest(unittest.TestCase):
+
+    def setUp(self):
+        revendedor_cache.limpar()
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+
+    def test_rotas__backend_memoria__expected_sem_banco(self):
+        # FIXTURES
+        client = create_app('', backend=repositorio.BACKEND_MEMORIA).test_client()
+        revendedor = {'nome': 'Teste nome complente', 'cpf': CPF, 'senha': 'Senhaboita', 'email': 'email@asd.com'}
+        compra = {'codigo': '1', 'valor': 1200, 'cpf_revendedor': CPF, 'data': '2021-01-02T00:00:00'}
+
+        # EXERCISE
+        cadastro = client.post('/api/v1/revendedor/', json=revendedor)
+        login = client.post(
+            '/api/v1/revendedor/login', json={'cpf': CPF, 'senha': base64.b64encode(b'Senhaboita').decode()}
+        )
+        inclusao = client.post(f'/api/v1/revendedor/{CPF}/compra', json=compra)
+        listagem = client.get(f'/api/v1/revendedor/{CPF}/compras?cursor=')
+
+        # ASSERTS
+        self.assertEqual([201, 200, 201, 200], [
+            cadastro.status_code, login.status_code, inclusao.status_code, listagem.status_code
+        ])
+        self.assertEqual(1, listagem.json['total'])
+        self.assertEqual(15, listagem.json['compras'][0]['percentual_cashback'])
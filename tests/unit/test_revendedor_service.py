@@ -3,7 +3,9 @@ from unittest.mock import patch, Mock
 
 from src.domain.service import RevendedorService
 
+import src.domain.senha
 import src.domain.service
+from src.domain.senha import gerar_hash
 from src.domain.service import RevendedorService
 from src.model import Revendedor
 
@@ -13,6 +15,12 @@ class RevendedorServiceTest(unittest.TestCase):
     def setUp(self):
         self.revendedor_collection_mock = Mock()
         self.token_collection_mock = Mock()
+        src.domain.service.revendedor_cache.limpar()
+        #  Hash barato e na própria thread para os testes
+        for nome, valor in (('SENHA_HASH_ITERACOES', 1000), ('SENHA_HASH_PROCESSOS', 0)):
+            patcher = patch.object(src.domain.senha, nome, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
 
     def mock_collections(self, mongo_mock):
         collections = {'revendedor': self.revendedor_collection_mock, 'token': self.token_collection_mock}
@@ -53,9 +61,14 @@ class RevendedorServiceTest(unittest.TestCase):
 
         # ASSERTS
         self.revendedor_collection_mock.find_one.assert_called_once_with({'cpf': '70249837285'})
-        self.revendedor_collection_mock.insert_one.assert_called_once_with(
-            {'nome': 'Teste nome complente', 'cpf': '70249837285', 'senha': 'Senhabonita', 'email': 'email@asd.com'}
+        self.revendedor_collection_mock.insert_one.assert_called_once()
+        _model = self.revendedor_collection_mock.insert_one.call_args[0][0]
+        self.assertEqual(
+            {k: v for k, v in _model.items() if k != 'senha'},
+            {'nome': 'Teste nome complente', 'cpf': '70249837285', 'email': 'email@asd.com'}
         )
+        self.assertNotEqual(_model['senha'], 'Senhabonita')
+        self.assertEqual(src.domain.senha.verificar_senha('Senhabonita', _model['senha']), (True, False))
 
     @patch.object(src.domain.service, 'mongo')
     def test_obter__revendedor_cadastrado__expected_revendedor(self, mongo_mock):
@@ -165,3 +178,172 @@ class RevendedorServiceTest(unittest.TestCase):
         self.revendedor_collection_mock.find_one.assert_called_once_with({'cpf': '70249837285'})
         self.assertFalse(result)
         self.assertIsNone(token)
+
+    @patch.object(src.domain.service, 'mongo')
+    def test_obter__revendedor_em_cache__expected_nao_consultar(self, mongo_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        self.revendedor_collection_mock.find_one.return_value = {
+            'nome': 'Teste nome complente', 'cpf': '70249837285', 'senha': 'Senhaboita', 'email': 'email@asd.com'
+        }
+        service = RevendedorService()
+        service.obter('70249837285')
+        #  Os contadores do cache são do processo, acumulados pelos testes anteriores
+        acertos = src.domain.service.revendedor_cache.acertos
+
+        # EXERCISE
+        result = RevendedorService().obter('70249837285')
+
+        # ASSERTS
+        self.revendedor_collection_mock.find_one.assert_called_once_with({'cpf': '70249837285'})
+        self.assertEqual('Teste nome complente', result.nome)
+        self.assertEqual(acertos + 1, src.domain.service.revendedor_cache.acertos)
+
+    @patch.object(src.domain.service, 'mongo')
+    def test_salvar__revendedor_em_cache__expected_invalidar_cache(self, mongo_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        revendedor = Revendedor(
+            nome='Teste nome complente', cpf='70249837285', senha='Senhabonita', email='email@asd.com'
+        )
+        src.domain.service.revendedor_cache.definir('70249837285', revendedor)
+        self.revendedor_collection_mock.find_one.return_value = None
+        service = RevendedorService()
+
+        # EXERCISE
+        service.salvar(revendedor)
+
+        # ASSERTS
+        self.assertIsNone(src.domain.service.revendedor_cache.obter('70249837285'))
+
+    @patch.object(src.domain.service, 'gerar_token')
+    @patch.object(src.domain.service, 'TOKEN_MODO', 'assinado')
+    @patch.object(src.domain.service, 'mongo')
+    def test_login__token_assinado__expected_token_sem_gravar(self, mongo_mock, gerar_token_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        self.revendedor_collection_mock.find_one.return_value = {
+            'nome': 'Teste nome complente', 'cpf': '70249837285', 'senha': 'Senhaboita', 'email': 'email@asd.com'
+        }
+        gerar_token_mock.return_value = 'token.assinado'
+        service = RevendedorService()
+
+        # EXERCISE
+        result, token = service.login('70249837285', 'Senhaboita')
+
+        # ASSERTS
+        self.assertTrue(result)
+        self.assertEqual('token.assinado', token)
+        gerar_token_mock.assert_called_once_with('70249837285')
+        self.token_collection_mock.find_one.assert_not_called()
+        self.token_collection_mock.insert_one.assert_not_called()
+
+    @patch.object(src.domain.service, 'mongo')
+    def test_verificar_token__token_cadastrado__expected_cpf(self, mongo_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        self.token_collection_mock.find_one.return_value = {'cpf': '70249837285', 'token': 'asdjhalksjdalksjd'}
+        service = RevendedorService()
+
+        # EXERCISE
+        result = service.verificar_token('asdjhalksjdalksjd')
+
+        # ASSERTS
+        self.token_collection_mock.find_one.assert_called_once_with({'token': 'asdjhalksjdalksjd'})
+        self.assertEqual('70249837285', result)
+
+    @patch.object(src.domain.service, 'verificar_token')
+    @patch.object(src.domain.service, 'TOKEN_MODO', 'assinado')
+    @patch.object(src.domain.service, 'mongo')
+    def test_verificar_token__token_assinado__expected_cpf_sem_consultar(self, mongo_mock, verificar_token_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        verificar_token_mock.return_value = '70249837285'
+        service = RevendedorService()
+
+        # EXERCISE
+        result = service.verificar_token('token.assinado')
+
+        # ASSERTS
+        self.assertEqual('70249837285', result)
+        self.token_collection_mock.find_one.assert_not_called()
+
+    @patch.object(src.domain.service, 'mongo')
+    def test_login__senha_com_hash__expected_true_sem_recalcular(self, mongo_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        revendedor = {
+            'nome': 'Teste nome complente', 'cpf': '70249837285', 'senha': gerar_hash('Senhaboita'),
+            'email': 'email@asd.com'
+        }
+        self.revendedor_collection_mock.find_one.return_value = revendedor
+        self.token_collection_mock.find_one.return_value = {'cpf': '70249837285', 'token': 'abc'}
+        service = RevendedorService()
+
+        # EXERCISE
+        result, token = service.login('70249837285', 'Senhaboita')
+
+        # ASSERTS
+        self.assertTrue(result)
+        self.assertEqual(token, 'abc')
+        self.revendedor_collection_mock.update_one.assert_not_called()
+
+    @patch.object(src.domain.service, 'mongo')
+    def test_login__senha_em_texto__expected_gravar_hash(self, mongo_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        revendedor = {
+            'nome': 'Teste nome complente', 'cpf': '70249837285', 'senha': 'Senhaboita', 'email': 'email@asd.com'
+        }
+        self.revendedor_collection_mock.find_one.return_value = revendedor
+        self.token_collection_mock.find_one.return_value = {'cpf': '70249837285', 'token': 'abc'}
+        service = RevendedorService()
+
+        # EXERCISE
+        result, _ = service.login('70249837285', 'Senhaboita')
+
+        # ASSERTS
+        self.assertTrue(result)
+        self.revendedor_collection_mock.update_one.assert_called_once()
+        filtro, atualizacao = self.revendedor_collection_mock.update_one.call_args[0]
+        self.assertEqual(filtro, {'cpf': '70249837285', 'senha': 'Senhaboita'})
+        self.assertEqual(
+            src.domain.senha.verificar_senha('Senhaboita', atualizacao['$set']['senha']), (True, False)
+        )
+
+    @patch.object(src.domain.service, 'mongo')
+    def test_login__hash_com_custo_antigo__expected_recalcular_hash(self, mongo_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        with patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', 500):
+            senha_antiga = gerar_hash('Senhaboita')
+        revendedor = {
+            'nome': 'Teste nome complente', 'cpf': '70249837285', 'senha': senha_antiga, 'email': 'email@asd.com'
+        }
+        self.revendedor_collection_mock.find_one.return_value = revendedor
+        self.token_collection_mock.find_one.return_value = {'cpf': '70249837285', 'token': 'abc'}
+        service = RevendedorService()
+
+        # EXERCISE
+        result, _ = service.login('70249837285', 'Senhaboita')
+
+        # ASSERTS
+        self.assertTrue(result)
+        _, atualizacao = self.revendedor_collection_mock.update_one.call_args[0]
+        self.assertTrue(atualizacao['$set']['senha'].startswith('pbkdf2_sha256$1000$'))
+
+    @patch.object(src.domain.service, 'mongo')
+    def test_obter__senha_com_hash__expected_revendedor(self, mongo_mock):
+        # FIXTURES
+        self.mock_collections(mongo_mock)
+        senha_hash = gerar_hash('Senhaboita')
+        self.revendedor_collection_mock.find_one.return_value = {
+            'nome': 'Teste nome complente', 'cpf': '70249837285', 'senha': senha_hash, 'email': 'email@asd.com'
+        }
+        service = RevendedorService()
+
+        # EXERCISE
+        result = service.obter('70249837285')
+
+        # ASSERTS
+        self.assertEqual(result.senha, senha_hash)
@@ -1,5 +1,7 @@
+import datetime
 import unittest
-from src.schema import RevendedorSchema
+from src.domain.service import ano_mes
+from src.schema import RevendedorSchema, CompraSchema
 
 
 class RevendedorSchemaTest(unittest.TestCase):
@@ -68,4 +70,30 @@ class RevendedorSchemaTest(unittest.TestCase):
         )
 
         self.assertEqual(1, len(errors))
-        self.assertEqual(['Senha deve ter no mínimo 8 e no máximo 10 caracteres.'], errors['senha'])
\ No newline at end of file
+        self.assertEqual(['Senha deve ter no mínimo 8 e no máximo 10 caracteres.'], errors['senha'])
+
+
+class CompraSchemaTest(unittest.TestCase):
+
+    def test_load__data_em_string_com_fuso__expected_data_utc(self):
+        compra = CompraSchema().load(
+            {'codigo': '1', 'cpf_revendedor': '87535514600', 'valor': 10, 'data': '2020-01-10T21:30:00-03:00'}
+        )
+
+        self.assertEqual(datetime.datetime(2020, 1, 11, 0, 30), compra.data)
+
+    def test_load__fim_do_mes_com_fuso__expected_mes_seguinte_em_utc(self):
+        compra = CompraSchema().load(
+            {'codigo': '1', 'cpf_revendedor': '87535514600', 'valor': 10, 'data': '2020-05-31T22:00:00-03:00'}
+        )
+
+        self.assertEqual(datetime.datetime(2020, 6, 1, 1, 0), compra.data)
+        self.assertEqual('2020-06', ano_mes(compra.data))
+        self.assertEqual('2020-06-01T01:00:00', CompraSchema().dump(compra)['data'])
+
+    def test_load__data_do_mongo__expected_data(self):
+        compra = CompraSchema().load(
+            {'codigo': '1', 'cpf_revendedor': '87535514600', 'valor': 10, 'data': datetime.datetime(2020, 1, 10)}
+        )
+
+        self.assertEqual(datetime.datetime(2020, 1, 10), compra.data)
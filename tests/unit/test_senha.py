@@ -0,0 +1,84 @@
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch, Mock
+
+import src.domain.senha
+from src.domain.senha import gerar_hash, verificar_senha, e_hash
+
+
+@patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', 1000)
+class SenhaTest(unittest.TestCase):
+
+    @patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0)
+    def test_gerar_hash__expected_formato_e_salt_aleatorio(self):
+        # EXERCISE
+        hash_1 = gerar_hash('Senhabonita')
+        hash_2 = gerar_hash('Senhabonita')
+
+        # ASSERTS
+        self.assertTrue(hash_1.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(e_hash(hash_1))
+        self.assertNotEqual(hash_1, hash_2)
+
+    @patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0)
+    def test_verificar_senha__senha_correta_e_incorreta(self):
+        # FIXTURES
+        senha_hash = gerar_hash('Senhabonita')
+
+        # EXERCISE / ASSERTS
+        self.assertEqual(verificar_senha('Senhabonita', senha_hash), (True, False))
+        self.assertEqual(verificar_senha('Senhafeia', senha_hash), (False, False))
+
+    @patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0)
+    def test_verificar_senha__senha_em_texto__expected_recalcular(self):
+        # EXERCISE / ASSERTS
+        self.assertEqual(verificar_senha('Senhabonita', 'Senhabonita'), (True, True))
+        self.assertEqual(verificar_senha('Senhafeia', 'Senhabonita'), (False, True))
+        self.assertEqual(verificar_senha('Senhabonita', None), (False, False))
+
+    @patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0)
+    def test_verificar_senha__custo_alterado__expected_recalcular(self):
+        # FIXTURES
+        senha_hash = gerar_hash('Senhabonita')
+
+        # EXERCISE
+        with patch.object(src.domain.senha, 'SENHA_HASH_ITERACOES', 2000):
+            result = verificar_senha('Senhabonita', senha_hash)
+
+        # ASSERTS
+        self.assertEqual(result, (True, True))
+
+    @patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 0)
+    def test_verificar_senha__hash_malformado__expected_senha_invalida(self):
+        for senha_hash in ('pbkdf2_sha256$', 'pbkdf2_sha256$abc$c2FsdA==$aGFzaA==',
+                           'pbkdf2_sha256$1000$c2FsdA$aGFzaA==', 'pbkdf2_sha256$0$c2FsdA==$aGFzaA==',
+                           'pbkdf2_sha256$1000$c2FsdA==$aGFzaA==$extra'):
+            with self.subTest(senha_hash=senha_hash):
+                self.assertEqual(verificar_senha('Senhabonita', senha_hash), (False, False))
+
+    @patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 2)
+    @patch.object(src.domain.senha, '_executor', None)
+    @patch.object(src.domain.senha, 'ProcessPoolExecutor')
+    def test_gerar_hash__pool_quebrado__expected_novo_pool(self, process_pool_mock):
+        # FIXTURES
+        quebrado, novo = Mock(), Mock()
+        quebrado.submit.side_effect = BrokenProcessPool()
+        novo.submit.return_value.result.return_value = 'hash'
+        process_pool_mock.side_effect = [quebrado, novo]
+
+        # EXERCISE
+        result = gerar_hash('Senhabonita')
+
+        # ASSERTS
+        self.assertEqual('hash', result)
+        quebrado.shutdown.assert_called_once_with(wait=False)
+        self.assertIs(novo, src.domain.senha._executor)
+        self.assertNotEqual('fork', process_pool_mock.call_args.kwargs['mp_context'].get_start_method())
+
+    @patch.object(src.domain.senha, 'SENHA_HASH_PROCESSOS', 1)
+    def test_gerar_hash__pool_de_processos__expected_hash_valido(self):
+        # EXERCISE
+        senha_hash = gerar_hash('Senhabonita')
+
+        # ASSERTS
+        self.assertEqual(verificar_senha('Senhabonita', senha_hash), (True, False))
@@ -0,0 +1,63 @@
+import datetime
+import json
+import unittest
+from unittest.mock import patch
+
+from bson import ObjectId
+
+import src.api.serializacao
+from src.api.serializacao import ENCODER_ORJSON, ENCODER_STDLIB, obter_encoder
+from src.model import CompraCashBack
+from src.schema import compra_cashback_dict, compra_cashback_schema
+
+DATAS = [datetime.datetime(2021, 1, 2), datetime.datetime(2021, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc)]
+
+
+class SerializacaoTest(unittest.TestCase):
+
+    def _encoders(self) -> list:
+        return [ENCODER_STDLIB] + ([ENCODER_ORJSON] if src.api.serializacao.orjson else [])
+
+    def test_compra_cashback_dict__expected_mesmo_json_do_schema(self):
+        for encoder in self._encoders():
+            for data in DATAS:
+                with self.subTest(encoder=encoder, data=data):
+                    # FIXTURES
+                    compra = CompraCashBack('1', '70249837285', 100, data, 'Aprovado', 10, 10.0)
+
+                    # EXERCISE
+                    result = obter_encoder(encoder)(compra_cashback_dict(compra))
+
+                    # ASSERTS
+                    self.assertEqual(json.loads(json.dumps(compra_cashback_schema.dump(compra))), json.loads(result))
+
+    def test_codificar__tipos_sem_json__expected_texto(self):
+        _id = ObjectId()
+
+        for encoder in self._encoders():
+            with self.subTest(encoder=encoder):
+                result = json.loads(obter_encoder(encoder)({'_id': _id, 'dia': datetime.date(2021, 1, 2), 'nome': 'ã'}))
+
+                self.assertEqual({'_id': str(_id), 'dia': '2021-01-02', 'nome': 'ã'}, result)
+
+    def test_codificar__chaves_nao_texto__expected_mesmo_json_nos_encoders(self):
+        # FIXTURES
+        dados = {2021: {1: 10.5, 2: None}, True: DATAS[1], None: ObjectId('5ff0c9a1e4b0a1b2c3d4e5f6')}
+
+        # EXERCISE
+        results = {encoder: json.loads(obter_encoder(encoder)(dados)) for encoder in self._encoders()}
+
+        # ASSERTS
+        for encoder, result in results.items():
+            with self.subTest(encoder=encoder):
+                self.assertEqual(json.loads(obter_encoder(ENCODER_STDLIB)(dados)), result)
+                self.assertEqual({'1': 10.5, '2': None}, result['2021'])
+
+    @patch.object(src.api.serializacao, 'orjson', None)
+    def test_obter_encoder__auto_sem_orjson__expected_stdlib(self):
+        self.assertIs(src.api.serializacao._codificar_stdlib, obter_encoder('auto'))
+
+    @patch.object(src.api.serializacao, 'orjson', None)
+    def test_obter_encoder__orjson_sem_pacote__expected_erro(self):
+        with self.assertRaises(ValueError):
+            obter_encoder(ENCODER_ORJSON)
@@ -0,0 +1,110 @@
+import json
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch, Mock
+
+import src.domain.token
+from src.domain.token import gerar_token, verificar_token, decodificar_token, revogar_token, validar_configuracao
+
+
+@patch.object(src.domain.token, 'TOKEN_SEGREDO', 'segredo-de-teste')
+class TokenTest(unittest.TestCase):
+
+    def setUp(self):
+        decodificar_token.cache_clear()
+        patcher = patch.object(src.domain.token, 'token_revogado_cache')
+        self.token_revogado_cache_mock = patcher.start()
+        self.token_revogado_cache_mock.contem.return_value = False
+        self.addCleanup(patcher.stop)
+
+    def test_verificar_token__token_valido__expected_cpf(self):
+        token = gerar_token('70249837285')
+
+        self.assertEqual('70249837285', verificar_token(token))
+
+    def test_verificar_token__assinatura_alterada__expected_none(self):
+        payload, assinatura = gerar_token('70249837285').split('.')
+        outro_payload, _ = gerar_token('67976752006').split('.')
+
+        self.assertIsNone(verificar_token(f'{outro_payload}.{assinatura}'))
+
+    def test_verificar_token__token_malformado__expected_none(self):
+        self.assertIsNone(verificar_token('nao-e-um-token'))
+        self.assertIsNone(verificar_token('a.b.c'))
+
+    def test_verificar_token__caracteres_nao_ascii__expected_none(self):
+        payload, _ = gerar_token('70249837285').split('.')
+
+        self.assertIsNone(verificar_token('abc.é'))
+        self.assertIsNone(verificar_token(f'{payload}.é'))
+        self.assertIsNone(verificar_token('é.abc'))
+
+    def test_verificar_token__payload_assinado_sem_os_campos__expected_none(self):
+        for dados in ([1, 2], 10, 'texto', None, {'cpf': '70249837285', 'jti': 'a'},
+                      {'cpf': '70249837285', 'exp': '9999999999', 'jti': 'a'}):
+            with self.subTest(dados=dados):
+                # FIXTURES
+                payload = src.domain.token._b64encode(json.dumps(dados).encode())
+                token = f'{payload}.{src.domain.token._assinar(payload)}'
+
+                # EXERCISE
+                result = verificar_token(token)
+
+                # ASSERTS
+                self.assertIsNone(result)
+                self.assertIsNone(decodificar_token(token))
+
+    def test_verificar_token__token_expirado__expected_none(self):
+        with patch.object(src.domain.token, 'TOKEN_VALIDADE', -1):
+            token = gerar_token('70249837285')
+
+        self.assertIsNone(verificar_token(token))
+
+    def test_verificar_token__token_revogado__expected_none(self):
+        token = gerar_token('70249837285')
+        self.token_revogado_cache_mock.contem.return_value = True
+
+        self.assertIsNone(verificar_token(token))
+        self.token_revogado_cache_mock.contem.assert_called_once_with(decodificar_token(token)['jti'])
+
+    def test_verificar_token__outro_segredo__expected_none(self):
+        token = gerar_token('70249837285')
+        decodificar_token.cache_clear()
+
+        with patch.object(src.domain.token, 'TOKEN_SEGREDO', 'outro-segredo'):
+            self.assertIsNone(verificar_token(token))
+
+    def test_revogar_token__token_valido__expected_gravar_jti(self):
+        token = gerar_token('70249837285')
+        dados = decodificar_token(token)
+        repositorio_mock = Mock()
+
+        revogar_token(repositorio_mock, token)
+
+        repositorio_mock.revogar.assert_called_once_with(
+            dados['jti'], datetime.fromtimestamp(dados['exp'], timezone.utc)
+        )
+        self.token_revogado_cache_mock.adicionar.assert_called_once_with(dados['jti'])
+
+
+class ValidarConfiguracaoTest(unittest.TestCase):
+
+    @patch.object(src.domain.token, 'TOKEN_SEGREDO', '')
+    @patch.object(src.domain.token, 'TOKEN_MODO', 'assinado')
+    def test_validar_configuracao__assinado_sem_segredo__expected_erro(self):
+        with self.assertRaises(RuntimeError):
+            validar_configuracao()
+
+    @patch.object(src.domain.token, 'TOKEN_SEGREDO', '')
+    @patch.object(src.domain.token, 'TOKEN_MODO', 'banco')
+    def test_validar_configuracao__banco_sem_segredo__expected_sem_erro(self):
+        validar_configuracao()
+
+    @patch.object(src.domain.token, 'TOKEN_SEGREDO', '')
+    @patch.object(src.domain.token, 'TOKEN_MODO', 'assinado')
+    def test_create_app__assinado_sem_segredo__expected_erro_na_inicializacao(self):
+        from src import create_app, repositorio
+        self.addCleanup(repositorio.configurar, repositorio.BACKEND_MONGO)
+
+        with self.assertRaises(RuntimeError):
+            create_app('', backend=repositorio.BACKEND_MEMORIA, aquecer=False)